@@ -0,0 +1,107 @@
+# ----------------------------------------------------------------------------#
+# JSON API.
+# ----------------------------------------------------------------------------#
+
+from datetime import datetime
+
+from flask import Blueprint, current_app, request, abort
+
+from helpers import *
+from models import *
+from replicas import read_only
+
+#  API
+#  ----------------------------------------------------------------
+# JSON for the mobile clients, built by the same queries as the pages. Every
+# response carries a strong ETag (see api_response), so a poll only costs a
+# version check while nothing changed.
+
+API_PREFIX = '/api/v1'
+
+bp = Blueprint('api', __name__, url_prefix=API_PREFIX)
+
+
+@bp.route('/venues')
+@read_only
+def api_venues():
+    # every insert, update or delete changes the venue count or the latest updated_at
+    version = db.session.query(func.count(Venue.id), func.max(Venue.updated_at)).one()
+    return api_response(list(version), lambda: {"areas": venue_areas()})
+
+
+@bp.route('/venues/<int:venue_id>')
+@read_only
+def api_venue(venue_id):
+    now = datetime.now()
+    venue, version, _ = load_with_version(Venue, Show.c.Venue_id, Artist, Show.c.Artist_id, venue_id, now)
+    if venue is None:
+        abort(404)
+
+    def build():
+        load_venue_shows(venue, now, request.args.get('limit', type=int))
+        return {
+            "id": venue.id,
+            "name": venue.name,
+            "genres": venue.genres,
+            "address": venue.address,
+            "city": venue.city,
+            "state": venue.state,
+            "phone": venue.phone,
+            "website": venue.website,
+            "facebook_link": venue.facebook_link,
+            "seeking_talent": venue.seeking_talent,
+            "seeking_description": venue.seeking_description,
+            "image_link": venue.image_link,
+            **api_shows_of(venue, ["artist_id", "artist_name", "artist_image_link"])
+        }
+    return api_response(version, build)
+
+
+@bp.route('/artists/<int:artist_id>')
+@read_only
+def api_artist(artist_id):
+    now = datetime.now()
+    artist, version, _ = load_with_version(Artist, Show.c.Artist_id, Venue, Show.c.Venue_id, artist_id, now)
+    if artist is None:
+        abort(404)
+
+    def build():
+        load_artist_shows(artist, now, request.args.get('limit', type=int))
+        return {
+            "id": artist.id,
+            "name": artist.name,
+            "genres": artist.genres,
+            "city": artist.city,
+            "state": artist.state,
+            "phone": artist.phone,
+            "website": artist.website,
+            "facebook_link": artist.facebook_link,
+            "seeking_venue": artist.seeking_venue,
+            "seeking_description": artist.seeking_description,
+            "image_link": artist.image_link,
+            **api_shows_of(artist, ["venue_id", "venue_name", "venue_image_link"])
+        }
+    return api_response(version, build)
+
+
+@bp.route('/shows')
+@read_only
+def api_shows():
+    # the same window and keyset pages as /shows. fetching a page is as cheap
+    # as any version check, the updated_at of its rows make up the version
+    query = shows_query(shows_window(datetime.now()),
+                        Show.c.updated_at.label("show_updated_at"),
+                        Venue.updated_at.label("venue_updated_at"),
+                        Artist.updated_at.label("artist_updated_at"))
+    shows, prev_cursor, next_cursor = keyset_page(
+        query, [Show.c.start_time, Show.c.id], current_app.config.get('SHOWS_PER_PAGE', 30),
+        after=decode_cursor(request.args.get('after'), (datetime, int)),
+        before=decode_cursor(request.args.get('before'), (datetime, int)))
+    version = [[row.id, row.show_updated_at, row.venue_updated_at, row.artist_updated_at]
+               for row in shows] + [prev_cursor, next_cursor]
+    return api_response(version, lambda: {
+        "shows": [api_show(row, ["id", "venue_id", "venue_name", "artist_id",
+                                 "artist_name", "artist_image_link"]) for row in shows],
+        "prev_cursor": prev_cursor,
+        "next_cursor": next_cursor
+    })
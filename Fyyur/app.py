@@ -2,15 +2,26 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
-import json
-import dateutil.parser
+import hmac
+import os
+import random
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for,abort,jsonify
-from sqlalchemy import func, inspect, or_
-import logging, sys
+from flask import Flask, current_app, render_template, request, Response, abort, jsonify, stream_with_context, g
+from jinja2 import FileSystemBytecodeCache
+import click
+import logging
 from logging import Formatter, FileHandler
-from forms import *
-from models import *
+from models import db, moment
+from cache import create_page_cache
+from export import EXPORT_FORMATS, export_chunks
+from helpers import parse_bool, parse_datetime
+from metrics import pool_metrics, route_metrics, QueryStats, TimedQueuePool
+from replicas import read_only
+from commands import fyyur_cli
+import api
+import artists
+import shows
+import venues
 
 
 # ----------------------------------------------------------------------------#
@@ -29,806 +40,183 @@ def format_datetime(value, format='medium'):
     return babel.dates.format_datetime(value, format, locale='en')
 
 
-app.jinja_env.filters['datetime'] = format_datetime
+# ----------------------------------------------------------------------------#
+# Templates.
+# ----------------------------------------------------------------------------#
+
+def precompile_templates(app):
+    """Compile every template into the environment's cache (and the bytecode
+    cache), returning their names; a broken template fails here."""
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
 
 
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
+# the venue, artist and show pages and the JSON API are blueprints, see
+# venues.py, artists.py, shows.py and api.py
 
-@app.route('/')
 def index():
     return render_template('pages/home.html')
 
 
-#  Venues
+#  Exports
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
-def venues():
-    # TODO: replace with real venues data.
-    #       num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
-    # data=[{
-    #   "city": "San Francisco",
-    #   "state": "CA",
-    #   "venues": [{
-    #     "id": 1,
-    #     "name": "The Musical Hop",
-    #     "num_upcoming_shows": 0,
-    #   }, {
-    #     "id": 3,
-    #     "name": "Park Square Live Music & Coffee",
-    #     "num_upcoming_shows": 1,
-    #   }]
-    # }, {
-    #   "city": "New York",
-    #   "state": "NY",
-    #   "venues": [{
-    #     "id": 2,
-    #     "name": "The Dueling Pianos Bar",
-    #     "num_upcoming_shows": 0,
-    #   }]
-    # }]
-    # data contains city,state and venues, where venues list contains venue's id and name
-    # grouped by city,state
-    data = []
-    try:
-        # normal query will introduce duplicate issue if venues are in same city
-        # areas = Venue.query.order_by(Venue.state, Venue.city).all()
-        # use distinct to filter out duplicate city,state, group them
-        areas = Venue.query.distinct(Venue.city, Venue.state).all()
-        # gather id and name in one venues list based on city,state
-        for location in areas:
-            venuesQuery = Venue.query.filter_by(city=location.city).filter_by(state=location.state).all()
-            venues = []
-            for venue in venuesQuery:
-                venues.append({
-                    "id": venue.id,
-                    "name": venue.name
-                })
-            # append venues list into data list
-            data.append({
-                "city": location.city,
-                "state": location.state,
-                "venues": venues
-            })
-        return render_template('pages/venues.html', areas=data);
-        # return render_template('pages/venues.html', areas=db.session.query(Venue).all());
-    except:
-        flash('An error occurred. Cannot display venues')
-        return redirect(url_for('index'))
-
-
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-    # seach for Hop should return "The Musical Hop".
-    # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-    # response={
-    #   "count": 1,
-    #   "data": [{
-    #     "id": 2,
-    #     "name": "The Dueling Pianos Bar",
-    #     "num_upcoming_shows": 0,
-    #   }]
-    # }
-    search_term = request.form.get('search_term', '')
-    # https://stackoverflow.com/questions/4926757/sqlalchemy-query-where-a-column-contains-a-substring
-    # case insenstive search with ilike
-    like_search = f'%{search_term}%'
-    # search matched term from name,city or state column of Venue table
-    # https://stackoverflow.com/questions/3332991/sqlalchemy-filter-multiple-columns
-    # count
-    search_venues_count = db.session.query(Venue) \
-        .filter(db.or_(
-        Venue.name.ilike(like_search),
-        Venue.city.ilike(like_search),
-        Venue.state.ilike(like_search)
-    )).count()
-    # all matched records
-    search_venues_result = Venue.query.filter(
-        db.or_(
-            Venue.name.ilike(like_search),
-            Venue.city.ilike(like_search),
-            Venue.state.ilike(like_search)
-        )).all()
-    # print(f"search result: {search_venues_result}")
-    # create a well formatted response with above results
-    response = {
-        "count": search_venues_count,
-        "data": search_venues_result
-    }
-    return render_template('pages/search_venues.html', results=response, search_term=search_term)
-
-
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-    # shows the venue page with the given venue_id
-    # TODO: replace with real venue data from the venues table, using venue_id
-    # data1={
-    #   "id": 1,
-    #   "name": "The Musical Hop",
-    #   "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
-    #   "address": "1015 Folsom Street",
-    #   "city": "San Francisco",
-    #   "state": "CA",
-    #   "phone": "123-123-1234",
-    #   "website": "https://www.themusicalhop.com",
-    #   "facebook_link": "https://www.facebook.com/TheMusicalHop",
-    #   "seeking_talent": True,
-    #   "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
-    #   "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-    #   "past_shows": [{
-    #     "artist_id": 4,
-    #     "artist_name": "Guns N Petals",
-    #     "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    #     "start_time": "2019-05-21T21:30:00.000Z"
-    #   }],
-    #   "upcoming_shows": [],
-    #   "past_shows_count": 1,
-    #   "upcoming_shows_count": 0,
-    # }
-    # data2={
-    #   "id": 2,
-    #   "name": "The Dueling Pianos Bar",
-    #   "genres": ["Classical", "R&B", "Hip-Hop"],
-    #   "address": "335 Delancey Street",
-    #   "city": "New York",
-    #   "state": "NY",
-    #   "phone": "914-003-1132",
-    #   "website": "https://www.theduelingpianos.com",
-    #   "facebook_link": "https://www.facebook.com/theduelingpianos",
-    #   "seeking_talent": False,
-    #   "image_link": "https://images.unsplash.com/photo-1497032205916-ac775f0649ae?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=750&q=80",
-    #   "past_shows": [],
-    #   "upcoming_shows": [],
-    #   "past_shows_count": 0,
-    #   "upcoming_shows_count": 0,
-    # }
-    # data3={
-    #   "id": 3,
-    #   "name": "Park Square Live Music & Coffee",
-    #   "genres": ["Rock n Roll", "Jazz", "Classical", "Folk"],
-    #   "address": "34 Whiskey Moore Ave",
-    #   "city": "San Francisco",
-    #   "state": "CA",
-    #   "phone": "415-000-1234",
-    #   "website": "https://www.parksquarelivemusicandcoffee.com",
-    #   "facebook_link": "https://www.facebook.com/ParkSquareLiveMusicAndCoffee",
-    #   "seeking_talent": False,
-    #   "image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    #   "past_shows": [{
-    #     "artist_id": 5,
-    #     "artist_name": "Matt Quevedo",
-    #     "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    #     "start_time": "2019-06-15T23:00:00.000Z"
-    #   }],
-    #   "upcoming_shows": [{
-    #     "artist_id": 6,
-    #     "artist_name": "The Wild Sax Band",
-    #     "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #     "start_time": "2035-04-01T20:00:00.000Z"
-    #   }, {
-    #     "artist_id": 6,
-    #     "artist_name": "The Wild Sax Band",
-    #     "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #     "start_time": "2035-04-08T20:00:00.000Z"
-    #   }, {
-    #     "artist_id": 6,
-    #     "artist_name": "The Wild Sax Band",
-    #     "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #     "start_time": "2035-04-15T20:00:00.000Z"
-    #   }],
-    #   "past_shows_count": 1,
-    #   "upcoming_shows_count": 1,
-    # }
-    # data = list(filter(lambda d: d['id'] == venue_id, [data1, data2, data3]))[0]
-
-    # either below can get the result
-    # data = Venue.query.filter_by(id=venue_id).all()[0]
-    # Step 1: Get single venue object
-    single_venue = Venue.query.get(venue_id)
-    if single_venue is None:
+@read_only
+def export(entity, fmt):
+    # streams every venue, artist or show as csv or ndjson, e.g. /export/shows.csv
+    # ?since=<date> exports only the rows changed since then; to catch rows
+    # committed while the previous export ran, overlap the windows a little
+    require_token('EXPORT_TOKEN')
+    if entity not in ('venues', 'artists', 'shows') or fmt not in EXPORT_FORMATS:
         abort(404)
-    # query association table solution:
-    # https://stackoverflow.com/questions/41270319/how-do-i-query-an-association-table-in-sqlalchemy
-    # Step 2: Get Past Shows
-    # add label , then 'artist_id' can be a attribute of object,
-    # for example:single_venue.past_shows.artist_id, called in show_venue.html
-    single_venue.past_shows = (db.session.query(
-        Artist.id.label("artist_id"),
-        Artist.name.label("artist_name"),
-        Artist.image_link.label("artist_image_link"),
-        Show)
-        .filter(Show.c.Venue_id == venue_id)
-        .filter(Show.c.Artist_id == Artist.id)
-        .filter(Show.c.start_time <= datetime.now())
-        .all())
-
-    # Step 3: Get Upcomming Shows
-    single_venue.upcoming_shows = (db.session.query(
-        Artist.id.label("artist_id"),
-        Artist.name.label("artist_name"),
-        Artist.image_link.label("artist_image_link"),
-        Show)
-        .filter(Show.c.Venue_id == venue_id)
-        .filter(Show.c.Artist_id == Artist.id)
-        .filter(Show.c.start_time > datetime.now())
-        .all())
-
-    # Step 4: Get Number of past Shows
-    single_venue.past_shows_count = (db.session.query(
-        Artist.id, Artist.name, Show)
-        .filter(Show.c.Venue_id == venue_id)
-        .filter(Show.c.Artist_id == Artist.id)
-        .filter(Show.c.start_time < datetime.now())
-        .count())
-
-    # Step 5: Get Number of Upcoming Shows
-    single_venue.upcoming_shows_count = (db.session.query(
-        Artist.id, Artist.name, Show)
-        .filter(Show.c.Venue_id == venue_id)
-        .filter(Show.c.Artist_id == Artist.id)
-        .filter(Show.c.start_time > datetime.now())
-        .count())
-    return render_template('pages/show_venue.html', venue=single_venue)
-
-
-#  Create Venue
+    since = request.args.get('since', type=parse_datetime)
+    if 'since' in request.args and since is None:
+        abort(400)
+    # gzip when asked for with ?gzip=1 (not with ?gzip=0), otherwise when the client accepts it
+    compress = request.args.get('gzip', type=parse_bool)
+    if compress is None:
+        if 'gzip' in request.args:
+            abort(400)
+        compress = request.accept_encodings['gzip'] > 0
+    chunks = export_chunks(db.session.connection(), entity, fmt, since,
+                           current_app.config.get('EXPORT_BATCH_SIZE', 2000), compress)
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={entity}.{fmt}'
+    response.vary.add('Accept-Encoding')
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+#  Metrics
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
-def create_venue_form():
-    form = VenueForm()
-    return render_template('forms/new_venue.html', form=form)
-
-
-@app.route('/venues/create', methods=['POST'])
-def create_venue_submission():
-    # TODO: insert form data as a new Venue record in the db, instead
-    # TODO: modify data to be the data object returned from db insertion
-    try:
-        # seeking_talent is a boolean, so empty is not allowed
-        # below does not work
-        # seeking_talent = request.form['seeking_talent'],
-        venue = Venue(
-            name=request.form['name'],
-            city=request.form['city'],
-            state=request.form['state'],
-            address=request.form['address'],
-            phone=request.form['phone'],
-            # getlist from genres list of request.form,
-            genres=request.form.getlist('genres'),
-            facebook_link=request.form['facebook_link'],
-            image_link=request.form['image_link'],
-            website=request.form['website_link'],
-            seeking_description=request.form['seeking_description'],
-            seeking_talent=True if 'seeking_talent' in request.form else False
-        )
-        db.session.add(venue)
-        db.session.commit()
-        # on successful db insert, flash success
-        flash('Venue ' + request.form['name'] + ' was successfully listed!')
-    except:
-        db.session.rollback()
-        print(sys.exc_info())
-        # TODO: on unsuccessful db insert, flash an error instead.
-        # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
-        flash('An error occurred: Venue ' + request.form['name'] + ' could not be posted')
-    finally:
-        db.session.close()
-    return render_template('pages/home.html')
-
-
-@app.route('/venues/<venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
-    # TODO: Complete this endpoint for taking a venue_id, and using
-    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
-
-    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
-    # clicking that button delete it from the db then redirect the user to the homepage
-    '''
-    :param venue_id:
-    Referenced from googling, Contains following features:
-    - Delete venue when red button on "/venues/<int:venue_id>" clicked on  templates/pages/show_venue.html
-    - Route gets fetched by Ajax. Javascript can be found under templates/layouts/main.html
-    - Communicate success or error with corresponding redirections and alerts
-    :return:
-    '''
-    try:
-        single_venue= db.session.query(Venue).get(venue_id)
-        db.session.delete(single_venue)
-        db.session.commit()
-        flash('Successfully deleted the venue')
-    except:
-        db.session.rollback()
-        print(sys.exc_info())
-        return jsonify({'success': False})
-        flash('An error occurred when trying to delete the venue')
-    finally:
-        db.session.close()
-    return jsonify({ 'success': True })
-
-
-
-
-#  Artists
-#  ----------------------------------------------------------------
-@app.route('/artists')
-def artists():
-    # TODO: replace with real data returned from querying the database
-    # data=[{
-    #   "id": 4,
-    #   "name": "Guns N Petals",
-    # }, {
-    #   "id": 5,
-    #   "name": "Matt Quevedo",
-    # }, {
-    #   "id": 6,
-    #   "name": "The Wild Sax Band",
-    # }]
-    data = []
-    try:
-        # data=Artist.query.all()
-        data = db.session.query(Artist).all()
-        return render_template('pages/artists.html', artists=data)
-    except:
-        flash('An error occurred. Cannot display artists')
-        return redirect(url_for('index'))
-
-
-@app.route('/artists/search', methods=['POST'])
-def search_artists():
-    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-    # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
-    # search for "band" should return "The Wild Sax Band".
-    # response={
-    #   "count": 1,
-    #   "data": [{
-    #     "id": 4,
-    #     "name": "Guns N Petals",
-    #     "num_upcoming_shows": 0,
-    #   }]
-    # }
-
-    search_term = request.form.get('search_term', '')
-    like_search = f'%{search_term}%'
-    # count
-    search_artists_count = db.session.query(Artist) \
-        .filter(db.or_(
-        Artist.name.ilike(like_search),
-        Artist.city.ilike(like_search),
-        Artist.state.ilike(like_search)
-    )).count()
-    # all matched records
-    search_artists_result = Artist.query.filter(
-        db.or_(
-            Artist.name.ilike(like_search),
-            Artist.city.ilike(like_search),
-            Artist.state.ilike(like_search)
-        )).all()
-    # print(f"search result: {search_artists_result}")
-    # create a well formatted response with above results
-    response = {
-        "count": search_artists_count,
-        "data": search_artists_result
-    }
-    return render_template('pages/search_artists.html', results=response,
-                           search_term=search_term)
-
-
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-    # shows the artist page with the given artist_id
-    # TODO: replace with real artist data from the artist table, using artist_id
-    # data1={
-    #   "id": 2,
-    #   "name": "Guns N Petals",
-    #   "genres": ["Rock n Roll"],
-    #   "city": "San Francisco",
-    #   "state": "CA",
-    #   "phone": "326-123-5000",
-    #   "website": "https://www.gunsnpetalsband.com",
-    #   "facebook_link": "https://www.facebook.com/GunsNPetals",
-    #   "seeking_venue": True,
-    #   "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
-    #   "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    #   "past_shows": [{
-    #     "venue_id": 1,
-    #     "venue_name": "The Musical Hop",
-    #     "venue_image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-    #     "start_time": "2019-05-21T21:30:00.000Z"
-    #   }],
-    #   "upcoming_shows": [],
-    #   "past_shows_count": 1,
-    #   "upcoming_shows_count": 0,
-    # }
-    # data2={
-    #   "id": 5,
-    #   "name": "Matt Quevedo",
-    #   "genres": ["Jazz"],
-    #   "city": "New York",
-    #   "state": "NY",
-    #   "phone": "300-400-5000",
-    #   "facebook_link": "https://www.facebook.com/mattquevedo923251523",
-    #   "seeking_venue": False,
-    #   "image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    #   "past_shows": [{
-    #     "venue_id": 3,
-    #     "venue_name": "Park Square Live Music & Coffee",
-    #     "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    #     "start_time": "2019-06-15T23:00:00.000Z"
-    #   }],
-    #   "upcoming_shows": [],
-    #   "past_shows_count": 1,
-    #   "upcoming_shows_count": 0,
-    # }
-    # data3={
-    #   "id": 3,
-    #   "name": "The Wild Sax Band",
-    #   "genres": ["Jazz", "Classical"],
-    #   "city": "San Francisco",
-    #   "state": "CA",
-    #   "phone": "432-325-5432",
-    #   "seeking_venue": False,
-    #   "image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #   "past_shows": [],
-    #   "upcoming_shows": [{
-    #     "venue_id": 3,
-    #     "venue_name": "Park Square Live Music & Coffee",
-    #     "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    #     "start_time": "2035-04-01T20:00:00.000Z"
-    #   }, {
-    #     "venue_id": 3,
-    #     "venue_name": "Park Square Live Music & Coffee",
-    #     "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    #     "start_time": "2035-04-08T20:00:00.000Z"
-    #   }, {
-    #     "venue_id": 3,
-    #     "venue_name": "Park Square Live Music & Coffee",
-    #     "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    #     "start_time": "2035-04-15T20:00:00.000Z"
-    #   }],
-    #   "past_shows_count": 0,
-    #   "upcoming_shows_count": 3,
-    # }
-    # single_artist = list(filter(lambda d: d['id'] == artist_id, [data1, data2, data3]))[0]
-    # single_artist=Artist.query.filter_by(id=artist_id).all()[0]
-    single_artist = Artist.query.get(artist_id)
-    # Get Past Shows, use join(Venue)
-    # see filter method on single_avenue of show_venue function
-    single_artist.past_shows = (db.session.query(
-        Venue.id.label("venue_id"),
-        Venue.name.label("venue_name"),
-        Venue.image_link.label("venue_image_link"),
-        Show).join(Venue)
-        .filter(Show.c.Artist_id == artist_id)
-        .filter(Show.c.start_time <= datetime.now())
-        .all())
-# print(f"past show is {single_artist.past_shows}")
-# Get Number of past Shows
-    single_artist.past_shows_count = len(single_artist.past_shows)
-    # Get Upcomming Shows, use join
-    single_artist.upcoming_shows = (db.session.query(
-            Venue.id.label("venue_id"),
-            Venue.name.label("venue_name"),
-            Venue.image_link.label("venue_image_link"),
-            Show).join(Venue)
-            .filter(Show.c.Artist_id == artist_id)
-            # .filter(Show.c.Venue_id == Venue.id)
-            .filter(Show.c.start_time > datetime.now())
-            .all())
-    # Get Number of Upcoming Shows
-    single_artist.upcoming_shows_count = len(single_artist.upcoming_shows)
-
-    return render_template('pages/show_artist.html', artist=single_artist)
-
-
-#  Update
-#  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
-def edit_artist(artist_id):
-# artist={
-#   "id": 4,
-#   "name": "Guns N Petals",
-#   "genres": ["Rock n Roll"],
-#   "city": "San Francisco",
-#   "state": "CA",
-#   "phone": "326-123-5000",
-#   "website": "https://www.gunsnpetalsband.com",
-#   "facebook_link": "https://www.facebook.com/GunsNPetals",
-#   "seeking_venue": True,
-#   "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
-#   "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80"
-# }
-# TODO: populate form with fields from artist with ID <artist_id>
-    form = ArtistForm()
-    artist = Artist.query.get(artist_id)
-# Pre Fill form with data
-    form.name.data = artist.name
-    form.city.data = artist.city
-    form.state.data = artist.state
-    form.phone.data = artist.phone
-    form.genres.data = artist.genres
-    form.facebook_link.data = artist.facebook_link
-    form.image_link.data = artist.image_link
-    form.website_link.data = artist.website
-    form.seeking_venue.data = artist.seeking_venue
-    form.seeking_description.data = artist.seeking_description
-    return render_template('forms/edit_artist.html', form=form, artist=artist)
-
-
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
-def edit_artist_submission(artist_id):
-    # TODO: take values from the form submitted, and update existing
-    # artist record with ID <artist_id> using the new attributes
-    artist = Artist.query.get(artist_id)
-    try:
-        form = ArtistForm(request.form)
-        if form.validate():
-            # update the attributes
-            artist.name = request.form['name']
-            artist.city = request.form['city']
-            artist.state = request.form['state']
-            artist.phone = request.form['phone']
-            # getlist from genres list of request.form,
-            artist.genres = request.form.getlist('genres')
-            artist.facebook_link = request.form['facebook_link']
-            artist.image_link = request.form['image_link']
-            artist.website = request.form['website_link']
-            artist.seeking_venue = True if 'seeking_venue' in request.form else False
-            # artist.seeking_venue = form.seeking_venue.data
-            artist.seeking_description = request.form['seeking_description']
-            print(f"request form: {request.form}")
-            db.session.add(artist)
-            db.session.commit()
-            # on successful db insert, flash success
-            flash('Artist ' + request.form['name'] + ' was successfully Updated!')
-        else:
-            errorMessage = "Errors in the following fields: "
-            for error in form.errors: errorMessage += error + " "
-            flash(errorMessage)
-    except:
-        db.session.rollback()
-        print(sys.exc_info())
-        flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
-    finally:
-        db.session.close()
-    return redirect(url_for('show_artist', artist_id=artist_id))
-
-
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
-def edit_venue(venue_id):
-    form = VenueForm()
-    # venue={
-    #   "id": 1,
-    #   "name": "The Musical Hop",
-    #   "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
-    #   "address": "1015 Folsom Street",
-    #   "city": "San Francisco",
-    #   "state": "CA",
-    #   "phone": "123-123-1234",
-    #   "website": "https://www.themusicalhop.com",
-    #   "facebook_link": "https://www.facebook.com/TheMusicalHop",
-    #   "seeking_talent": True,
-    #   "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
-    #   "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60"
-    # }
-    # TODO: populate form with values from venue with ID <venue_id>
-
-    venue = Venue.query.get(venue_id)
-
-    # Pre Fill form with data
-    form.name.data = venue.name
-    form.city.data = venue.city
-    form.state.data = venue.state
-    form.address.data = venue.address
-    form.phone.data = venue.phone
-    form.genres.data = venue.genres
-    form.facebook_link.data = venue.facebook_link
-    form.image_link.data = venue.image_link
-    form.website_link.data = venue.website
-    form.seeking_talent.data = venue.seeking_talent
-    form.seeking_description.data = venue.seeking_description
-    return render_template('forms/edit_venue.html', form=form, venue=venue)
-
-
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
-def edit_venue_submission(venue_id):
-    # TODO: take values from the form submitted, and update existing
-    # venue record with ID <venue_id> using the new attributes
-
-    venue = Venue.query.get(venue_id)
-    # update the attributes
-    venue.name = request.form['name']
-    venue.city = request.form['city']
-    venue.state = request.form['state']
-    venue.phone = request.form['phone']
-    # getlist from genres list of request.form,
-    venue.genres = request.form.getlist('genres')
-    print(f"genres: {venue.genres}")
-    venue.facebook_link = request.form['facebook_link']
-    venue.image_link = request.form['image_link']
-    venue.website = request.form['website_link']
-    venue.seeking_talent = True if 'seek_venue' in request.form else False
-    venue.seeking_description = request.form['seeking_description']
-
-    db.session.add(venue)
-    db.session.commit()
-    db.session.close()
-
-    return redirect(url_for('show_venue', venue_id=venue_id))
-
-
-#  Create Artist
-#  ----------------------------------------------------------------
+def sample_queries():
+    if random.random() < current_app.config.get('QUERY_METRICS_SAMPLE_RATE', 0):
+        g.query_stats = QueryStats()
+
+
+def add_server_timing(response):
+    stats = g.get('query_stats')
+    if stats is not None:
+        # statements a streamed body runs later are left out of the header,
+        # not out of the metrics
+        response.headers['Server-Timing'] = f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"'
+    return response
+
+
+def record_queries(error=None):
+    stats = g.pop('query_stats', None)
+    if stats is None or request.url_rule is None:
+        return
+    route = f'{request.method} {request.url_rule.rule}'
+    repeated = stats.repeated(current_app.config.get('N_PLUS_ONE_THRESHOLD', 5))
+    for statement, count in repeated.items():
+        current_app.logger.warning('suspected N+1 in %s: ran %d times: %s',
+                                   route, count, ' '.join(statement.split())[:200])
+    route_metrics.observe(route, stats, repeated)
+
+
+def require_token(name):
+    # Authorization: Bearer <the token in config[name]>. not found otherwise,
+    # so the endpoint does not show from the outside
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme != 'Bearer' or not hmac.compare_digest(token.encode(), current_app.config[name].encode()):
+        abort(404)
 
-@app.route('/artists/create', methods=['GET'])
-def create_artist_form():
-    form = ArtistForm()
-    return render_template('forms/new_artist.html', form=form)
-
-
-@app.route('/artists/create', methods=['POST'])
-def create_artist_submission():
-    # called upon submitting the new artist listing form
-    # TODO: insert form data as a new Venue record in the db, instead
-    # TODO: modify data to be the data object returned from db insertion
-    try:
-        form = ArtistForm(request.form)
-        print(f"name is: {form.name.data}")
-        print(f"form validate result: {form.validate()}")
-        if form.validate():
-            artist = Artist(
-                name=form.name.data,
-                city=form.city.data,
-                state=form.state.data,
-                phone=form.phone.data,
-                # get genres list with form.genres.data
-                genres=form.genres.data,
-                facebook_link=form.facebook_link.data,
-                image_link=form.image_link.data,
-                website=form.website_link.data,
-                seeking_description=form.seeking_description.data,
-                seeking_venue=form.seeking_venue.data)
-            # print(f"genres name : {artist.genres}")
-            db.session.add(artist)
-            db.session.commit()
-            # on successful db insert, flash success
-            flash('Artist ' + request.form['name'] + ' was successfully listed!')
-        else:
-            errorMessage = "Errors in the following fields: "
-            for error in form.errors: errorMessage += error + " "
-            flash(errorMessage)
-    # add duplication check on name
-    except sqlalchemy.exc.IntegrityError as e:
-        db.session.rollback()
-        print(f"Duplicate entry detected!\n {e}")
-        flash("Duplicate entry occurred: " + str(e))
-    except:
-        db.session.rollback()
-        print(sys.exc_info())
-        # TODO: on unsuccessful db insert, flash an error instead.
-        flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
-    finally:
-        db.session.close()
-    return render_template('pages/home.html')
 
+def debug_metrics():
+    # numbers of this process only, see metrics.py
+    require_token('DEBUG_METRICS_TOKEN')
+    return jsonify({"pool": pool_metrics.to_dict(db.engine.pool), **route_metrics.to_dict()})
 
-#  Shows
-#  ----------------------------------------------------------------
 
-@app.route('/shows')
-def shows():
-    # displays list of shows at /shows
-    # TODO: replace with real venues data.
-    # data=[{
-    #   "venue_id": 1,
-    #   "venue_name": "The Musical Hop",
-    #   "artist_id": 4,
-    #   "artist_name": "Guns N Petals",
-    #   "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    #   "start_time": "2019-05-21T21:30:00.000Z"
-    # }, {
-    #   "venue_id": 3,
-    #   "venue_name": "Park Square Live Music & Coffee",
-    #   "artist_id": 5,
-    #   "artist_name": "Matt Quevedo",
-    #   "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    #   "start_time": "2019-06-15T23:00:00.000Z"
-    # }, {
-    #   "venue_id": 3,
-    #   "venue_name": "Park Square Live Music & Coffee",
-    #   "artist_id": 6,
-    #   "artist_name": "The Wild Sax Band",
-    #   "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #   "start_time": "2035-04-01T20:00:00.000Z"
-    # }, {
-    #   "venue_id": 3,
-    #   "venue_name": "Park Square Live Music & Coffee",
-    #   "artist_id": 6,
-    #   "artist_name": "The Wild Sax Band",
-    #   "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #   "start_time": "2035-04-08T20:00:00.000Z"
-    # }, {
-    #   "venue_id": 3,
-    #   "venue_name": "Park Square Live Music & Coffee",
-    #   "artist_id": 6,
-    #   "artist_name": "The Wild Sax Band",
-    #   "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #   "start_time": "2035-04-15T20:00:00.000Z"
-    # }]
-    # Make a database query to get all shows
-    # Rename Fields so frontend can access the correct values
-    shows = (db.session.query(
-        Venue.id.label("venue_id"),
-        Venue.name.label("venue_name"),
-        Artist.id.label("artist_id"),
-        Artist.name.label("artist_name"),
-        Artist.image_link.label("artist_image_link"),
-        Show)
-             .filter(Show.c.Venue_id == Venue.id)
-             .filter(Show.c.Artist_id == Artist.id)
-             .all())
-    return render_template('pages/shows.html', shows=shows)
-
-
-@app.route('/shows/create')
-def create_shows():
-    # renders form. do not touch.
-    form = ShowForm()
-    return render_template('forms/new_show.html', form=form)
-
-
-@app.route('/shows/create', methods=['POST'])
-def create_show_submission():
-    # called to create new shows in the db, upon submitting new show listing form
-    # TODO: insert form data as a new Show record in the db, instead
-    try:
-        form = ShowForm(request.form)  # Initialize form instance with values from the request
-        print(f"form validate result: {form.validate()}")
-        if form.validate():
-            show = Show.insert().values(
-                Venue_id=form.venue_id.data,
-                Artist_id=form.artist_id.data,
-                start_time=form.start_time.data)
-            db.session.execute(show)
-            db.session.commit()
-            # on successful db insert, flash success
-            flash('Show was successfully listed!')
-        else:
-            errorMessage = "Errors in the following fields: "
-            for error in form.errors: errorMessage += error + " "
-            flash(errorMessage)
-    except:
-        db.session.rollback()
-        print(sys.exc_info())
-        # TODO: on unsuccessful db insert, flash an error instead.
-        flash('An error occurred. Show could not be listed.')
-    finally:
-        db.session.close()
-    return render_template('pages/home.html')
+def bad_request_error(error):
+    if request.path.startswith(api.API_PREFIX):
+        return jsonify({"error": 400, "message": "bad request"}), 400
+    return error
 
 
-@app.errorhandler(404)
 def not_found_error(error):
+    if request.path.startswith(api.API_PREFIX):
+        return jsonify({"error": 404, "message": "not found"}), 404
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+# ----------------------------------------------------------------------------#
+# App Config.
+# ----------------------------------------------------------------------------#
+
+def create_app(test_config=None):
+    # create and configure the app
+    app = Flask(__name__)
+    app.config.from_object('config')
+    if test_config is not None:
+        app.config.update(test_config)
+    # time every pool checkout, see metrics.py
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'poolclass': TimedQueuePool,
+                                               **app.config['SQLALCHEMY_ENGINE_OPTIONS']}
+    moment.init_app(app)
+    db.init_app(app)
+    # flask_migrate imports alembic, a third of the startup time: only the
+    # 'flask db' commands need it, and they build the app inside click
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db, compare_type=True)
+
+    app.jinja_env.filters['datetime'] = format_datetime
+    if app.config.get('JINJA_BYTECODE_CACHE'):
+        if app.config.get('JINJA_BYTECODE_CACHE_DIR'):
+            os.makedirs(app.config['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config.get('JINJA_BYTECODE_CACHE_DIR'))
+
+    # rendered venue/artist detail pages, see cache.py
+    app.extensions['page_cache'] = create_page_cache(app.config)
+
+    app.add_url_rule('/', view_func=index)
+    app.register_blueprint(venues.bp)
+    app.register_blueprint(artists.bp)
+    app.register_blueprint(shows.bp)
+    app.register_blueprint(api.bp)
+    if app.config.get('EXPORT_TOKEN'):
+        app.add_url_rule('/export/<entity>.<fmt>', view_func=export)
+    if app.config.get('DEBUG_METRICS_TOKEN'):
+        app.add_url_rule('/debug/metrics', view_func=debug_metrics)
+
+    app.before_request(sample_queries)
+    app.after_request(add_server_timing)
+    app.teardown_request(record_queries)
+    app.register_error_handler(400, bad_request_error)
+    app.register_error_handler(404, not_found_error)
+    app.register_error_handler(500, server_error)
+
+    # flask fyyur <command>, see commands.py
+    app.cli.add_command(fyyur_cli)
+
+    if not app.debug:
+        file_handler = FileHandler('error.log')
+        file_handler.setFormatter(
+            Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.info('errors')
+
+    # compiled at startup, before the first request (or the fork of gunicorn --preload)
+    if app.config.get('PRECOMPILE_TEMPLATES'):
+        precompile_templates(app)
+    return app
+
 
 # ----------------------------------------------------------------------------#
 # Launch.
@@ -836,11 +224,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run(host="0.0.0.0")
+    create_app().run(host="0.0.0.0")
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
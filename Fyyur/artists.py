@@ -0,0 +1,314 @@
+# ----------------------------------------------------------------------------#
+# Artist pages: listing, search, detail, create and edit.
+# ----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime
+
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+from sqlalchemy.orm.exc import StaleDataError
+
+from forms import *
+from helpers import *
+from models import *
+from replicas import read_only
+
+bp = Blueprint('artists', __name__)
+
+
+#  Artists
+#  ----------------------------------------------------------------
+@bp.route('/artists')
+@read_only
+def artists():
+    # TODO: replace with real data returned from querying the database
+    # data=[{
+    #   "id": 4,
+    #   "name": "Guns N Petals",
+    # }, {
+    #   "id": 5,
+    #   "name": "Matt Quevedo",
+    # }, {
+    #   "id": 6,
+    #   "name": "The Wild Sax Band",
+    # }]
+    # keyset pagination on (name, id), ?after=/?before= carry the cursor of the
+    # last/first artist shown; only the columns the template renders are loaded
+    after = decode_cursor(request.args.get('after'), (str, int))
+    before = decode_cursor(request.args.get('before'), (str, int))
+    per_page = current_app.config.get('ARTISTS_PER_PAGE')
+    # ?genre= narrows the artists, see genre_filter
+    criteria, genres, match = genre_filter(Artist)
+    data = []
+    prev_cursor = next_cursor = None
+    try:
+        # data=Artist.query.all()
+        query = db.session.query(Artist.id, Artist.name).filter(*criteria)
+        if per_page is None:
+            data = query.order_by(Artist.name, Artist.id).all()
+        else:
+            data, prev_cursor, next_cursor = keyset_page(
+                query, [Artist.name, Artist.id], per_page, after=after, before=before)
+        return render_template('pages/artists.html', artists=data,
+                               prev_cursor=prev_cursor, next_cursor=next_cursor,
+                               genres=genres, match=match, facets=genre_facets(Artist, criteria))
+    except:
+        flash('An error occurred. Cannot display artists')
+        return redirect(url_for('index'))
+
+
+@bp.route('/artists/search', methods=['POST'])
+@read_only
+def search_artists():
+    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+    # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+    # search for "band" should return "The Wild Sax Band".
+    # response={
+    #   "count": 1,
+    #   "data": [{
+    #     "id": 4,
+    #     "name": "Guns N Petals",
+    #     "num_upcoming_shows": 0,
+    #   }]
+    # }
+
+    search_term = request.form.get('search_term', '')
+    response = search_by_term(Artist, search_term)
+    return render_template('pages/search_artists.html', results=response,
+                           search_term=search_term)
+
+
+@bp.route('/artists/<int:artist_id>')
+@read_only
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    # TODO: replace with real artist data from the artist table, using artist_id
+    # data1={
+    #   "id": 2,
+    #   "name": "Guns N Petals",
+    #   "genres": ["Rock n Roll"],
+    #   "city": "San Francisco",
+    #   "state": "CA",
+    #   "phone": "326-123-5000",
+    #   "website": "https://www.gunsnpetalsband.com",
+    #   "facebook_link": "https://www.facebook.com/GunsNPetals",
+    #   "seeking_venue": True,
+    #   "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
+    #   "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
+    #   "past_shows": [{
+    #     "venue_id": 1,
+    #     "venue_name": "The Musical Hop",
+    #     "venue_image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
+    #     "start_time": "2019-05-21T21:30:00.000Z"
+    #   }],
+    #   "upcoming_shows": [],
+    #   "past_shows_count": 1,
+    #   "upcoming_shows_count": 0,
+    # }
+    # data2={
+    #   "id": 5,
+    #   "name": "Matt Quevedo",
+    #   "genres": ["Jazz"],
+    #   "city": "New York",
+    #   "state": "NY",
+    #   "phone": "300-400-5000",
+    #   "facebook_link": "https://www.facebook.com/mattquevedo923251523",
+    #   "seeking_venue": False,
+    #   "image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
+    #   "past_shows": [{
+    #     "venue_id": 3,
+    #     "venue_name": "Park Square Live Music & Coffee",
+    #     "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
+    #     "start_time": "2019-06-15T23:00:00.000Z"
+    #   }],
+    #   "upcoming_shows": [],
+    #   "past_shows_count": 1,
+    #   "upcoming_shows_count": 0,
+    # }
+    # data3={
+    #   "id": 3,
+    #   "name": "The Wild Sax Band",
+    #   "genres": ["Jazz", "Classical"],
+    #   "city": "San Francisco",
+    #   "state": "CA",
+    #   "phone": "432-325-5432",
+    #   "seeking_venue": False,
+    #   "image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #   "past_shows": [],
+    #   "upcoming_shows": [{
+    #     "venue_id": 3,
+    #     "venue_name": "Park Square Live Music & Coffee",
+    #     "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
+    #     "start_time": "2035-04-01T20:00:00.000Z"
+    #   }, {
+    #     "venue_id": 3,
+    #     "venue_name": "Park Square Live Music & Coffee",
+    #     "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
+    #     "start_time": "2035-04-08T20:00:00.000Z"
+    #   }, {
+    #     "venue_id": 3,
+    #     "venue_name": "Park Square Live Music & Coffee",
+    #     "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
+    #     "start_time": "2035-04-15T20:00:00.000Z"
+    #   }],
+    #   "past_shows_count": 0,
+    #   "upcoming_shows_count": 3,
+    # }
+    # single_artist = list(filter(lambda d: d['id'] == artist_id, [data1, data2, data3]))[0]
+    # single_artist=Artist.query.filter_by(id=artist_id).all()[0]
+    # serve the rendered page from the page cache while nothing changed
+    now = datetime.now()
+    cache_key = f'artist:{artist_id}'
+    cacheable = page_cacheable()
+    page, last_modified, settled = cached_page(cache_key) if cacheable else (None, None, None)
+    if page is not None:
+        return page_response(page, last_modified, settled)
+    single_artist, version, checked_at = load_with_version(
+        Artist, Show.c.Artist_id, Venue, Show.c.Venue_id, artist_id, now)
+    if single_artist is None:
+        abort(404)
+    last_modified = last_modified_of(version)
+    if not modified_since(last_modified):
+        return page_response(None, last_modified, settles_in(last_modified, checked_at) == 0)
+    # Get past and upcoming shows in one query, use join(Venue)
+    # see split_shows and show_venue function
+    load_artist_shows(single_artist, now,
+                      request.args.get('limit', current_app.config.get('SHOWS_LIMIT'), type=int))
+    page = render_template('pages/show_artist.html', artist=single_artist)
+    if cacheable:
+        cache_page(cache_key, page, single_artist.upcoming_shows, last_modified, checked_at)
+    return page_response(page, last_modified, settles_in(last_modified, checked_at) == 0)
+
+
+#  Update
+#  ----------------------------------------------------------------
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+# artist={
+#   "id": 4,
+#   "name": "Guns N Petals",
+#   "genres": ["Rock n Roll"],
+#   "city": "San Francisco",
+#   "state": "CA",
+#   "phone": "326-123-5000",
+#   "website": "https://www.gunsnpetalsband.com",
+#   "facebook_link": "https://www.facebook.com/GunsNPetals",
+#   "seeking_venue": True,
+#   "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
+#   "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80"
+# }
+# TODO: populate form with fields from artist with ID <artist_id>
+    form = ArtistForm()
+    artist = Artist.query.get(artist_id)
+# Pre Fill form with data
+    form.name.data = artist.name
+    form.city.data = artist.city
+    form.state.data = artist.state
+    form.phone.data = artist.phone
+    form.genres.data = artist.genres
+    form.facebook_link.data = artist.facebook_link
+    form.image_link.data = artist.image_link
+    form.website_link.data = artist.website
+    form.seeking_venue.data = artist.seeking_venue
+    form.seeking_description.data = artist.seeking_description
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # TODO: take values from the form submitted, and update existing
+    # artist record with ID <artist_id> using the new attributes
+    artist = Artist.query.get(artist_id)
+    try:
+        form = ArtistForm(request.form)
+        if form.validate():
+            # optimistic concurrency: the form carries the version it was filled
+            # from, and the UPDATE only applies to that version (version_id_col)
+            check_version(artist, request.form.get('version', type=int))
+            # update the attributes
+            artist.name = request.form['name']
+            artist.city = request.form['city']
+            artist.state = request.form['state']
+            artist.phone = request.form['phone']
+            # getlist from genres list of request.form,
+            artist.genres = request.form.getlist('genres')
+            artist.facebook_link = request.form['facebook_link']
+            artist.image_link = request.form['image_link']
+            artist.website = request.form['website_link']
+            artist.seeking_venue = True if 'seeking_venue' in request.form else False
+            # artist.seeking_venue = form.seeking_venue.data
+            artist.seeking_description = request.form['seeking_description']
+            print(f"request form: {request.form}")
+            db.session.add(artist)
+            db.session.commit()
+            invalidate_pages(venue_ids=show_partner_ids(Show.c.Artist_id, Show.c.Venue_id, artist_id),
+                             artist_ids=[artist_id])
+            # on successful db insert, flash success
+            flash('Artist ' + request.form['name'] + ' was successfully Updated!')
+        else:
+            errorMessage = "Errors in the following fields: "
+            for error in form.errors: errorMessage += error + " "
+            flash(errorMessage)
+    except StaleDataError:
+        db.session.rollback()
+        flash('Artist ' + request.form['name'] + ' was changed by someone else meanwhile. '
+              'Review the changes and submit again.')
+        return redirect(url_for('.edit_artist', artist_id=artist_id))
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+    return redirect(url_for('.show_artist', artist_id=artist_id))
+
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    # called upon submitting the new artist listing form
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+    try:
+        form = ArtistForm(request.form)
+        print(f"name is: {form.name.data}")
+        print(f"form validate result: {form.validate()}")
+        if form.validate():
+            artist = Artist(
+                name=form.name.data,
+                city=form.city.data,
+                state=form.state.data,
+                phone=form.phone.data,
+                # get genres list with form.genres.data
+                genres=form.genres.data,
+                facebook_link=form.facebook_link.data,
+                image_link=form.image_link.data,
+                website=form.website_link.data,
+                seeking_description=form.seeking_description.data,
+                seeking_venue=form.seeking_venue.data)
+            # print(f"genres name : {artist.genres}")
+            db.session.add(artist)
+            db.session.commit()
+            # on successful db insert, flash success
+            flash('Artist ' + request.form['name'] + ' was successfully listed!')
+        else:
+            errorMessage = "Errors in the following fields: "
+            for error in form.errors: errorMessage += error + " "
+            flash(errorMessage)
+    # add duplication check on name
+    except sqlalchemy.exc.IntegrityError as e:
+        db.session.rollback()
+        print(f"Duplicate entry detected!\n {e}")
+        flash("Duplicate entry occurred: " + str(e))
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        # TODO: on unsuccessful db insert, flash an error instead.
+        flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+    return render_template('pages/home.html')
@@ -0,0 +1,93 @@
+# ----------------------------------------------------------------------------#
+# Benchmark the streaming /export endpoints on a multi-million-row Show table.
+#
+#   createdb fyyur_bench
+#   python benchmarks/export.py --shows 200000 2000000
+#
+# Throughput is reported per format with and without gzip, and the peak
+# resident memory of the process after every run: it must stay flat as the
+# table grows. WARNING: the benchmark database is emptied, never point it at
+# real data.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+
+BENCH_DATABASE_URI = os.environ.get(
+    'BENCH_DATABASE_URL', 'postgresql://jiazhang@localhost:5432/fyyur_bench')
+VENUES = 1000
+ARTISTS = 10000
+
+SEED_VENUES = '''
+INSERT INTO "Venue" (name, city, state, genres, seeking_talent)
+SELECT 'Venue ' || i, 'San Francisco', 'CA', ARRAY['Jazz', 'Folk'], false
+FROM generate_series(1, :rows) AS i
+'''
+SEED_ARTISTS = '''
+INSERT INTO "Artist" (name, city, state, genres)
+SELECT 'Artist ' || i, 'New York', 'NY', ARRAY['Rock n Roll']
+FROM generate_series(1, :rows) AS i
+'''
+SEED_SHOWS = '''
+INSERT INTO "Show" ("Venue_id", "Artist_id", start_time)
+SELECT 1 + i % :venues, 1 + i % :artists, timestamp '2020-01-01' + i * interval '1 minute'
+FROM generate_series(1, :rows) AS i
+'''
+
+
+def seed(shows):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(db.text(SEED_VENUES), {'rows': VENUES})
+    db.session.execute(db.text(SEED_ARTISTS), {'rows': ARTISTS})
+    # the show counters are not exported, skip their per row trigger
+    db.session.execute(db.text('ALTER TABLE "Show" DISABLE TRIGGER show_counters'))
+    db.session.execute(db.text(SEED_SHOWS), {'rows': shows, 'venues': VENUES, 'artists': ARTISTS})
+    db.session.execute(db.text('ALTER TABLE "Show" ENABLE TRIGGER show_counters'))
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+
+def time_export(client, fmt, compress):
+    headers = {'Accept-Encoding': 'gzip' if compress else 'identity', 'Authorization': 'Bearer bench'}
+    started = time.perf_counter()
+    res = client.get(f'/export/shows.{fmt}', headers=headers, buffered=False)
+    assert res.status_code == 200, res.status_code
+    size = sum(len(chunk) for chunk in res.response)
+    res.close()
+    return time.perf_counter() - started, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the streaming show export')
+    parser.add_argument('--shows', type=int, nargs='+', default=[200000, 2000000])
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': BENCH_DATABASE_URI, 'TESTING': True,
+                      'EXPORT_TOKEN': 'bench'})
+    with app.app_context():
+        client = app.test_client()
+        print(f'{"shows":>10}{"format":>8}{"gzip":>6}{"seconds":>10}{"rows/s":>12}{"MB":>10}{"peak RSS MB":>14}')
+        for shows in sorted(args.shows):
+            seed(shows)
+            db.session.remove()
+            for fmt in ['csv', 'ndjson']:
+                for compress in [False, True]:
+                    elapsed, size = time_export(client, fmt, compress)
+                    # ru_maxrss is in kilobytes on linux
+                    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                    print(f'{shows:>10}{fmt:>8}{"yes" if compress else "no":>6}{elapsed:>10.2f}'
+                          f'{shows / elapsed:>12.0f}{size / 2 ** 20:>10.1f}{peak:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+# ----------------------------------------------------------------------------#
+# Load test Fyyur served by gunicorn with concurrent clients.
+#
+#   createdb fyyur_bench
+#   python benchmarks/load.py --size 100k --workers 4 --clients 32 --duration 60
+#   python benchmarks/load.py --url http://127.0.0.1:5000 --no-seed --rate 200
+#
+# Every client replays a random mix of requests (--mix): the venue and
+# artist listings, their detail pages, searches and show creation. Without
+# --rate a client sends its next request as soon as the last one answered
+# (closed loop, finds the throughput limit); with --rate the clients send
+# that many requests per second in total, and latency counts from the time a
+# request was due, so a stalled server shows up in the tail instead of
+# slowing the clients down (no coordinated omission). Latencies go into
+# HDR-style histograms, and a JSON report (--report) holds throughput,
+# error rates and percentiles per request type for comparing releases.
+# WARNING: the benchmark database is emptied unless --no-seed is given.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from collections import Counter
+
+FYYUR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FYYUR_DIR)
+
+BENCH_DATABASE_URI = os.environ.get(
+    'BENCH_DATABASE_URL', 'postgresql://jiazhang@localhost:5432/fyyur_bench')
+# /debug/metrics of the server, see DEBUG_METRICS_TOKEN in config.py
+METRICS_TOKEN = os.environ.get('DEBUG_METRICS_TOKEN', 'bench')
+METRICS_HEADERS = {'Authorization': f'Bearer {METRICS_TOKEN}'}
+
+SEARCH_TERMS = ['blue', 'hall', 'owls', 'velvet', 'new york', 'tx', 'zzz']
+
+# request type -> default share of the mix
+MIX = {
+    'venues': 20,
+    'artists': 15,
+    'venue': 25,
+    'artist': 20,
+    'search': 15,
+    'create_show': 5,
+}
+
+
+def build_request(name, rng, venue_ids, artist_ids):
+    """(method, path, form) of one request of the type name."""
+    if name == 'venues':
+        return 'GET', '/venues', None
+    if name == 'artists':
+        return 'GET', '/artists', None
+    if name == 'venue':
+        return 'GET', f'/venues/{rng.choice(venue_ids)}', None
+    if name == 'artist':
+        return 'GET', f'/artists/{rng.choice(artist_ids)}', None
+    if name == 'search':
+        path = rng.choice(['/venues/search', '/artists/search'])
+        return 'POST', path, {'search_term': rng.choice(SEARCH_TERMS)}
+    if name == 'create_show':
+        start_time = f'2030-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(19, 22)}:00:00'
+        return 'POST', '/shows/create', {'venue_id': rng.choice(venue_ids),
+                                         'artist_id': rng.choice(artist_ids),
+                                         'start_time': start_time}
+    raise ValueError(f'unknown request type {name!r}')
+
+
+class HdrHistogram:
+    """Latency histogram over microseconds with buckets of constant relative
+    width (about 1.5%), from 1us to hours, in the manner of HdrHistogram:
+    exact below 128us, then 64 linear sub-buckets per power of two."""
+
+    SUB_BUCKETS = 64
+
+    def __init__(self):
+        # bucket index -> count; sparse, a run touches a few hundred buckets
+        self.counts = Counter()
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def index(self, value):
+        if value < 2 * self.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - self.SUB_BUCKETS.bit_length()
+        return 2 * self.SUB_BUCKETS + (shift - 1) * self.SUB_BUCKETS + (value >> shift) - self.SUB_BUCKETS
+
+    def highest_equivalent(self, index):
+        # the largest value counted in bucket index
+        if index < 2 * self.SUB_BUCKETS:
+            return index
+        shift, sub = divmod(index - 2 * self.SUB_BUCKETS, self.SUB_BUCKETS)
+        return ((sub + self.SUB_BUCKETS + 1) << (shift + 1)) - 1
+
+    def record(self, seconds):
+        value = max(1, int(seconds * 1000000))
+        self.counts[self.index(value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """Latency in milliseconds at or below which q percent of the requests completed."""
+        if not self.total:
+            return 0.0
+        rank, seen = max(1, round(q / 100 * self.total)), 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.highest_equivalent(index), self.max) / 1000
+        return self.max / 1000
+
+    def to_dict(self):
+        return {
+            "count": self.total,
+            "mean_ms": round(self.sum / self.total / 1000, 3) if self.total else 0.0,
+            "max_ms": self.max / 1000,
+            "percentiles_ms": {str(q): round(self.percentile(q), 3)
+                               for q in (50, 75, 90, 95, 99, 99.9, 99.99)},
+        }
+
+
+class ClientResults:
+    """What one client thread saw, merged into the report at the end."""
+
+    def __init__(self):
+        self.latency = {}
+        self.errors = {}
+
+    def record(self, name, seconds, error):
+        self.latency.setdefault(name, HdrHistogram()).record(seconds)
+        if error:
+            self.errors.setdefault(name, Counter())[error] += 1
+
+
+def client_loop(url, names, cum_weights, venue_ids, artist_ids, seed, started, warmup,
+                deadline, interval, timeout, results):
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+    # spread the first requests of the clients over one interval
+    due = started + rng.random() * interval if interval else started
+    while True:
+        if interval:
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            sent = due
+            due += interval
+        else:
+            sent = time.perf_counter()
+        if sent >= deadline:
+            break
+        name = rng.choices(names, cum_weights=cum_weights)[0]
+        method, path, form = build_request(name, rng, venue_ids, artist_ids)
+        body = urllib.parse.urlencode(form) if form else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form else {}
+        error = None
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                error = f'http {response.status}'
+        except (OSError, http.client.HTTPException) as e:
+            error = type(e).__name__
+            connection.close()
+        if sent >= started + warmup:
+            results.record(name, time.perf_counter() - sent, error)
+    connection.close()
+
+
+def parse_mix(value):
+    mix = dict(MIX)
+    if value:
+        mix = {}
+        for part in value.split(','):
+            name, _, weight = part.partition('=')
+            if name not in MIX:
+                raise SystemExit(f'unknown request type {name!r}, one of {", ".join(MIX)}')
+            mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def bench_app():
+    """The app gunicorn serves, on the benchmark database:
+    gunicorn 'benchmarks.load:bench_app()'."""
+    from app import create_app
+    # the forms carry no csrf token, a load test posts them as they are
+    return create_app({'SQLALCHEMY_DATABASE_URI': BENCH_DATABASE_URI, 'WTF_CSRF_ENABLED': False,
+                       'DEBUG_METRICS_TOKEN': METRICS_TOKEN})
+
+
+def start_gunicorn(port, workers, threads):
+    # gunicorn.conf.py preloads the app once and forks the workers from it
+    command = [sys.executable, '-m', 'gunicorn', '--chdir', FYYUR_DIR,
+               '--config', os.path.join(FYYUR_DIR, 'gunicorn.conf.py'),
+               '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+               '--log-level', 'warning', 'benchmarks.load:bench_app()']
+    # served as in production: no debug, templates compiled at startup
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, env=dict(os.environ, FLASK_DEBUG='0'))
+    for _ in range(300):
+        if server.poll() is not None:
+            raise SystemExit(f'gunicorn exited with {server.returncode}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/debug/metrics', headers=METRICS_HEADERS)
+            connection.getresponse().read()
+            connection.close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise SystemExit('gunicorn did not start within 30s')
+
+
+def server_metrics(url):
+    # one worker's pool and route metrics, whichever answers
+    try:
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=5)
+        connection.request('GET', '/debug/metrics', headers=METRICS_HEADERS)
+        return json.loads(connection.getresponse().read())
+    except (OSError, http.client.HTTPException, ValueError):
+        return None
+
+
+def entity_ids():
+    from app import create_app
+    from models import db, Venue, Artist
+    app = create_app({'SQLALCHEMY_DATABASE_URI': BENCH_DATABASE_URI})
+    with app.app_context():
+        venue_ids = [venue_id for venue_id, in db.session.query(Venue.id)]
+        artist_ids = [artist_id for artist_id, in db.session.query(Artist.id)]
+        db.session.remove()
+        db.engine.dispose()
+    return venue_ids, artist_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test Fyyur served by gunicorn')
+    parser.add_argument('--url', help='load an already running server instead of starting gunicorn')
+    parser.add_argument('--size', default='100k', help='seed size, see benchmarks/seed.py (default 100k)')
+    parser.add_argument('--no-seed', action='store_true', help='reuse the seeded database as is')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--rate', type=float, help='requests per second of all clients (default: closed loop)')
+    parser.add_argument('--duration', type=float, default=30, help='seconds measured')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds run before measuring')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds before a request fails')
+    parser.add_argument('--mix', help='request type=weight list, default ' +
+                        ','.join(f'{name}={weight}' for name, weight in MIX.items()))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report', default='load-report.json', help='JSON report file')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    if not args.no_seed:
+        from app import create_app
+        from models import db
+        from seed import parse_size, seed
+        app = create_app({'SQLALCHEMY_DATABASE_URI': BENCH_DATABASE_URI})
+        with app.app_context():
+            seed(parse_size(args.size), args.seed)
+            db.session.remove()
+    venue_ids, artist_ids = entity_ids()
+
+    server = None
+    if args.url:
+        url = urllib.parse.urlsplit(args.url)
+    else:
+        server = start_gunicorn(args.port, args.workers, args.threads)
+        url = urllib.parse.urlsplit(f'http://127.0.0.1:{args.port}')
+    try:
+        names = list(mix)
+        cum_weights = list(itertools.accumulate(mix.values()))
+        interval = args.clients / args.rate if args.rate else 0
+        started = time.perf_counter() + 0.1
+        deadline = started + args.warmup + args.duration
+        clients = []
+        for i in range(args.clients):
+            results = ClientResults()
+            thread = threading.Thread(target=client_loop, daemon=True, args=(
+                url, names, cum_weights, venue_ids, artist_ids, args.seed * 1000 + i,
+                started, args.warmup, deadline, interval, args.timeout, results))
+            thread.start()
+            clients.append((thread, results))
+        for thread, _ in clients:
+            thread.join()
+        metrics = server_metrics(url)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    overall, errors = HdrHistogram(), Counter()
+    per_type = {}
+    for name in names:
+        latency, type_errors = HdrHistogram(), Counter()
+        for _, results in clients:
+            if name in results.latency:
+                latency.merge(results.latency[name])
+            type_errors.update(results.errors.get(name, {}))
+        overall.merge(latency)
+        errors.update(type_errors)
+        per_type[name] = {
+            "requests": latency.total,
+            "throughput_rps": round(latency.total / args.duration, 2),
+            "errors": dict(type_errors),
+            "error_rate": round(sum(type_errors.values()) / latency.total, 5) if latency.total else 0.0,
+            "latency": latency.to_dict(),
+        }
+    report = {
+        "config": {
+            "url": args.url, "workers": None if args.url else args.workers,
+            "threads": None if args.url else args.threads, "clients": args.clients,
+            "rate": args.rate, "duration": args.duration, "warmup": args.warmup, "mix": mix,
+            "size": None if args.no_seed else args.size, "seed": args.seed,
+        },
+        "requests": overall.total,
+        "throughput_rps": round(overall.total / args.duration, 2),
+        "errors": dict(errors),
+        "error_rate": round(sum(errors.values()) / overall.total, 5) if overall.total else 0.0,
+        "latency": overall.to_dict(),
+        "types": per_type,
+        "server_metrics": metrics,
+    }
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+
+    print(f'{"type":<14}{"requests":>10}{"req/s":>10}{"errors":>9}'
+          f'{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}{"p99.9 ms":>10}{"max ms":>10}')
+    for name, row in [*per_type.items(), ('total', report)]:
+        percentiles = row['latency']['percentiles_ms']
+        print(f'{name:<14}{row["requests"]:>10}{row["throughput_rps"]:>10.1f}{row["error_rate"]:>9.2%}'
+              f'{percentiles["50"]:>10.1f}{percentiles["90"]:>10.1f}{percentiles["99"]:>10.1f}'
+              f'{percentiles["99.9"]:>10.1f}{row["latency"]["max_ms"]:>10.1f}')
+    print(f'report written to {args.report}')
+
+
+if __name__ == '__main__':
+    main()
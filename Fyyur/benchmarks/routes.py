@@ -0,0 +1,219 @@
+# ----------------------------------------------------------------------------#
+# Benchmark every route of the app through the test client.
+#
+#   createdb fyyur_bench
+#   python benchmarks/routes.py --size 100k
+#   python benchmarks/routes.py --size 100k --save-baseline
+#
+# The database is seeded by benchmarks/seed.py (--no-seed reuses it), then
+# each route is requested --warmup + --repeat times, on a different venue or
+# artist every time so the page cache does not hide the queries. Latency
+# percentiles and queries per request are compared against the baseline in
+# benchmarks/baselines/routes-<size>.json: a route running more queries, or
+# with a median slower by more than --tolerance, is a regression and the
+# exit status is 1.
+# Latencies depend on the machine, save a baseline on the one comparing.
+# WARNING: the benchmark database is emptied, never point it at real data.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from app import create_app  # noqa: E402
+from cache import page_cache  # noqa: E402
+from models import db, Venue, Artist  # noqa: E402
+from seed import BENCH_DATABASE_URI, parse_size, seed  # noqa: E402
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+# slack on top of --tolerance, below it timings are noise
+SLACK_MS = 1.0
+
+
+def venue_form(name):
+    return {'name': name, 'city': 'Austin', 'state': 'TX', 'address': '1 Main Street',
+            'phone': '512-555-0100', 'genres': ['Jazz', 'Folk'], 'facebook_link': 'https://www.facebook.com/bench',
+            'image_link': '', 'website_link': '', 'seeking_description': ''}
+
+
+def artist_form(name):
+    return {'name': name, 'city': 'Austin', 'state': 'TX', 'phone': '512-555-0100',
+            'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/bench',
+            'image_link': '', 'website_link': '', 'seeking_description': ''}
+
+
+def bench_venue_ids():
+    # the venues created by the create_venue_submission benchmark
+    return [venue_id for venue_id, in db.session.query(Venue.id)
+            .filter(Venue.name.like('Bench Venue %')).order_by(Venue.id)]
+
+
+# endpoint -> [(benchmark name, request(i, venue_id, artist_id) -> (method, path, data))],
+# in the order they run: reads first, then the writes, the deletes last
+ROUTES = {
+    'static': [('static', lambda i, v, a: ('GET', '/static/css/main.css', None))],
+    'index': [('index', lambda i, v, a: ('GET', '/', None))],
+    'venues.venues': [('venues', lambda i, v, a: ('GET', '/venues', None)),
+                      ('venues_genre', lambda i, v, a: ('GET', '/venues?genre=Jazz&genre=Folk', None))],
+    'venues.search_venues': [('search_venues', lambda i, v, a: ('POST', '/venues/search', {'search_term': 'blue'}))],
+    'venues.show_venue': [('show_venue', lambda i, v, a: ('GET', f'/venues/{v}', None))],
+    'venues.create_venue_form': [('create_venue_form', lambda i, v, a: ('GET', '/venues/create', None))],
+    'venues.edit_venue': [('edit_venue', lambda i, v, a: ('GET', f'/venues/{v}/edit', None))],
+    'artists.artists': [('artists', lambda i, v, a: ('GET', '/artists', None)),
+                        ('artists_genre', lambda i, v, a: ('GET', '/artists?genre=Jazz&genre=Folk&match=all', None))],
+    'artists.search_artists': [('search_artists', lambda i, v, a: ('POST', '/artists/search', {'search_term': 'owls'}))],
+    'artists.show_artist': [('show_artist', lambda i, v, a: ('GET', f'/artists/{a}', None))],
+    'artists.edit_artist': [('edit_artist', lambda i, v, a: ('GET', f'/artists/{a}/edit', None))],
+    'artists.create_artist_form': [('create_artist_form', lambda i, v, a: ('GET', '/artists/create', None))],
+    'shows.shows': [('shows', lambda i, v, a: ('GET', '/shows', None)),
+              ('shows_past', lambda i, v, a: ('GET', '/shows?when=past', None)),
+              ('shows_stream', lambda i, v, a: ('GET', '/shows?stream=1', None))],
+    'shows.create_shows': [('create_shows', lambda i, v, a: ('GET', '/shows/create', None))],
+    'api.api_venues': [('api_venues', lambda i, v, a: ('GET', '/api/v1/venues', None))],
+    'api.api_venue': [('api_venue', lambda i, v, a: ('GET', f'/api/v1/venues/{v}', None))],
+    'api.api_artist': [('api_artist', lambda i, v, a: ('GET', f'/api/v1/artists/{a}', None))],
+    'api.api_shows': [('api_shows', lambda i, v, a: ('GET', '/api/v1/shows', None))],
+    'export': [('export_venues', lambda i, v, a: ('GET', '/export/venues.csv', None))],
+    'debug_metrics': [('debug_metrics', lambda i, v, a: ('GET', '/debug/metrics', None))],
+    'venues.edit_venue_submission': [('edit_venue_submission',
+                               lambda i, v, a: ('POST', f'/venues/{v}/edit', venue_form(f'Edited Venue {v}')))],
+    'artists.edit_artist_submission': [('edit_artist_submission',
+                                lambda i, v, a: ('POST', f'/artists/{a}/edit', artist_form(f'Edited Artist {a}')))],
+    'venues.create_venue_submission': [('create_venue_submission',
+                                 lambda i, v, a: ('POST', '/venues/create', venue_form(f'Bench Venue {i}')))],
+    'artists.create_artist_submission': [('create_artist_submission',
+                                  lambda i, v, a: ('POST', '/artists/create', artist_form(f'Bench Artist {os.getpid()} {i}')))],
+    'shows.create_show_submission': [('create_show_submission',
+                                lambda i, v, a: ('POST', '/shows/create',
+                                                 {'venue_id': v, 'artist_id': a, 'start_time': '2030-01-01 20:00:00'}))],
+    'venues.delete_venue': [('delete_venue', lambda i, v, a: ('DELETE', f'/venues/{bench_venue_ids()[0]}', None))],
+}
+
+
+class QueryCounter:
+    """Statements sent to the database, by any engine."""
+
+    def __init__(self):
+        self.count = 0
+        event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+
+    def after_cursor_execute(self, *args):
+        self.count += 1
+
+
+def percentile(samples, q):
+    # nearest rank
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def spread_ids(model, count):
+    """count ids spread evenly over the table, busy and quiet rows alike."""
+    ids = [row_id for row_id, in db.session.query(model.id).order_by(model.id)]
+    return [ids[i * len(ids) // count] for i in range(count)]
+
+
+def run(client, counter, request, warmup, repeat):
+    runs = warmup + repeat
+    venue_ids, artist_ids = spread_ids(Venue, runs), spread_ids(Artist, runs)
+    timings, queries = [], []
+    for i in range(runs):
+        method, path, data = request(i, venue_ids[i], artist_ids[i])
+        db.session.remove()
+        before = counter.count
+        started = time.perf_counter()
+        res = client.open(path, method=method, data=data)
+        # a streamed body runs its queries while it is read
+        res.get_data()
+        elapsed = (time.perf_counter() - started) * 1000
+        assert res.status_code < 400, f'{method} {path}: {res.status_code}'
+        if i >= warmup:
+            timings.append(elapsed)
+            queries.append(counter.count - before)
+    return {
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p90_ms': round(percentile(timings, 90), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+        'max_ms': round(max(timings), 2),
+        'queries': statistics.median(queries),
+    }
+
+
+def regressions(name, result, baseline, tolerance):
+    if baseline is None:
+        return []
+    found = []
+    if result['queries'] > baseline['queries']:
+        found.append(f'{name}: {result["queries"]} queries, baseline {baseline["queries"]}')
+    # the tail percentiles of a few runs are too noisy to gate on
+    if result['p50_ms'] > baseline['p50_ms'] * (1 + tolerance) + SLACK_MS:
+        found.append(f'{name}: p50 {result["p50_ms"]}ms, baseline {baseline["p50_ms"]}ms')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every route against a baseline')
+    parser.add_argument('--size', default='1k', help='seed size, see benchmarks/seed.py (default 1k)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-seed', action='store_true', help='reuse the seeded database as is')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='slowdown over the baseline reported as a regression (default 0.25)')
+    parser.add_argument('--baseline', help='baseline file (default benchmarks/baselines/routes-<size>.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    args = parser.parse_args()
+    baseline_path = args.baseline or os.path.join(BASELINES, f'routes-{args.size.lower()}.json')
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': BENCH_DATABASE_URI, 'WTF_CSRF_ENABLED': False,
+                      'QUERY_METRICS_SAMPLE_RATE': 0, 'PAGE_CACHE_TYPE': 'local',
+                      'DEBUG_METRICS_TOKEN': 'bench', 'EXPORT_TOKEN': 'bench'})
+    missing = {rule.endpoint for rule in app.url_map.iter_rules()} - set(ROUTES)
+    if missing:
+        sys.exit(f'no benchmark for {", ".join(sorted(missing))}, add them to ROUTES')
+
+    with app.app_context():
+        if not args.no_seed:
+            seed(parse_size(args.size), args.seed)
+        page_cache.clear()
+        baseline = {}
+        if os.path.exists(baseline_path) and not args.save_baseline:
+            with open(baseline_path) as f:
+                baseline = json.load(f)['routes']
+
+        client, counter = app.test_client(), QueryCounter()
+        client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer bench'
+        results, found = {}, []
+        print(f'{"route":<26}{"p50 ms":>9}{"p90 ms":>9}{"p99 ms":>9}{"max ms":>9}{"queries":>9}{"vs p50":>9}')
+        for endpoint, benchmarks in ROUTES.items():
+            for name, request in benchmarks:
+                result = results[name] = run(client, counter, request, args.warmup, args.repeat)
+                before = baseline.get(name)
+                change = f'{result["p50_ms"] / before["p50_ms"] - 1:+.0%}' if before else '-'
+                print(f'{name:<26}{result["p50_ms"]:>9.2f}{result["p90_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+                      f'{result["max_ms"]:>9.2f}{result["queries"]:>9g}{change:>9}')
+                found += regressions(name, result, before, args.tolerance)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump({'size': args.size, 'repeat': args.repeat, 'routes': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'baseline saved to {baseline_path}')
+    elif not baseline:
+        print(f'no baseline at {baseline_path}, run with --save-baseline')
+    if found:
+        print('\nregressions:\n  ' + '\n  '.join(found))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# ----------------------------------------------------------------------------#
+# Benchmark search_venues / search_artists with and without trigram indexes.
+#
+#   createdb fyyur_bench
+#   python benchmarks/search.py --rows 100000 1000000
+#
+# WARNING: the benchmark database is emptied, never point it at real data.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+
+BENCH_DATABASE_URI = os.environ.get(
+    'BENCH_DATABASE_URL', 'postgresql://jiazhang@localhost:5432/fyyur_bench')
+SEARCH_TERMS = ['music', 'san fran', 'hop', 'zzz']
+SEARCH_COLUMNS = ['name', 'city', 'state']
+
+SEED_VENUES = '''
+INSERT INTO "Venue" (name, city, state, address, seeking_talent)
+SELECT 'Venue ' || i || ' ' || md5(i::text),
+       (ARRAY['San Francisco', 'New York', 'Austin', 'Nashville', 'Seattle'])[1 + i % 5],
+       (ARRAY['CA', 'NY', 'TX', 'TN', 'WA'])[1 + i % 5],
+       i || ' Main Street',
+       false
+FROM generate_series(1, :rows) AS i
+'''
+SEED_ARTISTS = '''
+INSERT INTO "Artist" (name, city, state)
+SELECT 'Artist ' || i || ' ' || md5(i::text),
+       (ARRAY['San Francisco', 'New York', 'Austin', 'Nashville', 'Seattle'])[1 + i % 5],
+       (ARRAY['CA', 'NY', 'TX', 'TN', 'WA'])[1 + i % 5]
+FROM generate_series(1, :rows) AS i
+'''
+
+
+def seed(rows):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(db.text(SEED_VENUES), {'rows': rows})
+    db.session.execute(db.text(SEED_ARTISTS), {'rows': rows})
+    # a row that actually matches the selective search terms
+    db.session.execute(db.text(
+        '''INSERT INTO "Venue" (name, city, state, seeking_talent)
+           VALUES ('The Musical Hop', 'San Francisco', 'CA', false)'''))
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE "Venue"'))
+    db.session.execute(db.text('ANALYZE "Artist"'))
+    db.session.commit()
+
+
+def set_indexes(enabled):
+    for table in ['Venue', 'Artist']:
+        for column in SEARCH_COLUMNS:
+            name = f'ix_{table}_{column}_trgm'
+            if enabled:
+                db.session.execute(db.text(
+                    f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" '
+                    f'USING gin ({column} gin_trgm_ops)'))
+            else:
+                db.session.execute(db.text(f'DROP INDEX IF EXISTS "{name}"'))
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+
+def time_searches(client, repeat):
+    timings = {}
+    for path in ['/venues/search', '/artists/search']:
+        for term in SEARCH_TERMS:
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                res = client.post(path, data={'search_term': term})
+                samples.append((time.perf_counter() - started) * 1000)
+                assert res.status_code == 200, res.status_code
+            timings[(path, term)] = statistics.median(samples)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark venue and artist search')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': BENCH_DATABASE_URI, 'TESTING': True})
+    with app.app_context():
+        db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        db.session.commit()
+        client = app.test_client()
+        for rows in args.rows:
+            print(f'seeding {rows} venues and {rows} artists ...')
+            seed(rows)
+            set_indexes(False)
+            seq_scan = time_searches(client, args.repeat)
+            set_indexes(True)
+            trgm = time_searches(client, args.repeat)
+            print(f'{"route":<18}{"term":<10}{"seq scan ms":>14}{"trigram ms":>14}{"speedup":>10}')
+            for (path, term), before in seq_scan.items():
+                after = trgm[(path, term)]
+                print(f'{path:<18}{term:<10}{before:>14.1f}{after:>14.1f}{before / after:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+# ----------------------------------------------------------------------------#
+# Deterministic seed data for benchmarks: venues, artists and shows.
+#
+#   createdb fyyur_bench
+#   python benchmarks/seed.py --size 100k
+#
+# The same --size, --seed and day give the same rows. Cities, genres and the
+# venues/artists shows go to are skewed the way real listings are (a few big
+# cities and busy venues, a long tail of small ones). Shows spread over the
+# past three years and the next six months, in the evening. WARNING: the
+# database is emptied, never point it at real data.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commands import recount_show_counters  # noqa: E402
+from importer import CopyStream  # noqa: E402
+from models import db, Venue, Artist, Show  # noqa: E402
+
+BENCH_DATABASE_URI = os.environ.get(
+    'BENCH_DATABASE_URL', 'postgresql://jiazhang@localhost:5432/fyyur_bench')
+
+# shows, venues, artists
+SIZES = {
+    '1k': (1000, 100, 200),
+    '100k': (100000, 2000, 10000),
+    '1m': (1000000, 10000, 50000),
+}
+
+# (city, state, weight): roughly by size of the live music scene
+CITIES = [
+    ('New York', 'NY', 30), ('Los Angeles', 'CA', 22), ('Chicago', 'IL', 14),
+    ('Nashville', 'TN', 12), ('Austin', 'TX', 11), ('San Francisco', 'CA', 10),
+    ('Seattle', 'WA', 8), ('New Orleans', 'LA', 8), ('Atlanta', 'GA', 7),
+    ('Boston', 'MA', 6), ('Denver', 'CO', 5), ('Philadelphia', 'PA', 5),
+    ('Portland', 'OR', 4), ('Detroit', 'MI', 4), ('Minneapolis', 'MN', 3),
+    ('Memphis', 'TN', 3), ('Miami', 'FL', 3), ('Kansas City', 'MO', 2),
+    ('Baltimore', 'MD', 2), ('Boise', 'ID', 1),
+]
+# (genre, weight), the choices of the venue and artist forms
+GENRES = [
+    ('Rock n Roll', 20), ('Pop', 16), ('Hip-Hop', 12), ('Jazz', 10), ('Electronic', 9),
+    ('Country', 8), ('Alternative', 8), ('R&B', 7), ('Folk', 6), ('Blues', 5),
+    ('Soul', 5), ('Punk', 4), ('Heavy Metal', 4), ('Reggae', 3), ('Funk', 3),
+    ('Classical', 3), ('Instrumental', 2), ('Musical Theatre', 2), ('Other', 1),
+]
+ADJECTIVES = ['Blue', 'Golden', 'Velvet', 'Electric', 'Midnight', 'Rusty', 'Silver', 'Crimson',
+              'Lucky', 'Wild', 'Hollow', 'Neon', 'Copper', 'Quiet', 'Broken', 'Little']
+NOUNS = ['Room', 'Lounge', 'Hall', 'Tavern', 'Garage', 'Cellar', 'Theater', 'Parlor',
+         'Barn', 'Club', 'Stage', 'Attic', 'Warehouse', 'Saloon', 'Den', 'Ballroom']
+BANDS = ['Owls', 'Pianos', 'Rivers', 'Ghosts', 'Kings', 'Engines', 'Wolves', 'Mirrors',
+         'Sparrows', 'Tigers', 'Lanterns', 'Comets', 'Strangers', 'Hearts', 'Lights', 'Drifters']
+
+PAST_DAYS = 3 * 365
+UPCOMING_DAYS = 182
+
+
+def parse_size(value):
+    if value.lower() in SIZES:
+        return SIZES[value.lower()]
+    shows = int(value)
+    return shows, max(shows // 50, 10), max(shows // 10, 10)
+
+
+def popularity(rng, count):
+    """Cumulative weights for picking one of count rows: a pareto tail, a
+    few rows get most of the picks."""
+    return list(itertools.accumulate(rng.paretovariate(2.5) for _ in range(count)))
+
+
+def pick_genres(rng, names, weights):
+    # one to three distinct genres, popular ones more often
+    picked = []
+    for _ in range(rng.choice((1, 1, 2, 2, 3))):
+        genre = rng.choices(names, weights)[0]
+        if genre not in picked:
+            picked.append(genre)
+    return picked
+
+
+def venue_rows(rng, count):
+    cities, weights = CITIES, [weight for *_, weight in CITIES]
+    genres, genre_weights = [name for name, _ in GENRES], [weight for _, weight in GENRES]
+    for i in range(1, count + 1):
+        city, state, _ = rng.choices(cities, weights)[0]
+        yield {
+            'name': f'The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}',
+            'city': city,
+            'state': state,
+            'address': f'{rng.randint(1, 9999)} {rng.choice(ADJECTIVES)} Street',
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+            'genres': pick_genres(rng, genres, genre_weights),
+            'facebook_link': f'https://www.facebook.com/venue{i}',
+            'seeking_talent': rng.random() < 0.4,
+        }
+
+
+def artist_rows(rng, count):
+    cities, weights = CITIES, [weight for *_, weight in CITIES]
+    genres, genre_weights = [name for name, _ in GENRES], [weight for _, weight in GENRES]
+    for i in range(1, count + 1):
+        city, state, _ = rng.choices(cities, weights)[0]
+        yield {
+            # names are unique
+            'name': f'The {rng.choice(ADJECTIVES)} {rng.choice(BANDS)} {i}',
+            'city': city,
+            'state': state,
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+            'genres': pick_genres(rng, genres, genre_weights),
+            'facebook_link': f'https://www.facebook.com/artist{i}',
+            'seeking_venue': rng.random() < 0.3,
+        }
+
+
+def show_rows(rng, count, venues, artists, anchor):
+    venue_weights = popularity(rng, venues)
+    artist_weights = popularity(rng, artists)
+    venue_ids, artist_ids = range(1, venues + 1), range(1, artists + 1)
+    first_day = anchor - timedelta(days=PAST_DAYS)
+    for _ in range(count):
+        # more shows on the weekend than midweek, between 7 and 11pm
+        day = first_day + timedelta(days=rng.randrange(PAST_DAYS + UPCOMING_DAYS))
+        if day.weekday() < 3 and rng.random() < 0.5:
+            day += timedelta(days=4 - day.weekday())
+        yield {
+            'Venue_id': rng.choices(venue_ids, cum_weights=venue_weights)[0],
+            'Artist_id': rng.choices(artist_ids, cum_weights=artist_weights)[0],
+            'start_time': day.replace(hour=rng.randint(19, 22), minute=rng.choice((0, 15, 30, 45))),
+        }
+
+
+def copy_rows(connection, table, rows):
+    # the columns are the keys of the first row
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    columns = list(first)
+    quoted = ', '.join(f'"{column}"' for column in columns)
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(
+        f'COPY "{table}" ({quoted}) FROM STDIN WITH (FORMAT csv)',
+        CopyStream(itertools.chain([first], rows), columns), size=65536)
+    cursor.close()
+
+
+def seed(size, seed=0, anchor=None):
+    """Empty the database and fill it with size (shows, venues, artists) rows,
+    generated from seed around anchor (today by default)."""
+    shows, venues, artists = size
+    anchor = anchor or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    rng = random.Random(seed)
+    # an open transaction of the session would block dropping the tables
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    connection = db.session.connection()
+    # loading the larger sizes takes longer than the app's statement_timeout
+    connection.execute(db.text('SET LOCAL statement_timeout = 0'))
+    copy_rows(connection, Venue.__tablename__, venue_rows(rng, venues))
+    copy_rows(connection, Artist.__tablename__, artist_rows(rng, artists))
+    # counters are recounted once at the end instead of by the per row trigger
+    connection.execute(db.text('ALTER TABLE "Show" DISABLE TRIGGER show_counters'))
+    copy_rows(connection, Show.name, show_rows(rng, shows, venues, artists, anchor))
+    connection.execute(db.text('ALTER TABLE "Show" ENABLE TRIGGER show_counters'))
+    db.session.commit()
+    for model in (Venue, Artist):
+        recount_show_counters(db.session, model.__tablename__, 10000)
+    db.session.commit()
+    # VACUUM also moves the entries COPY left in the pending lists of the GIN
+    # indexes into the indexes, until then every genre filter scans the lists
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(db.text('VACUUM ANALYZE'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill the benchmark database with seed data')
+    parser.add_argument('--size', default='1k',
+                        help=f'{", ".join(SIZES)} or a number of shows (default 1k)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app({'SQLALCHEMY_DATABASE_URI': BENCH_DATABASE_URI})
+    with app.app_context():
+        size = parse_size(args.size)
+        started = time.perf_counter()
+        seed(size, args.seed)
+        print(f'{size[0]} shows, {size[1]} venues, {size[2]} artists seeded '
+              f'in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# ----------------------------------------------------------------------------#
+# Measure how long a fresh process takes to import the app and build it.
+#
+#   python benchmarks/startup.py --repeat 10 --budget-ms 800
+#
+# Every run starts a new python process that imports app.py and calls
+# create_app(), the work each gunicorn worker (or the master, with --preload)
+# does before serving. The slowest modules of one run are listed from
+# python -X importtime. The exit status is 1 when the median is over
+# --budget-ms, or when a module only needed on first use (dateutil) is
+# imported at startup. babel is not one of them: flask_wtf imports it for
+# its translations whenever it is installed.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+FYYUR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# imported on first use by the views, never at startup
+LAZY_MODULES = ('dateutil',)
+
+CHILD = '''
+import sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+built = time.perf_counter()
+eager = sorted({name.split('.')[0] for name in sys.modules} & set(sys.argv[1:]))
+print((imported - started) * 1000, (built - imported) * 1000, ','.join(eager))
+'''
+
+
+def run_child(env):
+    output = subprocess.run([sys.executable, '-c', CHILD, *LAZY_MODULES], env=env, cwd=FYYUR_DIR,
+                            check=True, capture_output=True, text=True).stdout
+    import_ms, create_ms, eager = output.splitlines()[-1].split(' ')
+    return float(import_ms), float(create_ms), [name for name in eager.split(',') if name]
+
+
+def slowest_imports(env, top):
+    # -X importtime writes 'import time: self | cumulative | package' to stderr
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], env=env,
+                            cwd=FYYUR_DIR, check=True, capture_output=True, text=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # packages only, their submodules are counted in them; a package
+        # imported by another one is counted in both
+        name = name.strip()
+        if '.' not in name and not name.startswith('_'):
+            modules.append((int(cumulative) / 1000, name))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time importing the app and create_app()')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=800,
+                        help='largest median import + create_app time allowed (default 800)')
+    parser.add_argument('--top', type=int, default=10, help='slowest imported packages listed')
+    args = parser.parse_args()
+    # as served: no debug, templates compiled by create_app()
+    env = dict(os.environ, FLASK_DEBUG='0')
+
+    runs = [run_child(env) for _ in range(args.repeat)]
+    import_ms = statistics.median(run[0] for run in runs)
+    create_ms = statistics.median(run[1] for run in runs)
+    total_ms = statistics.median(run[0] + run[1] for run in runs)
+    print(f'median of {args.repeat}: import {import_ms:.1f}ms, create_app {create_ms:.1f}ms, '
+          f'total {total_ms:.1f}ms (budget {args.budget_ms:g}ms)')
+    print('\nslowest imports (cumulative ms, one run):')
+    for cumulative, name in slowest_imports(env, args.top):
+        print(f'  {cumulative:>8.1f}  {name}')
+
+    failed = []
+    if total_ms > args.budget_ms:
+        failed.append(f'startup {total_ms:.1f}ms over the budget of {args.budget_ms:g}ms')
+    eager = sorted({name for run in runs for name in run[2]})
+    if eager:
+        failed.append(f'{", ".join(eager)} imported at startup, import them where they are used')
+    if failed:
+        print('\n' + '\n'.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
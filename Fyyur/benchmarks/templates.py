@@ -0,0 +1,131 @@
+# ----------------------------------------------------------------------------#
+# Measure the first requests of a fresh worker: lazily compiled templates
+# against the Jinja bytecode cache and precompilation at startup.
+#
+#   createdb fyyur_bench
+#   python benchmarks/seed.py --size 1k
+#   python benchmarks/templates.py --repeat 5
+#
+# Every run starts a new python process, imports the app (startup), then
+# requests each page twice: the first request pays for loading or compiling
+# its templates, the second one is warm. Medians over --repeat processes.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+FYYUR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCH_DATABASE_URI = os.environ.get(
+    'BENCH_DATABASE_URL', 'postgresql://jiazhang@localhost:5432/fyyur_bench')
+
+# mode -> (bytecode cache filled beforehand, templates precompiled at startup)
+MODES = {
+    'lazy, no bytecode': (False, False),
+    'lazy, bytecode': (True, False),
+    'precompiled, no bytecode': (False, True),
+    'precompiled, bytecode': (True, True),
+}
+
+
+def pages(db, Venue, Artist):
+    venue_id = db.session.query(db.func.min(Venue.id)).scalar()
+    artist_id = db.session.query(db.func.min(Artist.id)).scalar()
+    paths = ['/', '/venues', '/artists', '/shows', '/venues/create', '/artists/create', '/shows/create']
+    if venue_id:
+        paths += [f'/venues/{venue_id}', f'/venues/{venue_id}/edit']
+    if artist_id:
+        paths += [f'/artists/{artist_id}', f'/artists/{artist_id}/edit']
+    return paths
+
+
+def child():
+    """One fresh worker: print its startup and first/warm request times as json."""
+    started = time.perf_counter()
+    sys.path.insert(0, FYYUR_DIR)
+    from app import create_app
+    from cache import page_cache
+    from models import db, Venue, Artist
+    app = create_app({'SQLALCHEMY_DATABASE_URI': BENCH_DATABASE_URI})
+    startup = time.perf_counter() - started
+
+    client = app.test_client()
+    with app.app_context():
+        paths = pages(db, Venue, Artist)
+        db.session.remove()
+    # connect once, so the first request does not pay for it
+    with app.app_context():
+        db.session.execute(db.text('SELECT 1'))
+        db.session.remove()
+    timings = {}
+    for path in paths:
+        samples = []
+        for _ in range(2):
+            # the rendered detail pages must not come from the page cache
+            page_cache.clear()
+            request_started = time.perf_counter()
+            res = client.get(path)
+            samples.append((time.perf_counter() - request_started) * 1000)
+            assert res.status_code == 200, f'{path}: {res.status_code}'
+        timings[path] = samples
+    print(json.dumps({'startup_ms': startup * 1000, 'timings': timings}))
+
+
+def run_child(cache_dir, precompile):
+    env = dict(os.environ, FLASK_DEBUG='0', JINJA_BYTECODE_CACHE_DIR=cache_dir,
+               PRECOMPILE_TEMPLATES='1' if precompile else '0')
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], env=env,
+                            cwd=FYYUR_DIR, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold versus warm first requests of a fresh worker')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child()
+
+    results = {}
+    for mode, (warm_cache, precompile) in MODES.items():
+        runs = []
+        for _ in range(args.repeat):
+            cache_dir = tempfile.mkdtemp(prefix='fyyur-jinja-')
+            try:
+                if warm_cache:
+                    subprocess.run([sys.executable, '-m', 'flask', 'fyyur', 'compile-templates'],
+                                   env=dict(os.environ, FLASK_APP='app', JINJA_BYTECODE_CACHE_DIR=cache_dir),
+                                   cwd=FYYUR_DIR, check=True, capture_output=True)
+                runs.append(run_child(cache_dir, precompile))
+            finally:
+                shutil.rmtree(cache_dir)
+        results[mode] = runs
+
+    paths = list(results[next(iter(MODES))][0]['timings'])
+    print(f'{"mode":<26}{"startup ms":>12}{"first requests ms":>19}{"warm requests ms":>18}')
+    for mode, runs in results.items():
+        startup = statistics.median(run['startup_ms'] for run in runs)
+        first = statistics.median(sum(run['timings'][path][0] for path in paths) for run in runs)
+        warm = statistics.median(sum(run['timings'][path][1] for path in paths) for run in runs)
+        print(f'{mode:<26}{startup:>12.1f}{first:>19.1f}{warm:>18.1f}')
+    print(f'\nfirst / warm request ms per page, median of {args.repeat}:')
+    print(f'{"page":<22}' + ''.join(f'{mode:>26}' for mode in MODES))
+    for path in paths:
+        cells = []
+        for runs in results.values():
+            first = statistics.median(run['timings'][path][0] for run in runs)
+            warm = statistics.median(run['timings'][path][1] for run in runs)
+            cells.append(f'{first:.1f} / {warm:.1f}')
+        print(f'{path:<22}' + ''.join(f'{cell:>26}' for cell in cells))
+
+
+if __name__ == '__main__':
+    main()
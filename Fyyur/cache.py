@@ -0,0 +1,173 @@
+# ----------------------------------------------------------------------------#
+# Rendered page cache for the venue and artist detail pages.
+# ----------------------------------------------------------------------------#
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+
+class NullCache:
+    """Caching switched off: every lookup misses."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def add(self, key, value, ttl):
+        """set() unless the key holds a live entry; True when it was set."""
+        return False
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LocalCache(NullCache):
+    """In-process LRU cache with a ttl per entry, for a single dev worker.
+
+    Every worker holds its own copy, so an invalidation only reaches the
+    worker that handled the write; use SharedCache once there are several.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            # mark as most recently used
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key, value, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def _store(self, key, value, ttl):
+        # with the lock held
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        # evict the least recently used entries
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedCache(NullCache):
+    """Cache in a store shared by every worker, through a redis style client.
+
+    Entries expire in the store itself; LRU eviction is the store's job
+    (for redis: maxmemory with maxmemory-policy allkeys-lru).
+    """
+
+    def __init__(self, client, prefix='fyyur:page:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value.encode('utf-8'), ex=max(1, int(ttl)))
+
+    def add(self, key, value, ttl):
+        return bool(self.client.set(self.prefix + key, value.encode('utf-8'), ex=max(1, int(ttl)), nx=True))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class LocalStore:
+    """Stand-in for a redis client (get/set with ex/delete/scan_iter), so
+    SharedCache can be exercised in tests without a running server."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            entry = self._values.get(name)
+            if entry is None or entry[1] <= time.monotonic():
+                self._values.pop(name, None)
+                return None
+            return entry[0]
+
+    def set(self, name, value, ex, nx=False):
+        with self._lock:
+            entry = self._values.get(name)
+            if nx and entry is not None and entry[1] > time.monotonic():
+                return None
+            self._values[name] = (value, time.monotonic() + ex)
+            return True
+
+    def delete(self, *names):
+        with self._lock:
+            for name in names:
+                self._values.pop(name, None)
+
+    def scan_iter(self, match):
+        prefix = match.rstrip('*')
+        with self._lock:
+            return [name for name in self._values if name.startswith(prefix)]
+
+
+def create_page_cache(config):
+    """Build the page cache selected by PAGE_CACHE_TYPE: 'local', 'shared' or None."""
+    cache_type = config.get('PAGE_CACHE_TYPE')
+    if cache_type == 'local':
+        return LocalCache(config.get('PAGE_CACHE_SIZE', 1024))
+    if cache_type == 'shared':
+        url = config.get('PAGE_CACHE_URL')
+        if not url:
+            # a store of this process only would not be shared at all
+            raise RuntimeError("PAGE_CACHE_TYPE 'shared' needs PAGE_CACHE_URL, e.g. redis://localhost:6379/0")
+        # only needed for multi worker deploys
+        import redis
+        return SharedCache(redis.Redis.from_url(url))
+    if cache_type is not None:
+        raise RuntimeError(f"unknown PAGE_CACHE_TYPE {cache_type!r}, use 'local', 'shared' or none")
+    return NullCache()
+
+
+# the page cache of the current app, built by create_app()
+page_cache = LocalProxy(lambda: current_app.extensions['page_cache'])
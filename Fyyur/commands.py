@@ -0,0 +1,133 @@
+# ----------------------------------------------------------------------------#
+# Maintenance commands, run as 'flask fyyur <command>'.
+# ----------------------------------------------------------------------------#
+
+import csv
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from cache import page_cache
+from export import EXPORT_FORMATS, export_chunks
+from helpers import parse_datetime
+from importer import import_file
+from models import db, Venue, Artist, RECOUNT_SHOWS_SQL
+
+fyyur_cli = AppGroup('fyyur', help='Fyyur maintenance commands.')
+
+
+@fyyur_cli.command('rollover-shows')
+def rollover_shows():
+    """Move shows that have started from the upcoming to the past counters.
+
+    Run it periodically (e.g. every 5 minutes from cron); the counters lag
+    behind the clock by at most that interval.
+    """
+    moved = db.session.execute(db.text('SELECT show_rollover(:until)'),
+                               {'until': datetime.now()}).scalar()
+    db.session.commit()
+    click.echo(f'{moved} shows rolled over to past')
+
+
+@fyyur_cli.command('recount-shows')
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Venues/artists recounted per transaction.')
+def recount_shows(batch_size):
+    """Recount every venue and artist show counter from the Show table."""
+    for model in (Venue, Artist):
+        recounted = recount_show_counters(db.session, model.__tablename__, batch_size)
+        click.echo(f'{recounted} {model.__tablename__} rows recounted')
+
+
+def recount_show_counters(session, table, batch_size):
+    # one short transaction per id range, so a large table is never locked as a whole
+    last_id = session.execute(db.text(f'SELECT max(id) FROM "{table}"')).scalar() or 0
+    recounted = 0
+    for first_id in range(1, last_id + 1, batch_size):
+        result = session.execute(db.text(RECOUNT_SHOWS_SQL.format(table=table)),
+                                 {'first_id': first_id, 'last_id': first_id + batch_size - 1})
+        session.commit()
+        recounted += result.rowcount
+    return recounted
+
+
+@fyyur_cli.command('compile-templates')
+def compile_templates():
+    """Compile every template into the Jinja bytecode cache.
+
+    Run it once per release (e.g. in the deploy step), so even the first
+    worker started loads compiled templates.
+    """
+    from app import precompile_templates
+    started = time.perf_counter()
+    names = precompile_templates(current_app)
+    cache = current_app.jinja_env.bytecode_cache
+    click.echo(f'{len(names)} templates compiled in {time.perf_counter() - started:.2f}s'
+               + (f' into {cache.directory}' if cache is not None else ''))
+
+
+@fyyur_cli.command('import')
+@click.option('--venues', type=click.Path(exists=True, dir_okay=False),
+              help='Venues file (.csv, .ndjson or .jsonl).')
+@click.option('--artists', type=click.Path(exists=True, dir_okay=False),
+              help='Artists file (.csv, .ndjson or .jsonl).')
+@click.option('--shows', type=click.Path(exists=True, dir_okay=False),
+              help='Shows file naming their venue, venue_city (optional), artist and start_time.')
+@click.option('--method', type=click.Choice(['copy', 'executemany']), default='copy', show_default=True,
+              help='How rows are loaded into the staging tables.')
+@click.option('--batch-size', default=5000, show_default=True,
+              help='Rows per executemany batch.')
+@click.option('--rejects', type=click.File('w'),
+              help='Write every rejected row to this csv file (file, line, reason).')
+def import_data(venues, artists, shows, method, batch_size, rejects):
+    """Bulk import venues, artists and shows.
+
+    Venues and artists are imported first, so a shows file can name the
+    ones added by the same run. Each file is imported in one transaction.
+    """
+    if not (venues or artists or shows):
+        raise click.UsageError('give at least one of --venues, --artists or --shows')
+    reject_writer = csv.writer(rejects) if rejects else None
+    for kind, path in (('venues', venues), ('artists', artists), ('shows', shows)):
+        if path is None:
+            continue
+        report = import_file(db.session, kind, path, method, batch_size)
+        click.echo(str(report))
+        if reject_writer:
+            reject_writer.writerows((path, line, reason) for line, reason in report.rejects)
+        else:
+            for line, reason in report.rejects[:10]:
+                click.echo(f'  line {line}: {reason}')
+            if len(report.rejects) > 10:
+                click.echo(f'  ... {len(report.rejects) - 10} more, see --rejects')
+    # rendered detail pages of the imported venues and artists are stale now.
+    # a 'shared' cache is the one the server reads; a 'local' one lives in
+    # the server process, out of reach of this command
+    page_cache.clear()
+    if current_app.config.get('PAGE_CACHE_TYPE') == 'local':
+        click.echo('the server keeps its own local page cache: restart it, or pages may be '
+                   f"stale for up to {current_app.config.get('PAGE_CACHE_TTL')}s")
+
+
+@fyyur_cli.command('export')
+@click.argument('entity', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--since', type=parse_datetime,
+              help='Only export rows changed at or after this date/time.')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('--output', '-o', type=click.File('wb'), default='-',
+              help='File to write, stdout by default.')
+@click.option('--batch-size', default=2000, show_default=True,
+              help='Rows fetched per server side cursor batch.')
+def export_data(entity, fmt, since, compress, output, batch_size):
+    """Stream every venue, artist or show as csv or ndjson."""
+    started = time.perf_counter()
+    written = 0
+    for chunk in export_chunks(db.session.connection(), entity, fmt, since, batch_size, compress):
+        output.write(chunk)
+        written += len(chunk)
+    db.session.rollback()
+    click.echo(f'{written} bytes exported in {time.perf_counter() - started:.2f}s', err=True)
@@ -3,8 +3,18 @@ SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Enable debug mode (FLASK_DEBUG=0 in production).
+DEBUG = os.environ.get('FLASK_DEBUG', 'true').lower() in ('1', 'true', 'yes')
+
+# Templates: only reload them from disk when they change while debugging,
+# and keep their compiled bytecode in JINJA_BYTECODE_CACHE_DIR (None for a
+# directory of the user in the system temp dir), so a new worker loads
+# instead of compiling them. Outside debug every template is compiled at
+# startup, not on the first request rendering it.
+TEMPLATES_AUTO_RELOAD = DEBUG
+JINJA_BYTECODE_CACHE = True
+JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+PRECOMPILE_TEMPLATES = os.environ.get('PRECOMPILE_TEMPLATES', str(not DEBUG)).lower() in ('1', 'true', 'yes')
 
 # Connect to the database
 
@@ -12,3 +22,69 @@ DEBUG = True
 # TODO IMPLEMENT DATABASE URL
 SQLALCHEMY_DATABASE_URI = 'postgresql://jiazhang@localhost:5432/fyyur'
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool of every process (gunicorn worker), each setting can be
+# overridden from the environment. Pool metrics are served by /debug/metrics
+SQLALCHEMY_ENGINE_OPTIONS = {
+    # connections kept open, and opened on top of those under load
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+    # seconds a request waits for a free connection before it fails
+    'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    # test connections on checkout, replacing those the server or a proxy closed
+    'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+    # replace connections older than this many seconds
+    'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    # cancel statements running longer than this (postgres units, '0' disables it)
+    'connect_args': {'options': '-c statement_timeout=' + os.environ.get('DB_STATEMENT_TIMEOUT', '30s')},
+}
+
+# Read replicas for the @read_only views, comma separated database urls
+# (see replicas.py); without any every query runs on the primary
+SQLALCHEMY_BINDS = {f'replica_{i}': url for i, url in enumerate(
+    url for url in os.environ.get('REPLICA_DATABASE_URLS', '').split(',') if url)}
+# replicas more than this many seconds behind the primary are skipped
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 5))
+# seconds a replica's measured lag is trusted before it is measured again
+REPLICA_LAG_CHECK_INTERVAL = 2
+# a client that wrote reads from the primary for this many seconds after
+READ_YOUR_WRITES_WINDOW = 10
+
+# /debug/metrics is only served when a token is set, to requests sending it
+# as 'Authorization: Bearer <token>': it shows SQL text, latencies and pool state
+DEBUG_METRICS_TOKEN = os.environ.get('DEBUG_METRICS_TOKEN') or None
+
+# Share of requests whose queries are counted and timed for /debug/metrics
+# (0 switches it off, 1 measures every request)
+QUERY_METRICS_SAMPLE_RATE = float(os.environ.get('QUERY_METRICS_SAMPLE_RATE', 0.1))
+# a statement run this many times by one request is logged as a suspected N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 5))
+
+# Cap past/upcoming show lists on detail pages (None shows all, ?limit=N overrides)
+SHOWS_LIMIT = None
+
+# Artists listed per /artists page (None lists every artist on one page)
+ARTISTS_PER_PAGE = 50
+
+# Shows listed per /shows page, and rows fetched per batch by /shows?stream=1
+SHOWS_PER_PAGE = 30
+SHOWS_STREAM_BATCH = 500
+
+# Rendered venue/artist page cache: 'local' (in-process LRU, for a single
+# process: the dev server or one gunicorn worker), 'shared' (redis at
+# PAGE_CACHE_URL, every worker) or unset to switch it off
+PAGE_CACHE_TYPE = os.environ.get('PAGE_CACHE_TYPE') or None
+PAGE_CACHE_URL = os.environ.get('PAGE_CACHE_URL')
+PAGE_CACHE_SIZE = 1024
+# longest time a page is kept, seconds
+PAGE_CACHE_TTL = 3600
+# seconds a written venue/artist page is not cached, so that a render that
+# started before the write cannot store the old page (see invalidate_pages);
+# the statement_timeout bounds how long a render reads
+PAGE_CACHE_TOMBSTONE_TTL = 30
+
+# /export/* is only served to requests sending 'Authorization: Bearer <token>',
+# and not at all when unset; 'flask fyyur export' does not need it
+EXPORT_TOKEN = os.environ.get('EXPORT_TOKEN') or None
+# Rows fetched per server side cursor batch by the /export endpoints and 'flask fyyur export'
+EXPORT_BATCH_SIZE = 2000
@@ -0,0 +1,110 @@
+# ----------------------------------------------------------------------------#
+# Streaming exports of venues, artists and shows as CSV or NDJSON.
+# ----------------------------------------------------------------------------#
+# Rows come from a server side cursor in batches and every batch is encoded
+# and handed on before the next one is fetched, so exporting a table takes
+# the same memory whatever its size. The columns match what 'flask fyyur
+# import' reads, an export can be imported elsewhere as is.
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from models import Venue, Artist, Show
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_query(entity, since=None):
+    """Select every row of 'venues', 'artists' or 'shows', or only those
+    changed at or after since. Rows come in no particular order: a sequential
+    scan is the cheapest way to read a whole table."""
+    if entity == 'venues':
+        query, updated_at = select(Venue.__table__), Venue.updated_at
+    elif entity == 'artists':
+        query, updated_at = select(Artist.__table__), Artist.updated_at
+    elif entity == 'shows':
+        query = (select(Show.c.id,
+                        Show.c.Venue_id.label('venue_id'),
+                        Venue.name.label('venue'),
+                        Venue.city.label('venue_city'),
+                        Show.c.Artist_id.label('artist_id'),
+                        Artist.name.label('artist'),
+                        Show.c.start_time,
+                        Show.c.updated_at)
+                 .select_from(Show).join(Venue).join(Artist))
+        # the row carries the venue and artist names, renaming either changes it
+        updated_at = func.greatest(Show.c.updated_at, Venue.updated_at, Artist.updated_at)
+    else:
+        raise ValueError(f'unknown export {entity!r}')
+    if since is not None:
+        query = query.where(updated_at >= since)
+    return query
+
+
+def export_batches(connection, query, batch_size):
+    """Yield the rows of query in lists of batch_size, fetched through a server
+    side cursor (psycopg2 named cursor) instead of all at once."""
+    result = (connection.execution_options(stream_results=True, max_row_buffer=batch_size)
+              .execute(query))
+    yield from result.partitions(batch_size)
+
+
+def csv_value(value):
+    if isinstance(value, list):
+        # comma separated, the way the import reads genres back
+        return ','.join(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
+
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def encode_csv(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows([csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def encode_ndjson(columns, batches):
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(columns, row)), default=json_default) + '\n'
+                      for row in rows).encode('utf-8')
+
+
+def gzip_chunks(chunks):
+    """Compress a stream of byte chunks into one gzip stream."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(connection, entity, fmt, since=None, batch_size=2000, compress=False):
+    """Byte chunks of a whole export; consume them while connection is open."""
+    query = export_query(entity, since)
+    columns = [column.name for column in query.selected_columns]
+    encode = encode_csv if fmt == 'csv' else encode_ndjson
+    chunks = encode(columns, export_batches(connection, query, batch_size))
+    return gzip_chunks(chunks) if compress else chunks
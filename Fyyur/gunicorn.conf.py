@@ -0,0 +1,31 @@
+# ----------------------------------------------------------------------------#
+# gunicorn settings: gunicorn -c gunicorn.conf.py wsgi:app
+# ----------------------------------------------------------------------------#
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+# a 'local' page cache lives in one worker: the others would keep serving
+# the pages it invalidates, see cache.py
+if workers > 1 and os.environ.get('PAGE_CACHE_TYPE') == 'local':
+    raise RuntimeError("PAGE_CACHE_TYPE 'local' serves stale pages with several workers, "
+                       "use 'shared' with PAGE_CACHE_URL")
+
+# import the app and compile its templates once in the master, the workers
+# are forked from it and share those pages instead of each doing the work
+preload_app = True
+
+
+def post_fork(server, worker):
+    # a connection opened in the master must not be shared by the workers:
+    # every worker starts with empty pools of its own. close=False leaves the
+    # master's sockets alone, closing them from a child would break them
+    from models import db
+    app = worker.app.wsgi()
+    with app.app_context():
+        for bind in [None, *(app.config.get('SQLALCHEMY_BINDS') or {})]:
+            db.get_engine(app, bind).dispose(close=False)
@@ -0,0 +1,447 @@
+# ----------------------------------------------------------------------------#
+# Helpers shared by the venue, artist, show and API views.
+# ----------------------------------------------------------------------------#
+
+import base64
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+
+from flask import current_app, g, request, Response, abort, jsonify, session
+from sqlalchemy import func, or_, and_, case, cast, tuple_
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.orm.exc import StaleDataError
+
+from cache import page_cache
+from importer import TRUE_VALUES, FALSE_VALUES
+from models import db, Venue, Artist, Show
+
+
+def parse_datetime(value):
+    # dateutil is imported on first use, not by every worker at startup
+    import dateutil.parser
+    # a number too large for a date overflows instead of failing to parse;
+    # ValueError is what request.args.get(type=...) and click turn into a 400
+    try:
+        return dateutil.parser.parse(value)
+    except OverflowError:
+        raise ValueError(f'invalid date/time {value!r}')
+
+
+def parse_bool(value):
+    # the spellings the importer accepts; ValueError otherwise, as for a date
+    if value.lower() in TRUE_VALUES:
+        return True
+    if value.lower() in FALSE_VALUES:
+        return False
+    raise ValueError(f'invalid boolean {value!r}')
+
+
+def split_shows(columns, joined, criterion, now, limit=None):
+    # fetch every show matching criterion in ONE query and split it into
+    # (past_shows, upcoming_shows, past_shows_count, upcoming_shows_count)
+    # around the single captured timestamp 'now', so lists and counts agree.
+    # window functions count each partition and rank its rows, which lets an
+    # optional limit cap both lists in SQL without losing the real counts:
+    # upcoming shows keep the soonest ones, past shows keep the latest ones.
+    is_upcoming = Show.c.start_time > now
+    ranked = (db.session.query(
+        *columns,
+        Show.c.start_time.label("start_time"),
+        is_upcoming.label("is_upcoming"),
+        func.count().over(partition_by=is_upcoming).label("shows_count"),
+        func.row_number().over(partition_by=is_upcoming,
+                               order_by=Show.c.start_time).label("soonest"),
+        func.row_number().over(partition_by=is_upcoming,
+                               order_by=Show.c.start_time.desc()).label("latest"))
+        .select_from(Show)
+        .join(joined)
+        .filter(criterion)
+        .subquery())
+    query = db.session.query(ranked).order_by(ranked.c.start_time)
+    if limit is not None:
+        query = query.filter(or_(
+            and_(ranked.c.is_upcoming, ranked.c.soonest <= limit),
+            and_(~ranked.c.is_upcoming, ranked.c.latest <= limit)))
+    past_shows, upcoming_shows = [], []
+    counts = {True: 0, False: 0}
+    for row in query.all():
+        (upcoming_shows if row.is_upcoming else past_shows).append(row)
+        counts[row.is_upcoming] = row.shows_count
+    # most recent past show first
+    past_shows.reverse()
+    return past_shows, upcoming_shows, counts[False], counts[True]
+
+
+def load_venue_shows(venue, now, limit=None):
+    # attach the past/upcoming shows of venue and their counts, see split_shows.
+    # the labels make 'artist_id' etc. attributes of every show, as used by
+    # show_venue.html and the api
+    venue.shows_limit = limit
+    (venue.past_shows,
+     venue.upcoming_shows,
+     venue.past_shows_count,
+     venue.upcoming_shows_count) = split_shows(
+        [Artist.id.label("artist_id"),
+         Artist.name.label("artist_name"),
+         Artist.image_link.label("artist_image_link")],
+        Artist,
+        Show.c.Venue_id == venue.id,
+        now,
+        limit)
+
+
+def load_artist_shows(artist, now, limit=None):
+    # the same for an artist, its shows name their venues
+    artist.shows_limit = limit
+    (artist.past_shows,
+     artist.upcoming_shows,
+     artist.past_shows_count,
+     artist.upcoming_shows_count) = split_shows(
+        [Venue.id.label("venue_id"),
+         Venue.name.label("venue_name"),
+         Venue.image_link.label("venue_image_link")],
+        Venue,
+        Show.c.Artist_id == artist.id,
+        now,
+        limit)
+
+
+def venue_areas(criteria=()):
+    # one round trip for every area: upcoming show counts are kept on the
+    # venue rows by the database (see models.py), sort by area so the rows of
+    # one city,state are adjacent and can be grouped in python.
+    # (the former distinct(city,state) + filter_by per area cost 1 + N queries)
+    venue_rows = (db.session.query(
+        Venue.city,
+        Venue.state,
+        Venue.id,
+        Venue.name,
+        Venue.num_upcoming_shows)
+        .filter(*criteria)
+        .order_by(Venue.state, Venue.city, Venue.id)
+        .all())
+    # gather id, name and upcoming show count in one venues list based on city,state
+    return [{
+        "city": city,
+        "state": state,
+        "venues": [{
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": row.num_upcoming_shows
+        } for row in rows]
+    } for (city, state), rows in groupby(venue_rows, key=lambda row: (row.city, row.state))]
+
+
+def genre_filter(model):
+    # ?genre=Jazz&genre=Folk keeps the venues/artists playing any of those
+    # genres, or all of them with ?match=all. && (overlap) and @> (contains)
+    # on the genres array are answered by its GIN index (see models.py).
+    # returns (criteria, genres, match)
+    genres = [genre for genre in request.args.getlist('genre') if genre]
+    match = request.args.get('match', 'any')
+    if match not in ('any', 'all'):
+        abort(400)
+    if not genres:
+        return [], genres, match
+    # cast to the column's type, postgres has no && between varchar[] and text[]
+    wanted = cast(array(genres), model.genres.type)
+    operator = '&&' if match == 'any' else '@>'
+    return [model.genres.op(operator)(wanted)], genres, match
+
+
+def genre_facets(model, criteria):
+    # [(genre, count)] over every row matching criteria, not just one page,
+    # most common first: the genres of the matching rows are unnested and
+    # counted in one query
+    genres = (db.session.query(func.unnest(model.genres).label('genre'))
+              .filter(*criteria)
+              .subquery())
+    return (db.session.query(genres.c.genre, func.count().label('count'))
+            .group_by(genres.c.genre)
+            .order_by(func.count().desc(), genres.c.genre)
+            .all())
+
+
+def shows_window(now):
+    # filters for the shows requested by ?when=upcoming (default), past or all,
+    # optionally narrowed by ?from=/?to= dates
+    when = request.args.get('when', 'upcoming')
+    window = []
+    if when == 'upcoming':
+        window.append(Show.c.start_time > now)
+    elif when == 'past':
+        window.append(Show.c.start_time <= now)
+    elif when != 'all':
+        abort(400)
+    window_start = request.args.get('from', type=parse_datetime)
+    if window_start is not None:
+        window.append(Show.c.start_time >= window_start)
+    window_end = request.args.get('to', type=parse_datetime)
+    if window_end is not None:
+        window.append(Show.c.start_time < window_end)
+    return window
+
+
+def shows_query(window, *columns):
+    # Rename Fields so frontend can access the correct values
+    return (db.session.query(
+        Show.c.id,
+        Show.c.start_time,
+        Venue.id.label("venue_id"),
+        Venue.name.label("venue_name"),
+        Artist.id.label("artist_id"),
+        Artist.name.label("artist_name"),
+        Artist.image_link.label("artist_image_link"),
+        *columns)
+        .select_from(Show)
+        .join(Venue)
+        .join(Artist)
+        .filter(*window))
+
+
+def api_response(version, build):
+    # strong ETag from the row versions a response is built from; a client
+    # sending it back in If-None-Match gets a 304 and build() never runs
+    etag = hashlib.sha1(json.dumps([request.full_path, version], default=str).encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    # clients may keep a response but must revalidate it before every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def load_with_version(model, column, partner, partner_column, entity_id, now):
+    # load a venue (or artist) with the version of everything its page shows,
+    # in ONE indexed query: its own updated_at, the number of its shows and of
+    # those upcoming at 'now', the latest updated_at of its shows and of the
+    # partners they name, and the start of its latest show already started.
+    # returns (entity, version, checked_at), checked_at being the database's
+    # clock, the one updated_at comes from; (None, None, None) when there is
+    # no such row
+    row = (db.session.query(
+        model,
+        func.statement_timestamp(),
+        func.count(Show.c.id),
+        func.count(Show.c.id).filter(Show.c.start_time > now),
+        func.max(Show.c.updated_at),
+        func.max(partner.updated_at),
+        func.max(Show.c.start_time).filter(Show.c.start_time <= now))
+        .outerjoin(Show, column == model.id)
+        .outerjoin(partner, partner_column == partner.id)
+        .filter(model.id == entity_id)
+        .group_by(model.id)
+        .first())
+    if row is None:
+        return None, None, None
+    entity, checked_at, *version = row
+    return entity, [entity.updated_at, *version], checked_at
+
+
+def last_modified_of(version):
+    # the page last changed with the latest of its rows, or when its latest
+    # started show moved from the upcoming to the past list, in utc. updated_at
+    # carries its time zone; a start time is a wall time of the app host, the
+    # clock 'now' split the shows with
+    updated_at, shows_count, upcoming_count, *changes = version
+    return max(change.astimezone(timezone.utc)
+               for change in [updated_at, *changes] if change is not None)
+
+
+def modified_since(last_modified):
+    # False when the client's copy (If-Modified-Since) is still current;
+    # http dates are utc with whole seconds
+    since = request.if_modified_since
+    return since is None or last_modified.replace(microsecond=0) > since
+
+
+def settles_in(last_modified, checked_at):
+    # seconds until the second of last_modified is over on the database's
+    # clock, 0 once it is: a change later within the same second would carry
+    # the same http date and go unnoticed
+    settled_at = last_modified.replace(microsecond=0) + timedelta(seconds=1)
+    return max(0.0, (settled_at - checked_at).total_seconds())
+
+
+def page_response(page, last_modified, settled):
+    # the page (or a 304 without it) with its Last-Modified header, sent only
+    # once last_modified is settled, see settles_in
+    response = Response(page) if modified_since(last_modified) else Response(status=304)
+    if settled:
+        response.last_modified = last_modified
+    return response
+
+
+def api_show(row, fields):
+    show = {field: getattr(row, field) for field in fields}
+    show["start_time"] = row.start_time.isoformat()
+    return show
+
+
+def api_shows_of(entity, fields):
+    # the show lists and counts attached by load_venue_shows/load_artist_shows
+    return {
+        "past_shows": [api_show(row, fields) for row in entity.past_shows],
+        "upcoming_shows": [api_show(row, fields) for row in entity.upcoming_shows],
+        "past_shows_count": entity.past_shows_count,
+        "upcoming_shows_count": entity.upcoming_shows_count,
+    }
+
+
+def search_by_term(model, search_term):
+    # case insensitive partial match on name, city or state, served by the
+    # pg_trgm GIN indexes (migration e74eb81c73ff) instead of a sequential scan.
+    # count(*) over () attaches the total to every matched row, so results and
+    # count come back in ONE statement; best matches on the name come first
+    like_search = f'%{search_term}%'
+    relevance = case(
+        (model.name.ilike(search_term), 0),
+        (model.name.ilike(f'{search_term}%'), 1),
+        (model.name.ilike(like_search), 2),
+        else_=3)
+    results = (db.session.query(
+        model.id,
+        model.name,
+        model.num_upcoming_shows,
+        func.count().over().label("total"))
+        .filter(or_(
+            model.name.ilike(like_search),
+            model.city.ilike(like_search),
+            model.state.ilike(like_search)))
+        .order_by(relevance, model.name, model.id)
+        .all())
+    return {
+        "count": results[0].total if results else 0,
+        "data": results
+    }
+
+
+def encode_cursor(values):
+    # opaque keyset cursor: the sort key values of a row, json encoded in url safe base64
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+# the python type of each kind of sort key a cursor may carry
+CURSOR_KEY_TYPES = {
+    int: lambda value: type(value) is int and -2 ** 31 <= value < 2 ** 31,
+    str: lambda value: isinstance(value, str),
+    datetime: lambda value: isinstance(value, str),
+}
+
+
+def decode_cursor(cursor, types):
+    # the key values of a cursor from encode_cursor, one per type in 'types'
+    # (int, str or datetime, see CURSOR_KEY_TYPES, none is NULL: a NULL never
+    # compares greater or smaller); a cursor that is not such
+    # a list, tampered or written for another listing, is a 400
+    if cursor is None:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            abort(400)
+        if not all(CURSOR_KEY_TYPES[kind](value) for kind, value in zip(types, values)):
+            abort(400)
+        return [datetime.fromisoformat(value) if kind is datetime else value
+                for kind, value in zip(types, values)]
+    except (ValueError, TypeError):
+        abort(400)
+
+
+def keyset_page(query, keys, per_page, after=None, before=None):
+    # seek pagination on the unique, ordered tuple 'keys': a page starts right
+    # after (or ends right before) the key values of a known row, so the cost
+    # does not grow with the page number and rows inserted or deleted meanwhile
+    # never shift other rows between pages the way OFFSET does.
+    # returns (rows, prev_cursor, next_cursor), a cursor is None at either end
+    def cursor_of(row):
+        return encode_cursor([row._mapping[key] for key in keys])
+
+    if before is not None:
+        rows = (query.filter(tuple_(*keys) < tuple_(*before))
+                .order_by(*[key.desc() for key in keys])
+                .limit(per_page + 1)
+                .all())
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        prev_cursor = cursor_of(rows[0]) if has_more else None
+        next_cursor = cursor_of(rows[-1]) if rows else None
+        return rows, prev_cursor, next_cursor
+    if after is not None:
+        query = query.filter(tuple_(*keys) > tuple_(*after))
+    rows = query.order_by(*keys).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    prev_cursor = cursor_of(rows[0]) if after is not None and rows else None
+    next_cursor = cursor_of(rows[-1]) if has_more else None
+    return rows, prev_cursor, next_cursor
+
+
+def page_cacheable():
+    # only the plain page is cached: query args change what is rendered and
+    # pending flash messages must not be baked into a shared copy.
+    # check before rendering, rendering consumes the flash messages
+    return not request.args and '_flashes' not in session
+
+
+def cached_page(key):
+    # (page, last_modified, settled) from the page cache, (None, None, None)
+    # on a miss or a tombstone (see invalidate_pages)
+    entry = page_cache.get(key)
+    if not entry:
+        return None, None, None
+    times, page = entry.split('\n', 1)
+    last_modified, settled_at = times.split(' ')
+    settled = datetime.now(timezone.utc) >= datetime.fromisoformat(settled_at)
+    return page, datetime.fromisoformat(last_modified), settled
+
+
+def cache_page(key, page, upcoming_shows, last_modified, checked_at):
+    # keep the page until the next upcoming show starts, at that moment it
+    # moves from the upcoming to the past list and the page must be rebuilt.
+    # the entry is the page's last modification time and the time of this
+    # process at which it settles (see settles_in), a newline and the page.
+    # a page read from a replica is not kept: rendered from a lagging copy,
+    # it would outlive the invalidation of a write the primary already has.
+    # the page is only added where there is no entry: a tombstone left by a
+    # write meanwhile means it may have been rendered from the rows before it
+    if g.get('replica') is not None:
+        return
+    settled_at = datetime.now(timezone.utc) + timedelta(seconds=settles_in(last_modified, checked_at))
+    ttl = current_app.config.get('PAGE_CACHE_TTL', 3600)
+    if upcoming_shows:
+        ttl = min(ttl, (upcoming_shows[0].start_time - datetime.now()).total_seconds())
+    if ttl > 0:
+        page_cache.add(key, f'{last_modified.isoformat()} {settled_at.isoformat()}\n{page}', ttl)
+
+
+def invalidate_pages(venue_ids=(), artist_ids=()):
+    # replace the pages with tombstones (empty entries) rather than delete
+    # them: a render that read the rows before the write and stores its page
+    # after this would otherwise cache the old page for PAGE_CACHE_TTL.
+    # cache_page does not overwrite a tombstone, so the pages are rebuilt
+    # without caching until it expires (PAGE_CACHE_TOMBSTONE_TTL, longer than
+    # a render can take)
+    ttl = current_app.config.get('PAGE_CACHE_TOMBSTONE_TTL', 30)
+    for key in [*[f'venue:{venue_id}' for venue_id in venue_ids],
+                *[f'artist:{artist_id}' for artist_id in artist_ids]]:
+        page_cache.set(key, '', ttl)
+
+
+def check_version(entity, version):
+    # the edit forms post the version of the row they were filled from; if it
+    # was updated since, saving would silently drop those changes.
+    # a form without a version is checked against the version just loaded
+    if version is not None and version != entity.version:
+        raise StaleDataError(f'{entity!r} is at version {entity.version}, not {version}')
+
+
+def show_partner_ids(column, partner_column, entity_id):
+    # ids on the other side of every show of one venue (or artist), their
+    # pages render this venue (or artist) in their show lists
+    return [partner_id for partner_id, in
+            db.session.query(partner_column).filter(column == entity_id).distinct()]
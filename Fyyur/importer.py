@@ -0,0 +1,372 @@
+# ----------------------------------------------------------------------------#
+# Bulk import of venues, artists and shows from CSV or NDJSON files.
+# ----------------------------------------------------------------------------#
+# Rows are validated while the file is read, streamed into a temporary staging
+# table (COPY, or batched executemany) and merged into the live tables with a
+# few set based statements, instead of one ORM object and commit per row.
+
+import csv
+import io
+import json
+import os
+import time
+
+from sqlalchemy import Table, Column, Integer, MetaData, DateTime, String
+
+from models import Venue, Artist
+
+TRUE_VALUES = {'true', 't', 'yes', 'y', '1', 'on'}
+FALSE_VALUES = {'false', 'f', 'no', 'n', '0', 'off'}
+
+VENUE_FIELDS = ['name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+                'genres', 'website', 'seeking_talent', 'seeking_description']
+ARTIST_FIELDS = ['name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+                 'genres', 'website', 'seeking_venue', 'seeking_description']
+
+# fields a row is rejected without, as the create forms require them
+REQUIRED_FIELDS = {
+    'venues': ['name', 'city', 'state'],
+    'artists': ['name', 'city', 'state'],
+    'shows': ['venue', 'artist', 'start_time'],
+}
+
+
+class ImportReport:
+    """Outcome of importing one file."""
+
+    def __init__(self, kind, path):
+        self.kind = kind
+        self.path = path
+        self.read = 0
+        self.inserted = 0
+        self.updated = 0
+        # (line, reason) of every row that was not imported
+        self.rejects = []
+        self.elapsed = 0.0
+
+    @property
+    def skipped(self):
+        # valid rows already in the database or repeated further down the file
+        return self.read - len(self.rejects) - self.inserted - self.updated
+
+    @property
+    def rows_per_sec(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f'{os.path.basename(self.path)}: {self.read} {self.kind} rows in {self.elapsed:.2f}s '
+                f'({self.rows_per_sec:.0f} rows/s), {self.inserted} inserted, {self.updated} updated, '
+                f'{self.skipped} skipped, {len(self.rejects)} rejected')
+
+
+# ----------------------------------------------------------------------------#
+# Reading and validating.
+# ----------------------------------------------------------------------------#
+
+def read_rows(path):
+    """Yield (line, row) for every record of a .csv or .ndjson/.jsonl file;
+    a row that cannot be decoded comes back as a ValueError."""
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+    elif path.endswith(('.ndjson', '.jsonl')):
+        with open(path, encoding='utf-8') as f:
+            for line, text in enumerate(f, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except ValueError as e:
+                    yield line, ValueError(f'invalid JSON: {e}')
+                    continue
+                yield line, row if isinstance(row, dict) else ValueError('not a JSON object')
+    else:
+        raise ValueError(f'{path}: expected a .csv, .ndjson or .jsonl file')
+
+
+def clean_value(column, value):
+    """Convert one raw field to the python value of the staging column."""
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == '' or value == []:
+        return None
+    if isinstance(column.type, DateTime):
+        # dateutil is imported on first use, not by every worker at startup
+        import dateutil.parser
+        # a JSON number or boolean would fail the whole COPY, reject its row
+        if not isinstance(value, str):
+            raise ValueError(f'{column.name}: invalid date/time {value!r}')
+        try:
+            return dateutil.parser.parse(value)
+        except (ValueError, OverflowError):
+            raise ValueError(f'{column.name}: invalid date/time {value!r}')
+    if column.name in ('seeking_talent', 'seeking_venue'):
+        if isinstance(value, bool):
+            return value
+        if str(value).lower() in TRUE_VALUES:
+            return True
+        if str(value).lower() in FALSE_VALUES:
+            return False
+        raise ValueError(f'{column.name}: invalid boolean {value!r}')
+    if column.name == 'genres':
+        genres = value.split(',') if isinstance(value, str) else value
+        if not isinstance(genres, list):
+            raise ValueError(f'genres: expected a list, got {value!r}')
+        return [str(genre).strip() for genre in genres if str(genre).strip()] or None
+    value = str(value)
+    # an over long value would fail the whole COPY, reject just its row instead
+    if column.type.length is not None and len(value) > column.type.length:
+        raise ValueError(f'{column.name}: longer than {column.type.length} characters')
+    return value
+
+
+def clean_rows(staging, kind, path, report):
+    """Yield the valid rows of path as staging table dicts, recording the rest
+    in report.rejects."""
+    required = REQUIRED_FIELDS[kind]
+    columns = [column for column in staging.columns if column.name != 'line']
+    for line, raw in read_rows(path):
+        report.read += 1
+        try:
+            if isinstance(raw, ValueError):
+                raise raw
+            row = {'line': line}
+            for column in columns:
+                row[column.name] = clean_value(column, raw.get(column.name))
+            missing = [name for name in required if row[name] is None]
+            if missing:
+                raise ValueError(f'missing {", ".join(missing)}')
+        except ValueError as e:
+            report.rejects.append((line, str(e)))
+            continue
+        yield row
+
+
+# ----------------------------------------------------------------------------#
+# Staging.
+# ----------------------------------------------------------------------------#
+
+def staging_table(kind):
+    """Temporary table holding one file's rows until they are merged; it is
+    dropped when the import transaction commits."""
+    if kind == 'shows':
+        # shows name their venue and artist, venue_city tells apart venues sharing a name
+        columns = [Column('venue', String), Column('venue_city', String(120)),
+                   Column('artist', String), Column('start_time', DateTime)]
+    else:
+        model, fields = (Venue, VENUE_FIELDS) if kind == 'venues' else (Artist, ARTIST_FIELDS)
+        columns = [Column(name, model.__table__.c[name].type) for name in fields]
+    return Table(f'import_{kind}', MetaData(), Column('line', Integer), *columns,
+                 prefixes=['TEMPORARY'], postgresql_on_commit='DROP')
+
+
+def copy_literal(value):
+    """Format a python value as a field of COPY's csv format."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        # postgres array literal, every element quoted
+        return '{' + ','.join(
+            '"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"' for item in value) + '}'
+    return str(value)
+
+
+class CopyStream:
+    """Read-only file over rows formatted as COPY csv, so COPY FROM STDIN
+    streams a file of any size without building the payload in memory."""
+
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator='\n')
+
+    def read(self, size=-1):
+        for row in self.rows:
+            self.writer.writerow([copy_literal(row[name]) for name in self.columns])
+            if 0 <= size <= self.buffer.tell():
+                break
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+def load_staging(connection, staging, rows, method, batch_size):
+    columns = [column.name for column in staging.columns]
+    if method == 'copy':
+        cursor = connection.connection.cursor()
+        # csv format: an unquoted empty field is NULL, every empty value was made None
+        cursor.copy_expert(
+            f'COPY {staging.name} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)',
+            CopyStream(rows, columns), size=65536)
+        cursor.close()
+    else:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                connection.execute(staging.insert(), batch)
+                batch = []
+        if batch:
+            connection.execute(staging.insert(), batch)
+    # temporary tables are never auto analyzed, the merge plans need the stats
+    connection.exec_driver_sql(f'ANALYZE {staging.name}')
+
+
+# ----------------------------------------------------------------------------#
+# Merging.
+# ----------------------------------------------------------------------------#
+# within a file the last row for a name wins; existing rows keep the values
+# the file leaves empty.
+
+MERGE_ARTISTS_SQL = '''
+WITH merged AS (
+    INSERT INTO "Artist" (name, city, state, phone, image_link, facebook_link,
+                          genres, website, seeking_venue, seeking_description)
+    SELECT name, city, state, phone, image_link, facebook_link,
+           genres, website, seeking_venue, seeking_description
+      FROM import_artists s
+     WHERE NOT EXISTS (SELECT 1 FROM import_artists d WHERE d.name = s.name AND d.line > s.line)
+    ON CONFLICT (name) DO UPDATE
+       SET city = excluded.city,
+           state = excluded.state,
+           phone = coalesce(excluded.phone, "Artist".phone),
+           image_link = coalesce(excluded.image_link, "Artist".image_link),
+           facebook_link = coalesce(excluded.facebook_link, "Artist".facebook_link),
+           genres = coalesce(excluded.genres, "Artist".genres),
+           website = coalesce(excluded.website, "Artist".website),
+           seeking_venue = coalesce(excluded.seeking_venue, "Artist".seeking_venue),
+           seeking_description = coalesce(excluded.seeking_description, "Artist".seeking_description),
+           -- an edit form filled before the import must not overwrite it
+           version = "Artist".version + 1
+    RETURNING xmax = 0 AS inserted
+)
+SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged
+'''
+
+# Venue.name is not unique, a venue is identified by its name, city and state
+MERGE_VENUES_SQL = '''
+WITH latest AS (
+    SELECT * FROM import_venues s
+     WHERE NOT EXISTS (SELECT 1 FROM import_venues d
+                        WHERE (d.name, d.city, d.state) = (s.name, s.city, s.state) AND d.line > s.line)
+), updated AS (
+    UPDATE "Venue" AS v
+       SET address = coalesce(l.address, v.address),
+           phone = coalesce(l.phone, v.phone),
+           image_link = coalesce(l.image_link, v.image_link),
+           facebook_link = coalesce(l.facebook_link, v.facebook_link),
+           genres = coalesce(l.genres, v.genres),
+           website = coalesce(l.website, v.website),
+           seeking_talent = coalesce(l.seeking_talent, v.seeking_talent),
+           seeking_description = coalesce(l.seeking_description, v.seeking_description),
+           version = v.version + 1
+      FROM latest AS l
+     WHERE (v.name, v.city, v.state) = (l.name, l.city, l.state)
+    RETURNING 1
+), inserted AS (
+    INSERT INTO "Venue" (name, city, state, address, phone, image_link, facebook_link,
+                         genres, website, seeking_talent, seeking_description)
+    SELECT name, city, state, address, phone, image_link, facebook_link,
+           genres, website, coalesce(seeking_talent, false), seeking_description
+      FROM latest AS l
+     WHERE NOT EXISTS (SELECT 1 FROM "Venue" v WHERE (v.name, v.city, v.state) = (l.name, l.city, l.state))
+    RETURNING 1
+)
+SELECT (SELECT count(*) FROM inserted), (SELECT count(*) FROM updated)
+'''
+
+# resolve venue and artist names to ids, a venue name must match exactly one venue
+RESOLVE_SHOWS_SQL = '''
+CREATE TEMPORARY TABLE import_shows_resolved ON COMMIT DROP AS
+SELECT s.line, s.start_time, a.id AS artist_id, min(v.id) AS venue_id, count(v.id) AS venues
+  FROM import_shows s
+  LEFT JOIN "Artist" a ON a.name = s.artist
+  LEFT JOIN "Venue" v ON v.name = s.venue AND (s.venue_city IS NULL OR v.city = s.venue_city)
+ GROUP BY s.line, s.start_time, a.id
+'''
+
+SHOW_REJECTS_SQL = '''
+SELECT line, CASE WHEN artist_id IS NULL THEN 'unknown artist'
+                  WHEN venues = 0 THEN 'unknown venue'
+                  ELSE 'venue name matches ' || venues || ' venues, add venue_city' END
+  FROM import_shows_resolved
+ WHERE artist_id IS NULL OR venues <> 1
+'''
+
+# a show already listed (same venue, artist and start time) is skipped.
+# the row trigger show_counters would run two updates per imported show on
+# the same few venue/artist rows: it is switched off for the transaction and
+# the counters of each venue and artist of the new shows are added to once,
+# in the same statement. the watermark is locked beforehand
+# (LOCK_ROLLOVER_SQL), exactly as the trigger does, see models.py
+LOCK_ROLLOVER_SQL = 'SELECT rolled_over_at FROM "ShowRollover" FOR SHARE'
+MERGE_SHOWS_SQL = '''
+WITH inserted AS (
+    INSERT INTO "Show" ("Venue_id", "Artist_id", start_time)
+    SELECT DISTINCT venue_id, artist_id, start_time
+      FROM import_shows_resolved r
+     WHERE artist_id IS NOT NULL AND venues = 1
+       AND NOT EXISTS (SELECT 1 FROM "Show" s
+                        WHERE s."Venue_id" = r.venue_id AND s."Artist_id" = r.artist_id
+                          AND s.start_time = r.start_time)
+    RETURNING "Venue_id", "Artist_id", start_time
+), classified AS (
+    SELECT i."Venue_id", i."Artist_id", i.start_time > w.rolled_over_at AS upcoming
+      FROM inserted i, "ShowRollover" w
+), venues AS (
+    UPDATE "Venue" AS v
+       SET num_upcoming_shows = v.num_upcoming_shows + added.upcoming,
+           num_past_shows = v.num_past_shows + added.past
+      FROM (SELECT "Venue_id" AS id, count(*) FILTER (WHERE upcoming) AS upcoming,
+                   count(*) FILTER (WHERE NOT upcoming) AS past
+              FROM classified GROUP BY "Venue_id") AS added
+     WHERE v.id = added.id
+), artists AS (
+    UPDATE "Artist" AS a
+       SET num_upcoming_shows = a.num_upcoming_shows + added.upcoming,
+           num_past_shows = a.num_past_shows + added.past
+      FROM (SELECT "Artist_id" AS id, count(*) FILTER (WHERE upcoming) AS upcoming,
+                   count(*) FILTER (WHERE NOT upcoming) AS past
+              FROM classified GROUP BY "Artist_id") AS added
+     WHERE a.id = added.id
+)
+SELECT count(*) FROM inserted
+'''
+
+
+def merge_staging(connection, kind, report):
+    text = connection.exec_driver_sql
+    if kind == 'artists':
+        report.inserted, report.updated = text(MERGE_ARTISTS_SQL).one()
+    elif kind == 'venues':
+        report.inserted, report.updated = text(MERGE_VENUES_SQL).one()
+    else:
+        text(RESOLVE_SHOWS_SQL)
+        report.rejects.extend(tuple(row) for row in text(SHOW_REJECTS_SQL))
+        text(LOCK_ROLLOVER_SQL)
+        text("SET LOCAL fyyur.show_counters = 'off'")
+        report.inserted = text(MERGE_SHOWS_SQL).scalar()
+        text("SET LOCAL fyyur.show_counters = 'on'")
+
+
+def import_file(session, kind, path, method='copy', batch_size=5000):
+    """Import a file of 'venues', 'artists' or 'shows' in one transaction."""
+    report = ImportReport(kind, path)
+    started = time.perf_counter()
+    connection = session.connection()
+    # a large file legitimately takes longer than the web statement_timeout
+    connection.exec_driver_sql('SET LOCAL statement_timeout = 0')
+    staging = staging_table(kind)
+    staging.create(connection)
+    load_staging(connection, staging, clean_rows(staging, kind, path, report), method, batch_size)
+    merge_staging(connection, kind, report)
+    session.commit()
+    report.rejects.sort()
+    report.elapsed = time.perf_counter() - started
+    return report
@@ -0,0 +1,189 @@
+# ----------------------------------------------------------------------------#
+# Runtime metrics, served as json by /debug/metrics.
+# ----------------------------------------------------------------------------#
+# Every process (gunicorn worker) keeps its own numbers.
+
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from flask import g, has_request_context
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+
+class Histogram:
+    """Count of observations (milliseconds unless given other buckets) per
+    bucket, plus count, sum and max.
+
+    Not thread safe on its own, the owner holds a lock around observe().
+    """
+
+    BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # one more for the observations above the last bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def to_dict(self):
+        # cumulative counts per upper bound, as prometheus 'le' buckets
+        cumulative, total = {}, 0
+        for bound, count in zip([*self.buckets, '+Inf'], self.counts):
+            total += count
+            cumulative[str(bound)] = total
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "max": round(self.max, 3),
+            "buckets": cumulative
+        }
+
+
+class PoolMetrics:
+    """How long checkouts waited for a pool connection, and how many timed out."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkout_wait = Histogram()
+        self.timeouts = 0
+
+    def observe_checkout(self, seconds):
+        with self.lock:
+            self.checkout_wait.observe(seconds * 1000)
+
+    def observe_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+
+    def to_dict(self, pool):
+        with self.lock:
+            checkout_wait = self.checkout_wait.to_dict()
+            timeouts = self.timeouts
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "checkout_timeouts": timeouts,
+            "checkout_wait_ms": checkout_wait
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool recording the wait of every checkout in pool_metrics: the
+    time until a connection was free, or opened while under max_overflow."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.observe_timeout()
+            raise
+        pool_metrics.observe_checkout(time.perf_counter() - started)
+        return connection
+
+
+# ----------------------------------------------------------------------------#
+# Queries per request.
+# ----------------------------------------------------------------------------#
+# A sampled request carries a QueryStats in g.query_stats, filled by the
+# cursor execute events of every engine (primary and replicas). Requests left
+# out of the sample cost one check of g per statement.
+
+
+class QueryStats:
+    """Statements run by one request, their database time and how many
+    times each statement (its parameterized SQL text) ran."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+        self.executing = None
+
+    def repeated(self, threshold):
+        """Statements run threshold times or more: the loop of an N+1."""
+        return {statement: count for statement, count in self.statements.items() if count >= threshold}
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = g.get('query_stats') if has_request_context() else None
+    if stats is not None:
+        stats.executing = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = g.get('query_stats') if has_request_context() else None
+    if stats is not None and stats.executing is not None:
+        stats.seconds += time.perf_counter() - stats.executing
+        stats.executing = None
+        stats.count += 1
+        stats.statements[statement] += 1
+
+
+class RouteMetrics:
+    """Per route histograms of the sampled requests: response time, queries
+    and database time, plus the statements repeated within one request."""
+
+    QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # route -> histograms
+        self.routes = {}
+        # (route, statement) -> [requests repeating it, most repeats in one]
+        self.repeated = {}
+
+    def observe(self, route, stats, repeated):
+        elapsed = time.perf_counter() - stats.started
+        with self.lock:
+            histograms = self.routes.get(route)
+            if histograms is None:
+                histograms = self.routes[route] = {
+                    "response_ms": Histogram(),
+                    "queries": Histogram(self.QUERY_BUCKETS),
+                    "db_ms": Histogram(),
+                }
+            histograms["response_ms"].observe(elapsed * 1000)
+            histograms["queries"].observe(stats.count)
+            histograms["db_ms"].observe(stats.seconds * 1000)
+            for statement, count in repeated.items():
+                seen = self.repeated.setdefault((route, statement), [0, 0])
+                seen[0] += 1
+                seen[1] = max(seen[1], count)
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+            self.repeated.clear()
+
+    def to_dict(self):
+        with self.lock:
+            routes = {route: {name: histogram.to_dict() for name, histogram in histograms.items()}
+                      for route, histograms in self.routes.items()}
+            repeated = [{"route": route, "statement": statement, "requests": requests, "max_repeats": repeats}
+                        for (route, statement), (requests, repeats) in self.repeated.items()]
+        repeated.sort(key=lambda suspect: suspect["requests"], reverse=True)
+        return {"routes": routes, "n_plus_one": repeated}
+
+
+route_metrics = RouteMetrics()
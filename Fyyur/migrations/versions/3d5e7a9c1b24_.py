@@ -0,0 +1,66 @@
+"""show counters trigger can be switched off by bulk imports
+
+Revision ID: 3d5e7a9c1b24
+Revises: 8ed487bcc94c
+Create Date: 2026-10-18 23:40:12.504118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d5e7a9c1b24'
+down_revision = '8ed487bcc94c'
+branch_labels = None
+depends_on = None
+
+# 'flask fyyur import' sets fyyur.show_counters to 'off' for its transaction
+# and updates the counters of the venues and artists of the imported shows
+# once, instead of twice per show through this row trigger
+SHOW_COUNTERS_FUNCTION = """
+CREATE OR REPLACE FUNCTION show_counters() RETURNS trigger AS $$
+DECLARE
+    since timestamp;
+BEGIN
+{skip}    -- shared lock: show writes run concurrently but never during a rollover
+    SELECT rolled_over_at INTO since FROM "ShowRollover" FOR SHARE;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE "Venue"
+           SET num_upcoming_shows = num_upcoming_shows - (OLD.start_time > since)::int,
+               num_past_shows = num_past_shows - (OLD.start_time <= since)::int
+         WHERE id = OLD."Venue_id";
+        UPDATE "Artist"
+           SET num_upcoming_shows = num_upcoming_shows - (OLD.start_time > since)::int,
+               num_past_shows = num_past_shows - (OLD.start_time <= since)::int
+         WHERE id = OLD."Artist_id";
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE "Venue"
+           SET num_upcoming_shows = num_upcoming_shows + (NEW.start_time > since)::int,
+               num_past_shows = num_past_shows + (NEW.start_time <= since)::int
+         WHERE id = NEW."Venue_id";
+        UPDATE "Artist"
+           SET num_upcoming_shows = num_upcoming_shows + (NEW.start_time > since)::int,
+               num_past_shows = num_past_shows + (NEW.start_time <= since)::int
+         WHERE id = NEW."Artist_id";
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+SKIP_WHEN_OFF = """    -- a bulk write that counts its shows itself, in one statement, turns the
+    -- trigger off for its transaction, see MERGE_SHOWS_SQL in importer.py
+    IF current_setting('fyyur.show_counters', true) = 'off' THEN
+        RETURN NULL;
+    END IF;
+"""
+
+
+def upgrade():
+    op.execute(SHOW_COUNTERS_FUNCTION.format(skip=SKIP_WHEN_OFF))
+
+
+def downgrade():
+    op.execute(SHOW_COUNTERS_FUNCTION.format(skip=''))
@@ -0,0 +1,128 @@
+"""show counters maintained by triggers
+
+Revision ID: 7c0bb22ccd17
+Revises: a4e892b1eac0
+Create Date: 2026-10-18 19:58:03.571920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c0bb22ccd17'
+down_revision = 'a4e892b1eac0'
+branch_labels = None
+depends_on = None
+
+# rows recounted per transaction by the backfill
+BATCH_SIZE = 1000
+
+SHOW_COUNTERS_DDL = """
+CREATE OR REPLACE FUNCTION show_counters() RETURNS trigger AS $$
+DECLARE
+    since timestamp;
+BEGIN
+    -- shared lock: show writes run concurrently but never during a rollover
+    SELECT rolled_over_at INTO since FROM "ShowRollover" FOR SHARE;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE "Venue"
+           SET num_upcoming_shows = num_upcoming_shows - (OLD.start_time > since)::int,
+               num_past_shows = num_past_shows - (OLD.start_time <= since)::int
+         WHERE id = OLD."Venue_id";
+        UPDATE "Artist"
+           SET num_upcoming_shows = num_upcoming_shows - (OLD.start_time > since)::int,
+               num_past_shows = num_past_shows - (OLD.start_time <= since)::int
+         WHERE id = OLD."Artist_id";
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE "Venue"
+           SET num_upcoming_shows = num_upcoming_shows + (NEW.start_time > since)::int,
+               num_past_shows = num_past_shows + (NEW.start_time <= since)::int
+         WHERE id = NEW."Venue_id";
+        UPDATE "Artist"
+           SET num_upcoming_shows = num_upcoming_shows + (NEW.start_time > since)::int,
+               num_past_shows = num_past_shows + (NEW.start_time <= since)::int
+         WHERE id = NEW."Artist_id";
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER show_counters
+AFTER INSERT OR DELETE OR UPDATE OF "Venue_id", "Artist_id", start_time ON "Show"
+FOR EACH ROW EXECUTE PROCEDURE show_counters();
+
+CREATE OR REPLACE FUNCTION show_rollover(until timestamp) RETURNS integer AS $$
+DECLARE
+    since timestamp;
+    moved integer;
+BEGIN
+    -- exclusive lock: waits for in-flight show writes, blocks new ones
+    SELECT rolled_over_at INTO since FROM "ShowRollover" FOR UPDATE;
+    IF until <= since THEN
+        RETURN 0;
+    END IF;
+    UPDATE "Venue" AS v
+       SET num_upcoming_shows = v.num_upcoming_shows - started.shows,
+           num_past_shows = v.num_past_shows + started.shows
+      FROM (SELECT "Venue_id" AS id, count(*) AS shows FROM "Show"
+             WHERE start_time > since AND start_time <= until
+             GROUP BY "Venue_id") AS started
+     WHERE v.id = started.id;
+    UPDATE "Artist" AS a
+       SET num_upcoming_shows = a.num_upcoming_shows - started.shows,
+           num_past_shows = a.num_past_shows + started.shows
+      FROM (SELECT "Artist_id" AS id, count(*) AS shows FROM "Show"
+             WHERE start_time > since AND start_time <= until
+             GROUP BY "Artist_id") AS started
+     WHERE a.id = started.id;
+    SELECT count(*) INTO moved FROM "Show" WHERE start_time > since AND start_time <= until;
+    UPDATE "ShowRollover" SET rolled_over_at = until;
+    RETURN moved;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+RECOUNT_SHOWS_SQL = """
+UPDATE "{table}" AS t
+   SET num_upcoming_shows = (SELECT count(*) FROM "Show"
+                              WHERE "{table}_id" = t.id AND start_time > watermark.since),
+       num_past_shows = (SELECT count(*) FROM "Show"
+                          WHERE "{table}_id" = t.id AND start_time <= watermark.since)
+  FROM (SELECT rolled_over_at AS since FROM "ShowRollover" FOR SHARE) AS watermark
+ WHERE t.id BETWEEN :first_id AND :last_id
+"""
+
+
+def upgrade():
+    for table in ['Venue', 'Artist']:
+        op.add_column(table, sa.Column('num_upcoming_shows', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('num_past_shows', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('ShowRollover',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_over_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('INSERT INTO "ShowRollover" (id, rolled_over_at) VALUES (1, LOCALTIMESTAMP)')
+    # the trigger counts every show written from here on, the backfill below
+    # then recounts the existing ones batch by batch, each batch committed on
+    # its own so the tables are never locked as a whole
+    op.execute(SHOW_COUNTERS_DDL)
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        for table in ['Venue', 'Artist']:
+            last_id = bind.execute(sa.text(f'SELECT max(id) FROM "{table}"')).scalar() or 0
+            for first_id in range(1, last_id + 1, BATCH_SIZE):
+                bind.execute(sa.text(RECOUNT_SHOWS_SQL.format(table=table)),
+                             {'first_id': first_id, 'last_id': first_id + BATCH_SIZE - 1})
+
+
+def downgrade():
+    op.execute('DROP TRIGGER show_counters ON "Show"')
+    op.execute('DROP FUNCTION show_counters()')
+    op.execute('DROP FUNCTION show_rollover(timestamp)')
+    op.drop_table('ShowRollover')
+    for table in ['Artist', 'Venue']:
+        op.drop_column(table, 'num_past_shows')
+        op.drop_column(table, 'num_upcoming_shows')
@@ -0,0 +1,35 @@
+"""GIN indexes on the genres of Venue and Artist
+
+Revision ID: 8ed487bcc94c
+Revises: c86484b24e91
+Create Date: 2026-10-18 22:05:37.114092
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8ed487bcc94c'
+down_revision = 'c86484b24e91'
+branch_labels = None
+depends_on = None
+
+# /venues?genre= and /artists?genre= filter with && (any) and @> (all) on the
+# genres arrays; the default GIN operator class of an array indexes its
+# elements and answers both, see genre_filter.
+# built concurrently, outside the migration's transaction, so writes to both
+# tables go on while they build
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for table in ['Venue', 'Artist']:
+            op.create_index(f'ix_{table}_genres', table, ['genres'], postgresql_using='gin',
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ['Artist', 'Venue']:
+            op.drop_index(f'ix_{table}_genres', table_name=table, postgresql_concurrently=True)
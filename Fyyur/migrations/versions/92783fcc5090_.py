@@ -0,0 +1,57 @@
+"""updated_at modification times on Venue, Artist and Show
+
+Revision ID: 92783fcc5090
+Revises: 7c0bb22ccd17
+Create Date: 2026-10-18 20:41:16.203584
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '92783fcc5090'
+down_revision = '7c0bb22ccd17'
+branch_labels = None
+depends_on = None
+
+TABLES = ['Venue', 'Artist', 'Show']
+
+UPDATED_AT_DDL = """
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = LOCALTIMESTAMP;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+UPDATED_AT_TRIGGER_DDL = """
+CREATE TRIGGER set_updated_at
+BEFORE UPDATE ON "{table}"
+FOR EACH ROW WHEN (OLD IS DISTINCT FROM NEW) EXECUTE PROCEDURE set_updated_at();
+"""
+
+
+def upgrade():
+    # a non volatile default is stored once in the catalog, existing rows are
+    # not rewritten; they all start out as modified at migration time
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text('LOCALTIMESTAMP')))
+    op.execute(UPDATED_AT_DDL)
+    for table in TABLES:
+        op.execute(UPDATED_AT_TRIGGER_DDL.format(table=table))
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.create_index(f'ix_{table}_updated_at', table, ['updated_at'],
+                            unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.drop_index(f'ix_{table}_updated_at', table_name=table, postgresql_concurrently=True)
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER set_updated_at ON "{table}"')
+        op.drop_column(table, 'updated_at')
+    op.execute('DROP FUNCTION set_updated_at()')
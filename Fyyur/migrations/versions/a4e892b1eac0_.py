@@ -0,0 +1,35 @@
+"""composite indexes for show lookups and venue areas
+
+Revision ID: a4e892b1eac0
+Revises: e74eb81c73ff
+Create Date: 2026-10-18 19:32:40.107561
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4e892b1eac0'
+down_revision = 'e74eb81c73ff'
+branch_labels = None
+depends_on = None
+
+
+# CREATE INDEX CONCURRENTLY cannot run inside a transaction, so every index is
+# built in an autocommit block; writes to Show/Venue keep flowing meanwhile.
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_Show_Venue_id_start_time', 'Show', ['Venue_id', 'start_time'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_Show_Artist_id_start_time', 'Show', ['Artist_id', 'start_time'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_Venue_state_city', 'Venue', ['state', 'city'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Venue_state_city', table_name='Venue', postgresql_concurrently=True)
+        op.drop_index('ix_Show_Artist_id_start_time', table_name='Show', postgresql_concurrently=True)
+        op.drop_index('ix_Show_Venue_id_start_time', table_name='Show', postgresql_concurrently=True)
@@ -0,0 +1,47 @@
+"""updated_at as timestamptz
+
+Revision ID: b8c1d2e3f4a5
+Revises: 3d5e7a9c1b24
+Create Date: 2026-10-19 00:12:47.830215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8c1d2e3f4a5'
+down_revision = '3d5e7a9c1b24'
+branch_labels = None
+depends_on = None
+
+TABLES = ['Venue', 'Artist', 'Show']
+
+# Last-Modified compares updated_at with the database's clock and sends it in
+# utc: as LOCALTIMESTAMP it was a wall time of whatever time zone the writing
+# session had. Existing values are read in the TimeZone of the migrating
+# session, the one LOCALTIMESTAMP used unless sessions set their own.
+# Changing the type takes an exclusive lock on each table and, unless the
+# session's TimeZone is UTC, rewrites it with its indexes: run it off peak.
+UPDATED_AT_DDL = """
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = {now};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade():
+    for table in TABLES:
+        op.alter_column(table, 'updated_at', type_=sa.DateTime(timezone=True),
+                        server_default=sa.text('now()'), existing_nullable=False)
+    op.execute(UPDATED_AT_DDL.format(now='now()'))
+
+
+def downgrade():
+    for table in TABLES:
+        op.alter_column(table, 'updated_at', type_=sa.DateTime(),
+                        server_default=sa.text('LOCALTIMESTAMP'), existing_nullable=False)
+    op.execute(UPDATED_AT_DDL.format(now='LOCALTIMESTAMP'))
@@ -0,0 +1,34 @@
+"""Artist.name NOT NULL
+
+Revision ID: c4d6e8f0a2b3
+Revises: b8c1d2e3f4a5
+Create Date: 2026-10-19 09:31:05.218644
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d6e8f0a2b3'
+down_revision = 'b8c1d2e3f4a5'
+branch_labels = None
+depends_on = None
+
+# /artists is keyset paginated on (name, id): an artist without a name never
+# compares greater than a cursor and could not be reached past the first
+# page. Unnamed artists are named after their id (names are unique), then a
+# NOT VALID check is validated without blocking writes, and SET NOT NULL uses
+# it instead of scanning the table under an exclusive lock.
+
+
+def upgrade():
+    op.execute('''UPDATE "Artist" SET name = 'Artist ' || id WHERE name IS NULL''')
+    op.execute('''ALTER TABLE "Artist" ADD CONSTRAINT "Artist_name_not_null" CHECK (name IS NOT NULL) NOT VALID''')
+    op.execute('''ALTER TABLE "Artist" VALIDATE CONSTRAINT "Artist_name_not_null"''')
+    op.alter_column('Artist', 'name', existing_type=sa.String(), nullable=False)
+    op.drop_constraint('Artist_name_not_null', 'Artist', type_='check')
+
+
+def downgrade():
+    op.alter_column('Artist', 'name', existing_type=sa.String(), nullable=True)
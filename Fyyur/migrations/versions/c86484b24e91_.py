@@ -0,0 +1,27 @@
+"""version counters on Venue and Artist
+
+Revision ID: c86484b24e91
+Revises: 92783fcc5090
+Create Date: 2026-10-18 21:24:51.730218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c86484b24e91'
+down_revision = '92783fcc5090'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a constant default is stored in the catalog, existing rows are not rewritten
+    op.add_column('Venue', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('Artist', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    op.drop_column('Artist', 'version')
+    op.drop_column('Venue', 'version')
@@ -0,0 +1,42 @@
+"""trigram indexes for venue and artist search
+
+Revision ID: e74eb81c73ff
+Revises: ceff7351854a
+Create Date: 2026-10-18 19:10:12.418233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e74eb81c73ff'
+down_revision = 'ceff7351854a'
+branch_labels = None
+depends_on = None
+
+# search_venues/search_artists filter name, city and state with ilike('%term%');
+# a pg_trgm GIN index on each column lets postgres answer those OR'ed
+# predicates with a BitmapOr of index scans instead of a sequential scan.
+# the index names end with '_trgm' so autogenerate leaves them alone (see env.py).
+# built concurrently, outside the migration's transaction, so writes to both
+# tables go on while they build
+SEARCH_COLUMNS = ['name', 'city', 'state']
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for table in ['Venue', 'Artist']:
+            for column in SEARCH_COLUMNS:
+                op.create_index(f'ix_{table}_{column}_trgm', table, [column],
+                                postgresql_using='gin',
+                                postgresql_ops={column: 'gin_trgm_ops'},
+                                postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ['Venue', 'Artist']:
+            for column in SEARCH_COLUMNS:
+                op.drop_index(f'ix_{table}_{column}_trgm', table_name=table, postgresql_concurrently=True)
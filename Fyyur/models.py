@@ -4,19 +4,22 @@
 
 from flask import Flask, render_template, request, Response, flash, redirect, url_for,abort,jsonify
 from flask_moment import Moment
-from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy, sqlalchemy
 
+from replicas import RoutingSQLAlchemy
+
 # ----------------------------------------------------------------------------#
-# App Config.
+# Extensions, bound to the app by create_app() (see app.py).
 # ----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
+moment = Moment()
+# db.session is scoped to the app context: Flask-SQLAlchemy removes it when the
+# request ends, which rolls back whatever is left and returns the connection to
+# the pool, so views never close it themselves.
+# it sends the queries of @read_only views to a read replica, see replicas.py
+db = RoutingSQLAlchemy()
 
-migrate = Migrate(app, db, compare_type=True)
+# Flask-Migrate is set up by create_app() for the 'flask db' commands only
 # TODO: connect to a local postgresql database
 #  kv: added config in config.py,verify with below
 # print(f"my sqlalchemy dburl is {app.config['SQLALCHEMY_DATABASE_URI']}" )
@@ -30,12 +33,21 @@ Show = db.Table('Show',
                 db.Column('id', db.Integer, primary_key=True),
                 db.Column('Venue_id', db.Integer, db.ForeignKey('Venue.id'), nullable=False),
                 db.Column('Artist_id', db.Integer, db.ForeignKey('Artist.id'), nullable=False),
-                db.Column('start_time', db.DateTime, nullable=False)
+                db.Column('start_time', db.DateTime, nullable=False),
+                # set by the database, see 'Modification times' below
+                db.Column('updated_at', db.DateTime(timezone=True), nullable=False,
+                          server_default=db.func.now(), index=True),
+                # every show lookup filters on one side of the association plus start_time
+                db.Index('ix_Show_Venue_id_start_time', 'Venue_id', 'start_time'),
+                db.Index('ix_Show_Artist_id_start_time', 'Artist_id', 'start_time')
                 )
 
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    # /venues groups venues by area and filters them by genre, see genre_filter
+    __table_args__ = (db.Index('ix_Venue_state_city', 'state', 'city'),
+                      db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'))
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
@@ -49,17 +61,31 @@ class Venue(db.Model):
     website = db.Column(db.String(500))
     seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String(500))
+    # show counters maintained by the show_counters trigger on 'Show'
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    num_past_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # set by the database, see 'Modification times' below
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now(), index=True)
+    # incremented by every ORM update, which only applies if nobody else changed the row
+    # since it was loaded (optimistic concurrency, see the edit handlers in venues.py and artists.py)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
 
     artists = db.relationship('Artist', secondary=Show, backref=db.backref('venues'), lazy=True)
 
+    __mapper_args__ = {'version_id_col': version}
+
     def __repr__(self):
         return f'<My Venue {self.id}: {self.name}>'
 
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    # /artists filters artists by genre, see genre_filter
+    __table_args__ = (db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),)
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, unique=True)
+    # /artists pages on (name, id): a NULL name would never compare greater
+    # than a cursor, so every artist has one
+    name = db.Column(db.String, unique=True, nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
@@ -70,6 +96,149 @@ class Artist(db.Model):
     website = db.Column(db.String(200))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
+    # show counters maintained by the show_counters trigger on 'Show'
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    num_past_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # set by the database, see 'Modification times' below
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now(), index=True)
+    # incremented by every ORM update, which only applies if nobody else changed the row
+    # since it was loaded (optimistic concurrency, see the edit handlers in venues.py and artists.py)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
     def __repr__(self):
         return f'<My Artist {self.id}: {self.name}>'
+
+
+# ----------------------------------------------------------------------------#
+# Show counters.
+# ----------------------------------------------------------------------------#
+# Venue/Artist num_upcoming_shows and num_past_shows are kept current by the
+# database: a trigger on 'Show' counts every insert, delete and move, and
+# show_rollover(until) moves the shows that started since the last call from
+# upcoming to past ('flask fyyur rollover-shows', run periodically).
+# A show counts as past once its start_time is <= ShowRollover.rolled_over_at,
+# the trigger and the rollover classify by that watermark, never by now(), so
+# deleting a show always takes it back from the column that counted it.
+# Bulk imports switch the row trigger off and count their shows in one
+# statement instead (fyyur.show_counters, see importer.py).
+ShowRollover = db.Table('ShowRollover',
+                        db.Column('id', db.Integer, primary_key=True),
+                        db.Column('rolled_over_at', db.DateTime, nullable=False)
+                        )
+
+SHOW_COUNTERS_DDL = """
+CREATE OR REPLACE FUNCTION show_counters() RETURNS trigger AS $$
+DECLARE
+    since timestamp;
+BEGIN
+    -- a bulk write that counts its shows itself, in one statement, turns the
+    -- trigger off for its transaction, see MERGE_SHOWS_SQL in importer.py
+    IF current_setting('fyyur.show_counters', true) = 'off' THEN
+        RETURN NULL;
+    END IF;
+    -- shared lock: show writes run concurrently but never during a rollover
+    SELECT rolled_over_at INTO since FROM "ShowRollover" FOR SHARE;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE "Venue"
+           SET num_upcoming_shows = num_upcoming_shows - (OLD.start_time > since)::int,
+               num_past_shows = num_past_shows - (OLD.start_time <= since)::int
+         WHERE id = OLD."Venue_id";
+        UPDATE "Artist"
+           SET num_upcoming_shows = num_upcoming_shows - (OLD.start_time > since)::int,
+               num_past_shows = num_past_shows - (OLD.start_time <= since)::int
+         WHERE id = OLD."Artist_id";
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE "Venue"
+           SET num_upcoming_shows = num_upcoming_shows + (NEW.start_time > since)::int,
+               num_past_shows = num_past_shows + (NEW.start_time <= since)::int
+         WHERE id = NEW."Venue_id";
+        UPDATE "Artist"
+           SET num_upcoming_shows = num_upcoming_shows + (NEW.start_time > since)::int,
+               num_past_shows = num_past_shows + (NEW.start_time <= since)::int
+         WHERE id = NEW."Artist_id";
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER show_counters
+AFTER INSERT OR DELETE OR UPDATE OF "Venue_id", "Artist_id", start_time ON "Show"
+FOR EACH ROW EXECUTE PROCEDURE show_counters();
+
+CREATE OR REPLACE FUNCTION show_rollover(until timestamp) RETURNS integer AS $$
+DECLARE
+    since timestamp;
+    moved integer;
+BEGIN
+    -- exclusive lock: waits for in-flight show writes, blocks new ones
+    SELECT rolled_over_at INTO since FROM "ShowRollover" FOR UPDATE;
+    IF until <= since THEN
+        RETURN 0;
+    END IF;
+    UPDATE "Venue" AS v
+       SET num_upcoming_shows = v.num_upcoming_shows - started.shows,
+           num_past_shows = v.num_past_shows + started.shows
+      FROM (SELECT "Venue_id" AS id, count(*) AS shows FROM "Show"
+             WHERE start_time > since AND start_time <= until
+             GROUP BY "Venue_id") AS started
+     WHERE v.id = started.id;
+    UPDATE "Artist" AS a
+       SET num_upcoming_shows = a.num_upcoming_shows - started.shows,
+           num_past_shows = a.num_past_shows + started.shows
+      FROM (SELECT "Artist_id" AS id, count(*) AS shows FROM "Show"
+             WHERE start_time > since AND start_time <= until
+             GROUP BY "Artist_id") AS started
+     WHERE a.id = started.id;
+    SELECT count(*) INTO moved FROM "Show" WHERE start_time > since AND start_time <= until;
+    UPDATE "ShowRollover" SET rolled_over_at = until;
+    RETURN moved;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+# recount the counters of one batch of venues/artists (ids :first_id..:last_id)
+# from scratch, used for the backfill and to repair drifted counters
+RECOUNT_SHOWS_SQL = """
+UPDATE "{table}" AS t
+   SET num_upcoming_shows = (SELECT count(*) FROM "Show"
+                              WHERE "{table}_id" = t.id AND start_time > watermark.since),
+       num_past_shows = (SELECT count(*) FROM "Show"
+                          WHERE "{table}_id" = t.id AND start_time <= watermark.since)
+  FROM (SELECT rolled_over_at AS since FROM "ShowRollover" FOR SHARE) AS watermark
+ WHERE t.id BETWEEN :first_id AND :last_id
+"""
+
+db.event.listen(ShowRollover, 'after_create', db.DDL(
+    'INSERT INTO "ShowRollover" (id, rolled_over_at) VALUES (1, LOCALTIMESTAMP)'))
+db.event.listen(Show, 'after_create', db.DDL(SHOW_COUNTERS_DDL))
+
+
+# ----------------------------------------------------------------------------#
+# Modification times.
+# ----------------------------------------------------------------------------#
+# updated_at is set by the database on insert (server default) and on every
+# update that changes the row, whoever writes it: the views, the bulk import
+# or the show counter trigger. Exports select incrementally on it (?since=).
+# It is a timestamptz, an instant whatever the time zone of the database
+# session or of the app host (show start times are local wall times).
+UPDATED_AT_DDL = """
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+UPDATED_AT_TRIGGER_DDL = """
+CREATE TRIGGER set_updated_at
+BEFORE UPDATE ON "{table}"
+FOR EACH ROW WHEN (OLD IS DISTINCT FROM NEW) EXECUTE PROCEDURE set_updated_at();
+"""
+
+db.event.listen(db.metadata, 'before_create', db.DDL(UPDATED_AT_DDL))
+db.event.listen(Venue.__table__, 'after_create', db.DDL(UPDATED_AT_TRIGGER_DDL.format(table='Venue')))
+db.event.listen(Artist.__table__, 'after_create', db.DDL(UPDATED_AT_TRIGGER_DDL.format(table='Artist')))
+db.event.listen(Show, 'after_create', db.DDL(UPDATED_AT_TRIGGER_DDL.format(table='Show')))
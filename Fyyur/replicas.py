@@ -0,0 +1,127 @@
+# ----------------------------------------------------------------------------#
+# Read replica routing.
+# ----------------------------------------------------------------------------#
+# Views decorated with @read_only run their queries on a read replica, one of
+# the 'replica_*' binds in SQLALCHEMY_BINDS picked round-robin. Everything
+# else runs on the primary (SQLALCHEMY_DATABASE_URI):
+# - every write (flush or insert/update/delete statement), whatever the view;
+# - replicas lagging more than REPLICA_MAX_LAG seconds behind the primary;
+# - read-only views requested by a client that wrote within the last
+#   READ_YOUR_WRITES_WINDOW seconds, so it sees its own changes right after
+#   the redirect that follows an edit.
+
+import itertools
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm, text
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_PREFIX = 'replica_'
+
+# seconds behind the primary, 0 on a server that is not replaying (standalone)
+REPLICA_LAG_SQL = '''
+SELECT CASE WHEN pg_is_in_recovery()
+            THEN extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+            ELSE 0 END
+'''
+
+
+class RoutingSession(SignallingSession):
+    """Session running the queries of @read_only views on the replica chosen
+    for the request, and everything else on the primary."""
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing or isinstance(clause, UpdateBase):
+            if has_app_context():
+                g.wrote_primary = True
+            return super().get_bind(mapper, clause)
+        replica = g.get('replica') if has_app_context() else None
+        if replica is not None:
+            return current_app.extensions['sqlalchemy'].db.get_engine(self.app, bind=replica)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy with a RoutingSession, which remembers the clients
+    that wrote so their next reads stay on the primary."""
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.before_request(forget_routing)
+        app.after_request(remember_writes)
+
+
+def forget_routing():
+    # an app context outliving one request (tests, cli) must not carry the
+    # previous request's replica over
+    g.pop('replica', None)
+    g.pop('wrote_primary', None)
+
+
+def remember_writes(response):
+    if g.get('wrote_primary'):
+        session['read_primary_until'] = time.time() + current_app.config.get('READ_YOUR_WRITES_WINDOW', 10)
+    return response
+
+
+class ReplicaRouter:
+    """Round-robin over the replicas that are not lagging behind too far.
+
+    A replica's lag is measured at most every REPLICA_LAG_CHECK_INTERVAL
+    seconds; an unreachable replica counts as infinitely behind until then.
+    """
+
+    def __init__(self):
+        self.turns = itertools.count()
+        self.lock = threading.Lock()
+        # bind name -> (measured at, lag in seconds)
+        self.lags = {}
+
+    def lag(self, db, app, name):
+        now = time.monotonic()
+        with self.lock:
+            measured_at, lag = self.lags.get(name, (None, None))
+        if measured_at is not None and now - measured_at < app.config.get('REPLICA_LAG_CHECK_INTERVAL', 2):
+            return lag
+        try:
+            with db.get_engine(app, bind=name).connect() as connection:
+                lag = connection.execute(text(REPLICA_LAG_SQL)).scalar()
+            # nothing replayed yet, the replica's state is unknown
+            lag = float('inf') if lag is None else float(lag)
+        except Exception:
+            app.logger.exception('read replica %s unavailable', name)
+            lag = float('inf')
+        with self.lock:
+            self.lags[name] = (now, lag)
+        return lag
+
+    def choose(self, db, app):
+        """Name of the replica bind for this request, None for the primary."""
+        names = sorted(name for name in app.config.get('SQLALCHEMY_BINDS') or {}
+                       if name.startswith(REPLICA_PREFIX))
+        max_lag = app.config.get('REPLICA_MAX_LAG', 5)
+        for _ in names:
+            name = names[next(self.turns) % len(names)]
+            if self.lag(db, app, name) <= max_lag:
+                return name
+        return None
+
+
+replica_router = ReplicaRouter()
+
+
+def read_only(view):
+    """Run the queries of a view that never writes on a read replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('read_primary_until', 0) <= time.time():
+            g.replica = replica_router.choose(current_app.extensions['sqlalchemy'].db, current_app)
+        return view(*args, **kwargs)
+    return wrapper
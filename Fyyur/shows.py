@@ -0,0 +1,119 @@
+# ----------------------------------------------------------------------------#
+# Show pages: listing and create.
+# ----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime
+
+from flask import Blueprint, current_app, render_template, request, Response, flash, stream_template
+
+from forms import *
+from helpers import *
+from models import *
+from replicas import read_only
+
+bp = Blueprint('shows', __name__)
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@bp.route('/shows')
+@read_only
+def shows():
+    # displays list of shows at /shows
+    # TODO: replace with real venues data.
+    # data=[{
+    #   "venue_id": 1,
+    #   "venue_name": "The Musical Hop",
+    #   "artist_id": 4,
+    #   "artist_name": "Guns N Petals",
+    #   "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
+    #   "start_time": "2019-05-21T21:30:00.000Z"
+    # }, {
+    #   "venue_id": 3,
+    #   "venue_name": "Park Square Live Music & Coffee",
+    #   "artist_id": 5,
+    #   "artist_name": "Matt Quevedo",
+    #   "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
+    #   "start_time": "2019-06-15T23:00:00.000Z"
+    # }, {
+    #   "venue_id": 3,
+    #   "venue_name": "Park Square Live Music & Coffee",
+    #   "artist_id": 6,
+    #   "artist_name": "The Wild Sax Band",
+    #   "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #   "start_time": "2035-04-01T20:00:00.000Z"
+    # }, {
+    #   "venue_id": 3,
+    #   "venue_name": "Park Square Live Music & Coffee",
+    #   "artist_id": 6,
+    #   "artist_name": "The Wild Sax Band",
+    #   "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #   "start_time": "2035-04-08T20:00:00.000Z"
+    # }, {
+    #   "venue_id": 3,
+    #   "venue_name": "Park Square Live Music & Coffee",
+    #   "artist_id": 6,
+    #   "artist_name": "The Wild Sax Band",
+    #   "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #   "start_time": "2035-04-15T20:00:00.000Z"
+    # }]
+    # Make a database query to get the shows in the requested window (see shows_window)
+    query = shows_query(shows_window(datetime.now()))
+    # ?stream=1 renders the whole window while rows arrive: a server side
+    # cursor hands them over in batches and the page is sent chunk by chunk,
+    # so neither the rows nor the html are ever held in memory at once
+    stream = request.args.get('stream', type=parse_bool)
+    if stream is None and 'stream' in request.args:
+        abort(400)
+    if stream:
+        shows = (query.order_by(Show.c.start_time, Show.c.id)
+                 .yield_per(current_app.config.get('SHOWS_STREAM_BATCH', 500)))
+        return Response(stream_template('pages/shows.html', shows=shows))
+    # otherwise one page at a time, keyset paginated on (start_time, id)
+    shows, prev_cursor, next_cursor = keyset_page(
+        query, [Show.c.start_time, Show.c.id], current_app.config.get('SHOWS_PER_PAGE', 30),
+        after=decode_cursor(request.args.get('after'), (datetime, int)),
+        before=decode_cursor(request.args.get('before'), (datetime, int)))
+    # pager links keep the window filters of this page
+    page_args = {key: value for key, value in request.args.items()
+                 if key in ('when', 'from', 'to')}
+    return render_template('pages/shows.html', shows=shows, page_args=page_args,
+                           prev_cursor=prev_cursor, next_cursor=next_cursor)
+
+
+@bp.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    # TODO: insert form data as a new Show record in the db, instead
+    try:
+        form = ShowForm(request.form)  # Initialize form instance with values from the request
+        print(f"form validate result: {form.validate()}")
+        if form.validate():
+            show = Show.insert().values(
+                Venue_id=form.venue_id.data,
+                Artist_id=form.artist_id.data,
+                start_time=form.start_time.data)
+            db.session.execute(show)
+            db.session.commit()
+            invalidate_pages(venue_ids=[form.venue_id.data], artist_ids=[form.artist_id.data])
+            # on successful db insert, flash success
+            flash('Show was successfully listed!')
+        else:
+            errorMessage = "Errors in the following fields: "
+            for error in form.errors: errorMessage += error + " "
+            flash(errorMessage)
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        # TODO: on unsuccessful db insert, flash an error instead.
+        flash('An error occurred. Show could not be listed.')
+    return render_template('pages/home.html')
@@ -0,0 +1,1186 @@
+import base64
+import gzip
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+from datetime import datetime, timedelta, timezone
+
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.http import http_date
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app import create_app, precompile_templates
+from replicas import replica_router
+from metrics import route_metrics
+from cache import create_page_cache, LocalCache, NullCache, SharedCache, LocalStore, page_cache
+from helpers import invalidate_pages
+from models import db, Venue, Artist, Show
+import venues
+from benchmarks import seed as bench_seed
+
+TEST_DATABASE_URI = os.environ.get(
+    'TEST_DATABASE_URL', 'postgresql://jiazhang@localhost:5432/fyyur_test')
+# a second database standing in for a read replica
+TEST_REPLICA_DATABASE_URI = os.environ.get(
+    'TEST_REPLICA_DATABASE_URL', 'postgresql://jiazhang@localhost:5432/fyyur_test_replica')
+
+app = create_app({'PAGE_CACHE_TYPE': 'local', 'DEBUG_METRICS_TOKEN': 'test-token',
+                  'EXPORT_TOKEN': 'export-token'})
+METRICS_HEADERS = {'Authorization': 'Bearer test-token'}
+EXPORT_HEADERS = {'Authorization': 'Bearer export-token'}
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        app.config['SQLALCHEMY_DATABASE_URI'] = TEST_DATABASE_URI
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['TESTING'] = True
+        app.config['ARTISTS_PER_PAGE'] = 3
+        app.config['SHOWS_PER_PAGE'] = 2
+        self.app = app
+        self.client = self.app.test_client
+        # binds the app to the current context
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        # create all tables
+        db.create_all()
+        page_cache.clear()
+
+    def tearDown(self):
+        """Executed after reach test"""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    # helpers
+    @contextmanager
+    def count_queries(self):
+        """Collect every statement sent to the database inside the block"""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    def explain(self, path):
+        """EXPLAIN every statement a GET on path sends, seq scans disabled so
+        the plans show which indexes the queries can use on any table size"""
+        captured = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            captured.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            self.assertEqual(self.client().get(path).status_code, 200)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        db.session.execute(db.text('SET LOCAL enable_seqscan = off'))
+        cursor = db.session.connection().connection.cursor()
+        plans = []
+        for statement, parameters in captured:
+            cursor.execute('EXPLAIN ' + statement, parameters)
+            plans.append('\n'.join(row[0] for row in cursor.fetchall()))
+        db.session.rollback()
+        return plans
+
+    def add_venue(self, name, city, state):
+        venue = Venue(name=name, city=city, state=state, genres=['Jazz'], seeking_talent=False)
+        db.session.add(venue)
+        db.session.commit()
+        return venue.id
+
+    def add_artist(self, name):
+        artist = Artist(name=name, city='San Francisco', state='CA', genres=['Jazz'])
+        db.session.add(artist)
+        db.session.commit()
+        return artist.id
+
+    def add_show(self, venue_id, artist_id, start_time):
+        db.session.execute(Show.insert().values(
+            Venue_id=venue_id, Artist_id=artist_id, start_time=start_time))
+        db.session.commit()
+
+    # test venues
+    def test_get_venues_grouped_by_area(self):
+        artist_id = self.add_artist('Guns N Petals')
+        hop_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        self.add_venue('Park Square Live Music & Coffee', 'San Francisco', 'CA')
+        self.add_venue('The Dueling Pianos Bar', 'New York', 'NY')
+        self.add_show(hop_id, artist_id, datetime.now() + timedelta(days=7))
+        self.add_show(hop_id, artist_id, datetime.now() + timedelta(days=14))
+        self.add_show(hop_id, artist_id, datetime.now() - timedelta(days=7))
+
+        res = self.client().get('/venues')
+        html = res.get_data(as_text=True)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(html.count('San Francisco, CA'), 1)
+        self.assertEqual(html.count('New York, NY'), 1)
+        self.assertIn('The Dueling Pianos Bar', html)
+        self.assertIn('2 Upcoming Shows', html)
+        self.assertEqual(html.count('0 Upcoming Shows'), 2)
+
+    def test_get_venues_query_count_independent_of_areas(self):
+        artist_id = self.add_artist('The Wild Sax Band')
+        for i in range(20):
+            venue_id = self.add_venue(f'Venue {i}', f'City {i}', 'CA')
+            self.add_show(venue_id, artist_id, datetime.now() + timedelta(days=i + 1))
+
+        with self.count_queries() as statements:
+            res = self.client().get('/venues')
+        self.assertEqual(res.status_code, 200)
+        # the venues of every area, and their genre counts
+        self.assertEqual(len(statements), 2)
+
+    def add_genres(self, model, name, genres):
+        row = model.query.filter_by(name=name).one()
+        row.genres = genres
+        db.session.commit()
+
+    def test_get_venues_by_genre(self):
+        for name, genres in [('Jazz Club', ['Jazz']), ('Folk Barn', ['Folk']),
+                             ('Both Hall', ['Jazz', 'Folk', 'Blues']), ('Rock Garage', ['Rock n Roll'])]:
+            self.add_venue(name, 'Austin', 'TX')
+            self.add_genres(Venue, name, genres)
+
+        def venue_names(path):
+            res = self.client().get(path)
+            self.assertEqual(res.status_code, 200)
+            return sorted(re.findall(r'<h5>(.*?)</h5>', res.get_data(as_text=True)))
+
+        self.assertEqual(venue_names('/venues?genre=Jazz&genre=Folk'), ['Both Hall', 'Folk Barn', 'Jazz Club'])
+        self.assertEqual(venue_names('/venues?genre=Jazz&genre=Folk&match=all'), ['Both Hall'])
+        self.assertEqual(venue_names('/venues?genre=Soul'), [])
+        self.assertEqual(len(venue_names('/venues')), 4)
+        self.assertEqual(self.client().get('/venues?genre=Jazz&match=most').status_code, 400)
+
+    def test_venue_genre_facets_count_the_result_set(self):
+        for name, genres in [('Jazz Club', ['Jazz']), ('Folk Barn', ['Folk']),
+                             ('Both Hall', ['Jazz', 'Folk', 'Blues']), ('Rock Garage', ['Rock n Roll'])]:
+            self.add_venue(name, 'Austin', 'TX')
+            self.add_genres(Venue, name, genres)
+
+        with self.count_queries() as statements:
+            html = self.client().get('/venues?genre=Jazz').get_data(as_text=True)
+        self.assertEqual(len(statements), 2)
+        self.assertIn('Jazz (2)', html)
+        self.assertIn('Folk (1)', html)
+        self.assertIn('Blues (1)', html)
+        self.assertNotIn('Rock n Roll', html)
+        # a facet link adds its genre to the filter
+        self.assertIn('href="/venues?genre=Jazz&amp;genre=Folk"', html)
+
+    def test_genre_filters_use_gin_indexes(self):
+        self.add_venue('Jazz Club', 'Austin', 'TX')
+        self.add_artist('Guns N Petals')
+        venues_plan, facets_plan = self.explain('/venues?genre=Jazz&genre=Folk')
+        self.assertIn('ix_Venue_genres', venues_plan)
+        self.assertIn('ix_Venue_genres', facets_plan)
+        artists_plan, facets_plan = self.explain('/artists?genre=Jazz&match=all')
+        self.assertIn('ix_Artist_genres', artists_plan)
+
+    # test venue page
+    def test_show_venue_splits_past_and_upcoming(self):
+        venue_id = self.add_venue('Park Square Live Music & Coffee', 'San Francisco', 'CA')
+        past_artist_id = self.add_artist('Matt Quevedo')
+        upcoming_artist_id = self.add_artist('The Wild Sax Band')
+        self.add_show(venue_id, past_artist_id, datetime.now() - timedelta(days=30))
+        for week in range(1, 4):
+            self.add_show(venue_id, upcoming_artist_id, datetime.now() + timedelta(weeks=week))
+
+        with self.count_queries() as statements:
+            res = self.client().get(f'/venues/{venue_id}')
+        html = res.get_data(as_text=True)
+        self.assertEqual(res.status_code, 200)
+        # one query for the venue, one for all of its shows
+        self.assertEqual(len(statements), 2)
+        self.assertIn('3 Upcoming Shows', html)
+        self.assertIn('1 Past Show', html)
+        self.assertEqual(html.count('Matt Quevedo'), 1)
+        self.assertEqual(html.count('The Wild Sax Band'), 3)
+        self.assertNotIn('Load more', html)
+
+    def test_show_venue_limit_keeps_counts(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist_id = self.add_artist('Guns N Petals')
+        for week in range(1, 6):
+            self.add_show(venue_id, artist_id, datetime.now() + timedelta(weeks=week))
+            self.add_show(venue_id, artist_id, datetime.now() - timedelta(weeks=week))
+
+        res = self.client().get(f'/venues/{venue_id}?limit=2')
+        html = res.get_data(as_text=True)
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('5 Upcoming Shows', html)
+        self.assertIn('5 Past Shows', html)
+        self.assertEqual(html.count('Guns N Petals'), 4)
+        self.assertEqual(html.count(f'/venues/{venue_id}?limit=4'), 2)
+
+    def test_show_venue_not_found(self):
+        res = self.client().get('/venues/1000')
+        self.assertEqual(res.status_code, 404)
+
+
+    # test artists
+    def artist_page(self, path):
+        res = self.client().get(path)
+        self.assertEqual(res.status_code, 200)
+        html = res.get_data(as_text=True)
+        names = re.findall(r'<h5>(.*?)</h5>', html)
+        prev_link = re.search(r'href="(/artists\?before=[^"]+)"', html)
+        next_link = re.search(r'href="(/artists\?after=[^"]+)"', html)
+        return names, prev_link and prev_link.group(1), next_link and next_link.group(1)
+
+    def test_get_artists_by_genre_keeps_it_across_pages(self):
+        for name in ['Echo', 'Alpha', 'Golf', 'Charlie', 'Bravo', 'Foxtrot', 'Delta']:
+            self.add_artist(name)
+        for name in ['Alpha', 'Charlie', 'Delta', 'Foxtrot', 'Golf']:
+            self.add_genres(Artist, name, ['Jazz', 'Folk'])
+
+        res = self.client().get('/artists?genre=Folk&genre=Jazz&match=all')
+        html = res.get_data(as_text=True)
+        self.assertEqual(re.findall(r'<h5>(.*?)</h5>', html), ['Alpha', 'Charlie', 'Delta'])
+        # counts cover all five matching artists, not the page
+        self.assertIn('Folk (5)', html)
+        next_link = re.search(r'href="(/artists\?after=[^"]+)"', html).group(1).replace('&amp;', '&')
+        self.assertIn('genre=Folk&genre=Jazz&match=all', next_link)
+        names = re.findall(r'<h5>(.*?)</h5>', self.client().get(next_link).get_data(as_text=True))
+        self.assertEqual(names, ['Foxtrot', 'Golf'])
+
+    def test_get_artists_paginated(self):
+        for name in ['Echo', 'Alpha', 'Golf', 'Charlie', 'Bravo', 'Foxtrot', 'Delta']:
+            self.add_artist(name)
+
+        names, prev_link, first_next = self.artist_page('/artists')
+        self.assertEqual(names, ['Alpha', 'Bravo', 'Charlie'])
+        self.assertIsNone(prev_link)
+        names, prev_link, next_link = self.artist_page(first_next)
+        self.assertEqual(names, ['Delta', 'Echo', 'Foxtrot'])
+        # a new artist sorting before the cursor does not shift later pages
+        self.add_artist('Able')
+        names, _, last_next = self.artist_page(first_next)
+        self.assertEqual(names, ['Delta', 'Echo', 'Foxtrot'])
+        names, _, no_next = self.artist_page(last_next)
+        self.assertEqual(names, ['Golf'])
+        self.assertIsNone(no_next)
+        names, first_prev, _ = self.artist_page(prev_link)
+        self.assertEqual(names, ['Alpha', 'Bravo', 'Charlie'])
+        names, no_prev, _ = self.artist_page(first_prev)
+        self.assertEqual(names, ['Able'])
+        self.assertIsNone(no_prev)
+
+    def test_get_artists_loads_only_listed_columns(self):
+        self.add_artist('Guns N Petals')
+        with self.count_queries() as statements:
+            self.client().get('/artists')
+        # the page of artists, and their genre counts
+        self.assertEqual(len(statements), 2)
+        self.assertNotIn('image_link', statements[0])
+
+    def test_get_artists_bad_cursor(self):
+        res = self.client().get('/artists?after=not-a-cursor')
+        self.assertEqual(res.status_code, 400)
+
+    def test_artist_without_name_is_refused(self):
+        # it could not be paged to: NULL never compares greater than a cursor
+        with self.assertRaises(IntegrityError):
+            db.session.execute(db.text('INSERT INTO "Artist" (name, city) VALUES (NULL, \'Austin\')'))
+        db.session.rollback()
+        cursor = base64.urlsafe_b64encode(json.dumps([None, 1]).encode()).decode()
+        self.assertEqual(self.client().get(f'/artists?after={cursor}').status_code, 400)
+
+    # test shows
+    def add_shows_for_weeks(self, weeks):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        for week in weeks:
+            artist_id = self.add_artist(f'Artist week {week}')
+            self.add_show(venue_id, artist_id, datetime.now() + timedelta(weeks=week))
+
+    def test_get_shows_upcoming_paginated(self):
+        self.add_shows_for_weeks([-2, -1, 1, 2, 3])
+
+        res = self.client().get('/shows')
+        html = res.get_data(as_text=True)
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('Artist week 1', html)
+        self.assertIn('Artist week 2', html)
+        self.assertNotIn('Artist week 3', html)
+        self.assertNotIn('Artist week -1', html)
+        next_link = re.search(r'href="(/shows\?[^"]*after=[^"]+)"', html).group(1)
+        html = self.client().get(next_link.replace('&amp;', '&')).get_data(as_text=True)
+        self.assertIn('Artist week 3', html)
+        self.assertNotIn('Artist week 2', html)
+        self.assertNotIn('after=', html)
+        self.assertIn('before=', html)
+
+    def test_get_shows_past_and_date_window(self):
+        self.add_shows_for_weeks([-3, -2, -1, 1])
+
+        html = self.client().get('/shows?when=past').get_data(as_text=True)
+        self.assertIn('Artist week -3', html)
+        self.assertIn('Artist week -2', html)
+        self.assertNotIn('Artist week 1', html)
+        window_start = (datetime.now() - timedelta(weeks=2, days=1)).date().isoformat()
+        html = self.client().get(f'/shows?when=all&from={window_start}').get_data(as_text=True)
+        self.assertNotIn('Artist week -3', html)
+        self.assertIn('Artist week -2', html)
+        self.assertIn('Artist week -1', html)
+        self.assertIn(f'from={window_start}', html)
+
+    def test_get_shows_streamed(self):
+        self.add_shows_for_weeks([-1, 1, 2, 3])
+
+        res = self.client().get('/shows?stream=1')
+        self.assertTrue(res.is_streamed)
+        html = res.get_data(as_text=True)
+        self.assertEqual(res.status_code, 200)
+        for week in [1, 2, 3]:
+            self.assertIn(f'Artist week {week}', html)
+        self.assertNotIn('Artist week -1', html)
+        self.assertNotIn('after=', html)
+        # paged as usual
+        html = self.client().get('/shows?stream=0').get_data(as_text=True)
+        self.assertIn('after=', html)
+        self.assertNotIn('Artist week 3', html)
+        self.assertEqual(self.client().get('/shows?stream=maybe').status_code, 400)
+
+    def test_get_shows_unknown_window(self):
+        res = self.client().get('/shows?when=someday')
+        self.assertEqual(res.status_code, 400)
+
+    def test_get_shows_date_out_of_range(self):
+        # like any date that does not parse, the bound is ignored
+        res = self.client().get('/shows?from=99999999999999999999')
+        self.assertEqual(res.status_code, 200)
+        res = self.client().get('/export/shows.csv?since=99999999999999999999', headers=EXPORT_HEADERS)
+        self.assertEqual(res.status_code, 400)
+
+    def test_tampered_cursors(self):
+        def cursor(values):
+            return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+        for path in ['/shows', '/api/v1/shows']:
+            for values in [1, ['x', 1], {'a': 1}, ['2035-04-15 20:00:00'],
+                           ['2035-04-15 20:00:00', '1'], ['2035-04-15 20:00:00', 2 ** 40]]:
+                res = self.client().get(f'{path}?after={cursor(values)}')
+                self.assertEqual(res.status_code, 400, (path, values))
+        self.assertEqual(self.client().get('/shows?before=MQ==').status_code, 400)
+        self.assertEqual(self.client().get(f'/artists?after={cursor([1, 1])}').status_code, 400)
+        self.assertEqual(self.client().get(f'/shows?after={cursor(["2035-04-15 20:00:00", 1])}').status_code, 200)
+
+    # test page cache
+    def test_show_venue_served_from_cache(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        first = self.client().get(f'/venues/{venue_id}').get_data(as_text=True)
+        with self.count_queries() as statements:
+            res = self.client().get(f'/venues/{venue_id}')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(statements), 0)
+        self.assertEqual(res.get_data(as_text=True), first)
+
+    def test_create_show_invalidates_venue_and_artist_pages(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist_id = self.add_artist('Guns N Petals')
+        self.assertIn('0 Upcoming Shows', self.client().get(f'/venues/{venue_id}').get_data(as_text=True))
+        self.assertIn('0 Upcoming Shows', self.client().get(f'/artists/{artist_id}').get_data(as_text=True))
+
+        start_time = (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d %H:%M:%S')
+        res = self.client().post('/shows/create', data={
+            'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time})
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('1 Upcoming Show', self.client().get(f'/venues/{venue_id}').get_data(as_text=True))
+        self.assertIn('1 Upcoming Show', self.client().get(f'/artists/{artist_id}').get_data(as_text=True))
+
+    def test_edit_artist_invalidates_pages_of_its_venues(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist_id = self.add_artist('Guns N Petals')
+        self.add_show(venue_id, artist_id, datetime.now() + timedelta(days=3))
+        self.assertIn('Guns N Petals', self.client().get(f'/venues/{venue_id}').get_data(as_text=True))
+
+        res = self.client().post(f'/artists/{artist_id}/edit', data={
+            'name': 'Guns N Roses', 'city': 'San Francisco', 'state': 'CA', 'phone': '',
+            'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/GunsNPetals',
+            'image_link': '', 'website_link': '',
+            'seeking_description': ''})
+        self.assertEqual(res.status_code, 302)
+        html = self.client().get(f'/venues/{venue_id}').get_data(as_text=True)
+        self.assertIn('Guns N Roses', html)
+        self.assertNotIn('Guns N Petals', html)
+
+    def test_edit_during_render_does_not_cache_the_old_page(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        render_template = venues.render_template
+
+        def edit_then_render(*args, **kwargs):
+            # another worker commits an edit after this one loaded the rows
+            with db.engine.begin() as connection:
+                connection.execute(db.text('UPDATE "Venue" SET name = \'The Big Hop\' WHERE id = :id'),
+                                   {'id': venue_id})
+            invalidate_pages(venue_ids=[venue_id])
+            return render_template(*args, **kwargs)
+
+        with mock.patch('venues.render_template', edit_then_render):
+            self.assertIn('The Musical Hop', self.client().get(f'/venues/{venue_id}').get_data(as_text=True))
+        html = self.client().get(f'/venues/{venue_id}').get_data(as_text=True)
+        self.assertIn('The Big Hop', html)
+        self.assertNotIn('The Musical Hop', html)
+
+    def test_local_cache_evicts_least_recently_used(self):
+        cache = LocalCache(max_entries=2)
+        cache.set('venue:1', 'one', 60)
+        cache.set('venue:2', 'two', 60)
+        self.assertEqual(cache.get('venue:1'), 'one')
+        cache.set('venue:3', 'three', 60)
+        self.assertIsNone(cache.get('venue:2'))
+        self.assertEqual(cache.get('venue:1'), 'one')
+        cache.set('venue:4', 'four', 0)
+        self.assertIsNone(cache.get('venue:4'))
+
+    def test_create_page_cache(self):
+        self.assertIsInstance(create_page_cache({}), NullCache)
+        self.assertIsInstance(create_page_cache({'PAGE_CACHE_TYPE': 'local'}), LocalCache)
+        # a shared cache without a store would be one per process
+        with self.assertRaises(RuntimeError):
+            create_page_cache({'PAGE_CACHE_TYPE': 'shared'})
+        with self.assertRaises(RuntimeError):
+            create_page_cache({'PAGE_CACHE_TYPE': 'lru'})
+
+    def test_gunicorn_refuses_local_cache_with_several_workers(self):
+        def load_config(workers):
+            env = dict(os.environ, PAGE_CACHE_TYPE='local', GUNICORN_WORKERS=workers)
+            return subprocess.run([sys.executable, '-c', 'import runpy; runpy.run_path("gunicorn.conf.py")'],
+                                  env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                  capture_output=True, text=True)
+
+        result = load_config('3')
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('PAGE_CACHE_TYPE', result.stderr)
+        result = load_config('1')
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_shared_cache_round_trip(self):
+        cache = SharedCache(LocalStore())
+        cache.set('artist:1', 'page', 60)
+        self.assertEqual(cache.get('artist:1'), 'page')
+        cache.delete('artist:1', 'venue:9')
+        self.assertIsNone(cache.get('artist:1'))
+        cache.set('artist:2', 'page', 60)
+        cache.clear()
+        self.assertIsNone(cache.get('artist:2'))
+        # add() leaves a live entry alone, a tombstone included
+        for cache in [SharedCache(LocalStore()), LocalCache()]:
+            cache.set('venue:1', '', 60)
+            self.assertFalse(cache.add('venue:1', 'page', 60))
+            self.assertEqual(cache.get('venue:1'), '')
+            self.assertTrue(cache.add('venue:2', 'page', 60))
+            self.assertEqual(cache.get('venue:2'), 'page')
+
+    # test show counters
+    def counters(self, model, entity_id):
+        db.session.expire_all()
+        entity = model.query.get(entity_id)
+        return entity.num_upcoming_shows, entity.num_past_shows
+
+    def test_show_counters_follow_inserts_and_deletes(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist_id = self.add_artist('Guns N Petals')
+        self.add_show(venue_id, artist_id, datetime.now() + timedelta(days=1))
+        self.add_show(venue_id, artist_id, datetime.now() + timedelta(days=2))
+        self.add_show(venue_id, artist_id, datetime.now() - timedelta(days=1))
+        self.assertEqual(self.counters(Venue, venue_id), (2, 1))
+        self.assertEqual(self.counters(Artist, artist_id), (2, 1))
+
+        db.session.execute(Show.delete().where(Show.c.start_time < datetime.now()))
+        db.session.commit()
+        self.assertEqual(self.counters(Venue, venue_id), (2, 0))
+        self.assertEqual(self.counters(Artist, artist_id), (2, 0))
+
+    def test_rollover_moves_started_shows_to_past(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist_id = self.add_artist('Guns N Petals')
+        self.add_show(venue_id, artist_id, datetime.now() + timedelta(seconds=1))
+        self.add_show(venue_id, artist_id, datetime.now() + timedelta(days=2))
+        self.assertEqual(self.counters(Venue, venue_id), (2, 0))
+
+        db.session.execute(db.text('SELECT show_rollover(:until)'),
+                           {'until': datetime.now() + timedelta(days=1)})
+        db.session.commit()
+        self.assertEqual(self.counters(Venue, venue_id), (1, 1))
+        self.assertEqual(self.counters(Artist, artist_id), (1, 1))
+        # deleting a rolled over show takes it back from the past counter
+        db.session.execute(Show.delete().where(Show.c.start_time < datetime.now() + timedelta(days=1)))
+        db.session.commit()
+        self.assertEqual(self.counters(Venue, venue_id), (1, 0))
+
+    def test_recount_shows_command(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist_id = self.add_artist('Guns N Petals')
+        self.add_show(venue_id, artist_id, datetime.now() + timedelta(days=1))
+        self.add_show(venue_id, artist_id, datetime.now() - timedelta(days=1))
+        db.session.execute(db.text('UPDATE "Venue" SET num_upcoming_shows = 7, num_past_shows = 7'))
+        db.session.commit()
+
+        result = self.app.test_cli_runner().invoke(args=['fyyur', 'recount-shows', '--batch-size', '1'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('1 Venue rows recounted', result.output)
+        self.assertEqual(self.counters(Venue, venue_id), (1, 1))
+
+        result = self.app.test_cli_runner().invoke(args=['fyyur', 'rollover-shows'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('0 shows rolled over to past', result.output)
+
+    # test search
+    def test_search_venues(self):
+        self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        self.add_venue('Park Square Live Music & Coffee', 'San Francisco', 'CA')
+        self.add_venue('The Dueling Pianos Bar', 'New York', 'NY')
+
+        with self.count_queries() as statements:
+            res = self.client().post('/venues/search', data={'search_term': 'music'})
+        html = res.get_data(as_text=True)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(statements), 1)
+        self.assertIn('Number of search results for "music": 2', html)
+        # name prefix matches rank ahead of matches inside the name
+        self.assertLess(html.index('Park Square Live Music'), html.index('The Musical Hop'))
+        self.assertNotIn('The Dueling Pianos Bar', html)
+
+    def test_search_venues_by_city(self):
+        self.add_venue('The Dueling Pianos Bar', 'New York', 'NY')
+        res = self.client().post('/venues/search', data={'search_term': 'new york'})
+        html = res.get_data(as_text=True)
+        self.assertIn('Number of search results for "new york": 1', html)
+        self.assertIn('The Dueling Pianos Bar', html)
+
+    def test_search_artists_without_results(self):
+        self.add_artist('Guns N Petals')
+        res = self.client().post('/artists/search', data={'search_term': 'bizarre'})
+        html = res.get_data(as_text=True)
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('Number of search results for "bizarre": 0', html)
+
+    def test_search_artists_exact_name_first(self):
+        self.add_artist('The Wild Sax Band')
+        self.add_artist('Band')
+        res = self.client().post('/artists/search', data={'search_term': 'band'})
+        html = res.get_data(as_text=True)
+        self.assertIn('Number of search results for "band": 2', html)
+        self.assertLess(html.index('<h5>Band</h5>'), html.index('The Wild Sax Band'))
+
+
+    # test query plans
+    def test_venue_queries_use_show_venue_index(self):
+        artist_id = self.add_artist('Guns N Petals')
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        self.add_show(venue_id, artist_id, datetime.now() + timedelta(days=1))
+
+        # /venues reads every venue, it only must not fall back to a seq scan
+        venues_plan, facets_plan = self.explain('/venues')
+        self.assertNotIn('Seq Scan', venues_plan)
+        venue_plan, shows_plan = self.explain(f'/venues/{venue_id}')
+        self.assertIn('ix_Show_Venue_id_start_time', shows_plan)
+
+    def test_artist_queries_use_show_artist_index(self):
+        artist_id = self.add_artist('Guns N Petals')
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        self.add_show(venue_id, artist_id, datetime.now() + timedelta(days=1))
+
+        artist_plan, *shows_plans = self.explain(f'/artists/{artist_id}')
+        self.assertTrue(shows_plans)
+        for plan in shows_plans:
+            self.assertIn('ix_Show_Artist_id_start_time', plan)
+
+
+    # test modification times and versions
+    def age_rows(self, table, updated_at):
+        # updated_at is kept by a trigger, switch it off to backdate rows
+        db.session.execute(db.text(f'ALTER TABLE "{table}" DISABLE TRIGGER set_updated_at'))
+        db.session.execute(db.text(f'UPDATE "{table}" SET updated_at = :updated_at'),
+                           {'updated_at': updated_at})
+        db.session.execute(db.text(f'ALTER TABLE "{table}" ENABLE TRIGGER set_updated_at'))
+        db.session.commit()
+
+    def test_show_venue_last_modified(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist_id = self.add_artist('Guns N Petals')
+        self.add_show(venue_id, artist_id, datetime.now() + timedelta(days=1))
+        for table in ('Venue', 'Artist', 'Show'):
+            self.age_rows(table, datetime(2026, 1, 1, 12, 0, 0, 500, tzinfo=timezone.utc))
+
+        res = self.client().get(f'/venues/{venue_id}?limit=5')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers['Last-Modified'], 'Thu, 01 Jan 2026 12:00:00 GMT')
+
+        with self.count_queries() as statements:
+            res = self.client().get(f'/venues/{venue_id}?limit=5',
+                                    headers={'If-Modified-Since': 'Thu, 01 Jan 2026 12:00:00 GMT'})
+        self.assertEqual(res.status_code, 304)
+        # the version check only, nothing rendered
+        self.assertEqual(len(statements), 1)
+
+        # a show that started since moves the page's modification time; start
+        # times are wall times of the app host
+        self.add_show(venue_id, artist_id, datetime(2026, 3, 1, 20, 0))
+        self.age_rows('Show', datetime(2026, 1, 1, tzinfo=timezone.utc))
+        self.age_rows('Venue', datetime(2026, 1, 1, tzinfo=timezone.utc))
+        self.age_rows('Artist', datetime(2026, 1, 1, tzinfo=timezone.utc))
+        res = self.client().get(f'/venues/{venue_id}?limit=5',
+                                headers={'If-Modified-Since': 'Thu, 01 Jan 2026 12:00:00 GMT'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers['Last-Modified'], http_date(datetime(2026, 3, 1, 20, 0).astimezone(timezone.utc)))
+
+    def test_last_modified_does_not_depend_on_the_database_time_zone(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        self.age_rows('Venue', datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc))
+        options = app.config['SQLALCHEMY_ENGINE_OPTIONS']
+        connect_args = {'options': options['connect_args']['options'] + ' -c TimeZone=Pacific/Kiritimati'}
+        other = create_app({'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URI,
+                            'SQLALCHEMY_ENGINE_OPTIONS': {**options, 'connect_args': connect_args}})
+        self.addCleanup(lambda: db.get_engine(other).dispose())
+        res = other.test_client().get(f'/venues/{venue_id}')
+        self.assertEqual(res.headers['Last-Modified'], 'Thu, 01 Jan 2026 12:00:00 GMT')
+
+        # a change not yet over on the database's clock gets no header
+        self.age_rows('Venue', datetime.now(timezone.utc) + timedelta(minutes=1))
+        res = other.test_client().get(f'/venues/{venue_id}')
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('Last-Modified', res.headers)
+
+    def test_show_artist_cached_page_keeps_last_modified(self):
+        artist_id = self.add_artist('Guns N Petals')
+        self.age_rows('Artist', datetime(2026, 1, 1))
+        first = self.client().get(f'/artists/{artist_id}')
+        with self.count_queries() as statements:
+            res = self.client().get(f'/artists/{artist_id}',
+                                    headers={'If-Modified-Since': first.headers['Last-Modified']})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(len(statements), 0)
+
+    def test_edit_venue_with_stale_version_is_refused(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        form = {'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA', 'phone': '',
+                'genres': 'Jazz', 'facebook_link': '', 'image_link': '', 'website_link': '',
+                'seeking_description': ''}
+        html = self.client().get(f'/venues/{venue_id}/edit').get_data(as_text=True)
+        self.assertIn('name="version" value="1"', html)
+
+        res = self.client().post(f'/venues/{venue_id}/edit', data=dict(form, phone='111-111-1111', version=1))
+        self.assertEqual(res.headers['Location'], f'/venues/{venue_id}')
+        # a second form filled from version 1 would overwrite that phone number
+        res = self.client().post(f'/venues/{venue_id}/edit', data=dict(form, phone='222-222-2222', version=1))
+        self.assertEqual(res.headers['Location'], f'/venues/{venue_id}/edit')
+        db.session.expire_all()
+        venue = Venue.query.get(venue_id)
+        self.assertEqual((venue.phone, venue.version), ('111-111-1111', 2))
+
+    def test_edit_artist_with_stale_version_is_refused(self):
+        artist_id = self.add_artist('Guns N Petals')
+        db.session.execute(db.text('UPDATE "Artist" SET version = version + 1'))
+        db.session.commit()
+        res = self.client().post(f'/artists/{artist_id}/edit', data={
+            'name': 'Guns N Roses', 'city': 'San Francisco', 'state': 'CA', 'phone': '',
+            'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/GunsNPetals',
+            'image_link': '', 'website_link': '', 'seeking_description': '', 'version': 1})
+        self.assertEqual(res.headers['Location'], f'/artists/{artist_id}/edit')
+        db.session.expire_all()
+        self.assertEqual(Artist.query.get(artist_id).name, 'Guns N Petals')
+
+    # test connection pool
+    def test_engine_options(self):
+        self.assertEqual(db.session.execute(db.text('SHOW statement_timeout')).scalar(), '30s')
+        self.assertTrue(db.engine.pool._pre_ping)
+
+    def test_debug_metrics_pool(self):
+        self.client().get('/venues')
+        res = self.client().get('/debug/metrics', headers=METRICS_HEADERS)
+        pool = res.get_json()['pool']
+        self.assertEqual(pool['size'], 5)
+        self.assertGreaterEqual(pool['checkout_wait_ms']['count'], 1)
+        self.assertEqual(pool['checkout_wait_ms']['buckets']['+Inf'], pool['checkout_wait_ms']['count'])
+
+    def test_debug_metrics_needs_the_token(self):
+        self.assertEqual(self.client().get('/debug/metrics').status_code, 404)
+        res = self.client().get('/debug/metrics', headers={'Authorization': 'Bearer wrong'})
+        self.assertEqual(res.status_code, 404)
+        # and is not served at all without one
+        other = create_app()
+        self.assertNotIn('debug_metrics', {rule.endpoint for rule in other.url_map.iter_rules()})
+
+    # test query metrics
+    def sample_every_request(self):
+        app.config['QUERY_METRICS_SAMPLE_RATE'] = 1
+        route_metrics.reset()
+        self.addCleanup(app.config.__setitem__, 'QUERY_METRICS_SAMPLE_RATE', 0.1)
+        self.addCleanup(route_metrics.reset)
+
+    def test_query_metrics_per_route(self):
+        self.sample_every_request()
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        self.add_venue('The Dueling Pianos Bar', 'New York', 'NY')
+        res = self.client().get('/venues')
+        self.assertRegex(res.headers['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries"$')
+        self.client().get(f'/venues/{venue_id}')
+        self.client().get(f'/venues/{venue_id}')
+
+        metrics = self.client().get('/debug/metrics', headers=METRICS_HEADERS).get_json()
+        venues = metrics['routes']['GET /venues']
+        self.assertEqual(venues['response_ms']['count'], 1)
+        self.assertEqual(venues['queries']['count'], 1)
+        self.assertGreaterEqual(venues['queries']['sum'], 1)
+        self.assertEqual(metrics['routes']['GET /venues/<int:venue_id>']['queries']['count'], 2)
+        self.assertEqual(metrics['n_plus_one'], [])
+
+    def test_unsampled_requests_are_not_measured(self):
+        self.sample_every_request()
+        app.config['QUERY_METRICS_SAMPLE_RATE'] = 0
+        res = self.client().get('/venues')
+        self.assertNotIn('Server-Timing', res.headers)
+        self.assertEqual(route_metrics.to_dict()['routes'], {})
+
+    def test_repeated_statement_flagged_as_n_plus_one(self):
+        self.sample_every_request()
+        venue_ids = [self.add_venue(f'Venue {i}', 'San Francisco', 'CA') for i in range(6)]
+        with app.test_request_context('/venues'):
+            app.preprocess_request()
+            # one query per venue, the loop the detector is after
+            for venue_id in venue_ids:
+                Venue.query.filter_by(id=venue_id).first()
+            Venue.query.filter_by(name='Venue 0').first()
+
+        suspects = route_metrics.to_dict()['n_plus_one']
+        self.assertEqual(len(suspects), 1)
+        self.assertEqual(suspects[0]['route'], 'GET /venues')
+        self.assertEqual(suspects[0]['max_repeats'], 6)
+        self.assertIn('WHERE "Venue".id =', suspects[0]['statement'])
+
+    def test_edit_venue_failure_is_rolled_back(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        client = self.client()
+        res = client.post(f'/venues/{venue_id}/edit', data={
+            'name': 'The Musical Hop', 'city': 'x' * 200, 'state': 'CA', 'phone': '',
+            'genres': 'Jazz', 'facebook_link': '', 'image_link': '', 'website_link': '',
+            'seeking_description': ''})
+        self.assertEqual(res.status_code, 302)
+        with client.session_transaction() as flask_session:
+            self.assertIn('could not be updated', str(flask_session['_flashes']))
+        # the request's session was rolled back and handed back
+        self.assertEqual(db.engine.pool.checkedout(), 0)
+        db.session.expire_all()
+        self.assertEqual(Venue.query.get(venue_id).city, 'San Francisco')
+
+    # test read replicas
+    def use_replica(self):
+        """Route read-only views to the replica database, holding its own rows"""
+        app.config['SQLALCHEMY_BINDS'] = {'replica_0': TEST_REPLICA_DATABASE_URI}
+        replica_router.lags.clear()
+        replica = db.get_engine(app, bind='replica_0')
+        db.metadata.create_all(replica)
+
+        def cleanup():
+            db.session.remove()
+            db.metadata.drop_all(replica)
+            replica.dispose()
+            app.config['SQLALCHEMY_BINDS'] = {}
+            replica_router.lags.clear()
+        self.addCleanup(cleanup)
+        return replica
+
+    def test_read_only_views_read_from_replica(self):
+        replica = self.use_replica()
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        with replica.begin() as connection:
+            connection.execute(Venue.__table__.insert().values(
+                name='Replica Hall', city='Austin', state='TX', genres=['Jazz']))
+
+        html = self.client().get('/venues').get_data(as_text=True)
+        self.assertIn('Replica Hall', html)
+        self.assertNotIn('The Musical Hop', html)
+        # the edit form reads the row it is about to write from the primary
+        html = self.client().get(f'/venues/{venue_id}/edit').get_data(as_text=True)
+        self.assertIn('The Musical Hop', html)
+
+    def test_writer_reads_own_writes_from_primary(self):
+        replica = self.use_replica()
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        with replica.begin() as connection:
+            connection.execute(Venue.__table__.insert().values(
+                id=venue_id, name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz']))
+        client = self.client()
+
+        res = client.post(f'/venues/{venue_id}/edit', data={
+            'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA', 'phone': '222-222-2222',
+            'genres': 'Jazz', 'facebook_link': '', 'image_link': '', 'website_link': '',
+            'seeking_description': ''})
+        self.assertEqual(res.headers['Location'], f'/venues/{venue_id}')
+        # the replica has not caught up, the writer still sees its change
+        self.assertIn('222-222-2222', client.get(f'/venues/{venue_id}?limit=1').get_data(as_text=True))
+        self.assertNotIn('222-222-2222', self.client().get(f'/venues/{venue_id}?limit=1').get_data(as_text=True))
+
+    def test_pages_read_from_replica_are_not_cached(self):
+        replica = self.use_replica()
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        with replica.begin() as connection:
+            connection.execute(Venue.__table__.insert().values(
+                id=venue_id, name='The Old Hop', city='San Francisco', state='CA', genres=['Jazz']))
+
+        self.assertIn('The Old Hop', self.client().get(f'/venues/{venue_id}').get_data(as_text=True))
+        # a reader of the primary renders (and caches) its own copy
+        app.config['REPLICA_MAX_LAG'] = -1
+        self.addCleanup(app.config.__setitem__, 'REPLICA_MAX_LAG', 5)
+        html = self.client().get(f'/venues/{venue_id}').get_data(as_text=True)
+        self.assertIn('The Musical Hop', html)
+        self.assertNotIn('The Old Hop', html)
+
+    def test_lagging_replica_is_skipped(self):
+        self.use_replica()
+        self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        app.config['REPLICA_MAX_LAG'] = -1
+        self.addCleanup(app.config.__setitem__, 'REPLICA_MAX_LAG', 5)
+        self.assertIn('The Musical Hop', self.client().get('/venues').get_data(as_text=True))
+
+    # test api
+    def test_api_venue(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist_id = self.add_artist('Guns N Petals')
+        self.add_show(venue_id, artist_id, datetime(2035, 5, 21, 21, 30))
+        self.add_show(venue_id, artist_id, datetime(2019, 5, 21, 21, 30))
+
+        res = self.client().get(f'/api/v1/venues/{venue_id}')
+        data = res.get_json()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['name'], 'The Musical Hop')
+        self.assertEqual(data['upcoming_shows'], [{
+            'artist_id': artist_id,
+            'artist_name': 'Guns N Petals',
+            'artist_image_link': None,
+            'start_time': '2035-05-21T21:30:00'}])
+        self.assertEqual(data['past_shows_count'], 1)
+        self.assertFalse(res.headers['ETag'].startswith('W/'))
+
+    def test_api_venue_not_modified(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist_id = self.add_artist('Guns N Petals')
+        self.add_show(venue_id, artist_id, datetime.now() + timedelta(days=1))
+        etag = self.client().get(f'/api/v1/venues/{venue_id}').headers['ETag']
+
+        with self.count_queries() as statements:
+            res = self.client().get(f'/api/v1/venues/{venue_id}', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.get_data(), b'')
+        # only the version check ran
+        self.assertEqual(len(statements), 1)
+
+        # renaming an artist of its shows changes the venue response
+        db.session.execute(db.text('UPDATE "Artist" SET name = \'Petals\''))
+        db.session.commit()
+        res = self.client().get(f'/api/v1/venues/{venue_id}', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+        self.assertEqual(res.get_json()['upcoming_shows'][0]['artist_name'], 'Petals')
+
+    def test_api_artist_and_not_found(self):
+        artist_id = self.add_artist('Guns N Petals')
+        res = self.client().get(f'/api/v1/artists/{artist_id}')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['upcoming_shows_count'], 0)
+
+        res = self.client().get('/api/v1/artists/1000')
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(res.get_json()['error'], 404)
+
+    def test_api_venues_etag_changes_on_delete(self):
+        self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        park_id = self.add_venue('Park Square Live Music & Coffee', 'San Francisco', 'CA')
+        res = self.client().get('/api/v1/venues')
+        etag = res.headers['ETag']
+        self.assertEqual(len(res.get_json()['areas'][0]['venues']), 2)
+        self.assertEqual(self.client().get('/api/v1/venues', headers={'If-None-Match': etag}).status_code, 304)
+
+        db.session.execute(db.text('DELETE FROM "Venue" WHERE id = :id'), {'id': park_id})
+        db.session.commit()
+        self.assertEqual(self.client().get('/api/v1/venues', headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_api_shows_pages(self):
+        self.add_shows_for_weeks([1, 2, 3])
+
+        res = self.client().get('/api/v1/shows')
+        data = res.get_json()
+        self.assertEqual(len(data['shows']), 2)
+        self.assertIsNotNone(data['next_cursor'])
+        res = self.client().get(f'/api/v1/shows?after={data["next_cursor"]}')
+        self.assertEqual(len(res.get_json()['shows']), 1)
+        etag = res.headers['ETag']
+        res = self.client().get(f'/api/v1/shows?after={data["next_cursor"]}', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(self.client().get('/api/v1/shows?when=soon').get_json()['error'], 400)
+
+    # test exports
+    def test_export_shows_csv(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist_id = self.add_artist('Guns N Petals')
+        self.add_show(venue_id, artist_id, datetime(2035, 5, 21, 21, 30))
+
+        res = self.client().get('/export/shows.csv', headers=EXPORT_HEADERS)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'text/csv')
+        self.assertTrue(res.is_streamed)
+        self.assertEqual(res.get_data(as_text=True).splitlines()[:2], [
+            'id,venue_id,venue,venue_city,artist_id,artist,start_time,updated_at',
+            f'1,{venue_id},The Musical Hop,San Francisco,{artist_id},Guns N Petals,2035-05-21T21:30:00,'
+            + db.session.execute(db.text('SELECT updated_at FROM "Show"')).scalar().isoformat()])
+
+    def test_export_gzip_argument(self):
+        self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        res = self.client().get('/export/venues.csv?gzip=1', headers=EXPORT_HEADERS)
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertIn(b'The Musical Hop', gzip.decompress(res.get_data()))
+        res = self.client().get('/export/venues.csv?gzip=0', headers={'Accept-Encoding': 'gzip', **EXPORT_HEADERS})
+        self.assertNotIn('Content-Encoding', res.headers)
+        self.assertIn('The Musical Hop', res.get_data(as_text=True))
+        res = self.client().get('/export/venues.csv?gzip=maybe', headers=EXPORT_HEADERS)
+        self.assertEqual(res.status_code, 400)
+
+    def test_export_venues_ndjson_gzip(self):
+        self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        self.add_venue('Park Square Live Music & Coffee', 'San Francisco', 'CA')
+
+        res = self.client().get('/export/venues.ndjson', headers={'Accept-Encoding': 'gzip', **EXPORT_HEADERS})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        rows = [json.loads(line) for line in gzip.decompress(res.get_data()).splitlines()]
+        self.assertEqual(sorted(row['name'] for row in rows),
+                         ['Park Square Live Music & Coffee', 'The Musical Hop'])
+        self.assertEqual(rows[0]['genres'], ['Jazz'])
+
+    def test_export_since_only_changed_rows(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        self.add_venue('Park Square Live Music & Coffee', 'San Francisco', 'CA')
+        since = db.session.execute(db.text('SELECT LOCALTIMESTAMP')).scalar()
+        db.session.commit()
+        # any change to the row moves updated_at, raw sql included
+        db.session.execute(db.text('UPDATE "Venue" SET phone = :phone WHERE id = :id'),
+                           {'phone': '123-123-1234', 'id': venue_id})
+        db.session.commit()
+
+        res = self.client().get(f'/export/venues.ndjson?since={since.isoformat()}', headers=EXPORT_HEADERS)
+        rows = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [venue_id])
+        res = self.client().get('/export/venues.ndjson?since=soon', headers=EXPORT_HEADERS)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(self.client().get('/export/users.csv', headers=EXPORT_HEADERS).status_code, 404)
+
+    def test_export_since_includes_shows_of_a_renamed_venue(self):
+        venue_id = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist_id = self.add_artist('Guns N Petals')
+        self.add_show(venue_id, artist_id, datetime(2035, 5, 21, 21, 30))
+        since = db.session.execute(db.text('SELECT LOCALTIMESTAMP')).scalar()
+        db.session.commit()
+        # the exported show carries the venue name, it changes with it
+        db.session.execute(db.text('UPDATE "Venue" SET name = :name WHERE id = :id'),
+                           {'name': 'The Big Hop', 'id': venue_id})
+        db.session.commit()
+
+        res = self.client().get(f'/export/shows.ndjson?since={since.isoformat()}', headers=EXPORT_HEADERS)
+        rows = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+        self.assertEqual([row['venue'] for row in rows], ['The Big Hop'])
+
+    def test_export_needs_the_token(self):
+        self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        self.assertEqual(self.client().get('/export/venues.csv').status_code, 404)
+        res = self.client().get('/export/venues.csv', headers={'Authorization': 'Bearer wrong'})
+        self.assertEqual(res.status_code, 404)
+        # and is not served at all without one
+        other = create_app()
+        self.assertNotIn('export', {rule.endpoint for rule in other.url_map.iter_rules()})
+
+    def test_export_command(self):
+        self.add_artist('Guns N Petals')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'artists.csv.gz')
+            result = self.app.test_cli_runner().invoke(
+                args=['fyyur', 'export', 'artists', '--gzip', '--batch-size', '1', '-o', path])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn('bytes exported', result.output)
+            with gzip.open(path, 'rt') as f:
+                lines = f.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Guns N Petals', lines[1])
+
+    # test templates
+    def test_precompile_templates_fills_bytecode_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        bytecode_cache = app.jinja_env.bytecode_cache
+        self.addCleanup(setattr, app.jinja_env, 'bytecode_cache', bytecode_cache)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+        app.jinja_env.cache.clear()
+
+        names = precompile_templates(app)
+        self.assertIn('layouts/main.html', names)
+        self.assertIn('pages/show_venue.html', names)
+        self.assertEqual(len(os.listdir(cache_dir)), len(names))
+        # a new worker loads them from the bytecode instead of compiling
+        app.jinja_env.cache.clear()
+        self.assertEqual(self.client().get('/venues/create').status_code, 200)
+
+    # test app factory
+    def test_create_app_builds_independent_apps(self):
+        other = create_app({'SHOWS_PER_PAGE': 5})
+        self.assertIsNot(other, app)
+        self.assertEqual(other.config['SHOWS_PER_PAGE'], 5)
+        self.assertEqual(app.config['SHOWS_PER_PAGE'], 2)
+        endpoints = {rule.endpoint for rule in other.url_map.iter_rules()}
+        self.assertTrue({'venues.show_venue', 'artists.show_artist', 'shows.shows', 'api.api_venues'} <= endpoints)
+
+    def test_startup_does_not_import_dateutil(self):
+        code = ('import sys; from app import create_app; create_app(); '
+                'print("dateutil" in sys.modules)')
+        output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                check=True, capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), 'False')
+        # it loads on first use
+        res = self.client().get('/export/shows.csv?since=2020-01-01', headers=EXPORT_HEADERS)
+        self.assertEqual(res.status_code, 200)
+
+    # test benchmark seed
+    def test_seed_is_deterministic(self):
+        anchor = datetime(2026, 1, 1)
+        bench_seed.seed((200, 10, 20), seed=7, anchor=anchor)
+        first = db.session.execute(db.text(
+            'SELECT "Venue_id", "Artist_id", start_time FROM "Show" ORDER BY id')).fetchall()
+        venue_names = [name for name, in db.session.query(Venue.name).order_by(Venue.id)]
+        bench_seed.seed((200, 10, 20), seed=7, anchor=anchor)
+        self.assertEqual(db.session.execute(db.text(
+            'SELECT "Venue_id", "Artist_id", start_time FROM "Show" ORDER BY id')).fetchall(), first)
+        self.assertEqual([name for name, in db.session.query(Venue.name).order_by(Venue.id)], venue_names)
+        self.assertEqual(len(first), 200)
+        self.assertTrue(all(19 <= start_time.hour <= 22 for *_, start_time in first))
+        # the counters were recounted after the bulk load
+        self.assertEqual(db.session.query(db.func.sum(Venue.num_upcoming_shows + Venue.num_past_shows)).scalar(), 200)
+
+    # test bulk import
+    def write_file(self, name, text):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def import_files(self, *args):
+        result = self.app.test_cli_runner().invoke(args=['fyyur', 'import', *args])
+        self.assertEqual(result.exit_code, 0, result.output)
+        return result.output
+
+    def test_import_venues_artists_and_shows(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.add_artist('Guns N Petals')
+        venues = self.write_file('venues.csv', (
+            'name,city,state,address,genres,seeking_talent\n'
+            'The Musical Hop,San Francisco,CA,1015 Folsom Street,"Jazz,Reggae",true\n'
+            'The Dueling Pianos Bar,New York,NY,335 Delancey Street,Classical,no\n'
+            ',Austin,TX,,,\n'
+            'Park Square,San Francisco,CA,34 Whiskey Moore Ave,Rock n Roll,maybe\n'))
+        artists = self.write_file('artists.ndjson', (
+            '{"name": "Guns N Petals", "city": "San Francisco", "state": "CA", "phone": "326-123-5000"}\n'
+            '{"name": "Matt Quevedo", "city": "New York", "state": "NY", "genres": ["Jazz"]}\n'
+            '{"name": "Matt Quevedo", "city": "Austin", "state": "TX", "genres": ["Jazz"]}\n'
+            'not json\n'))
+        shows = self.write_file('shows.csv', (
+            'venue,artist,start_time\n'
+            'The Musical Hop,Guns N Petals,2035-05-21T21:30:00\n'
+            'The Musical Hop,Guns N Petals,2035-05-21T21:30:00\n'
+            'The Dueling Pianos Bar,Matt Quevedo,2019-06-15 23:00\n'
+            'Nowhere,Matt Quevedo,2035-01-01\n'
+            'The Musical Hop,Nobody,2035-01-01\n'
+            'The Musical Hop,Matt Quevedo,someday\n'))
+
+        output = self.import_files('--venues', venues, '--artists', artists, '--shows', shows)
+        self.assertIn('venues.csv: 4 venues rows', output)
+        self.assertIn('2 inserted, 0 updated, 0 skipped, 2 rejected', output)
+        self.assertIn('line 4: missing name', output)
+        self.assertIn('line 5: seeking_talent: invalid boolean', output)
+        self.assertIn('1 inserted, 1 updated, 1 skipped, 1 rejected', output)
+        self.assertIn('line 4: invalid JSON', output)
+        self.assertIn('2 inserted, 0 updated, 1 skipped, 3 rejected', output)
+        self.assertIn('line 5: unknown venue', output)
+        self.assertIn('line 6: unknown artist', output)
+        self.assertIn('line 7: start_time: invalid date/time', output)
+        self.assertIn('rows/s', output)
+
+        hop = Venue.query.filter_by(name='The Musical Hop').one()
+        self.assertEqual(hop.genres, ['Jazz', 'Reggae'])
+        self.assertTrue(hop.seeking_talent)
+        petals = Artist.query.filter_by(name='Guns N Petals').one()
+        self.assertEqual(petals.phone, '326-123-5000')
+        # the last row for a name wins
+        self.assertEqual(Artist.query.filter_by(name='Matt Quevedo').one().city, 'Austin')
+        # counted by the import itself, the row trigger is off during the merge
+        self.assertEqual(self.counters(Venue, hop.id), (1, 0))
+        self.assertEqual(self.counters(Artist, petals.id), (1, 0))
+        quevedo = Artist.query.filter_by(name='Matt Quevedo').one()
+        self.assertEqual(self.counters(Artist, quevedo.id), (0, 1))
+        # and on again afterwards
+        self.add_show(hop.id, quevedo.id, datetime.now() + timedelta(days=3))
+        self.assertEqual(self.counters(Venue, hop.id), (2, 0))
+
+        # importing the same files again only updates and skips
+        output = self.import_files('--venues', venues, '--shows', shows, '--method', 'executemany')
+        self.assertIn('0 inserted, 2 updated, 0 skipped, 2 rejected', output)
+        self.assertIn('0 inserted, 0 updated, 3 skipped, 3 rejected', output)
+        self.assertEqual(Venue.query.count(), 2)
+
+    def test_import_ambiguous_venue_and_rejects_file(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.add_artist('Guns N Petals')
+        self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        self.add_venue('The Musical Hop', 'New York', 'NY')
+        shows = self.write_file('shows.jsonl', (
+            '{"venue": "The Musical Hop", "artist": "Guns N Petals", "start_time": "2035-01-01"}\n'
+            '{"venue": "The Musical Hop", "venue_city": "New York", "artist": "Guns N Petals", '
+            '"start_time": "2035-01-01"}\n'))
+        rejects = os.path.join(self.tmpdir.name, 'rejects.csv')
+
+        output = self.import_files('--shows', shows, '--rejects', rejects)
+        self.assertIn('1 inserted', output)
+        with open(rejects) as f:
+            self.assertEqual(f.read().strip(),
+                             f'{shows},1,"venue name matches 2 venues, add venue_city"')
+
+    def test_import_rejects_a_start_time_that_is_not_a_string(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.add_artist('Guns N Petals')
+        self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        shows = self.write_file('shows.jsonl', (
+            '{"venue": "The Musical Hop", "artist": "Guns N Petals", "start_time": 12345}\n'
+            '{"venue": "The Musical Hop", "artist": "Guns N Petals", "start_time": true}\n'
+            '{"venue": "The Musical Hop", "artist": "Guns N Petals", "start_time": "2035-01-01"}\n'))
+        rejects = os.path.join(self.tmpdir.name, 'rejects.csv')
+
+        output = self.import_files('--shows', shows, '--rejects', rejects)
+        self.assertIn('1 inserted', output)
+        with open(rejects) as f:
+            self.assertEqual(f.read().strip().splitlines(),
+                             [f'{shows},1,start_time: invalid date/time 12345',
+                              f'{shows},2,start_time: invalid date/time True'])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,344 @@
+# ----------------------------------------------------------------------------#
+# Venue pages: listing, search, detail, create, edit and delete.
+# ----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime
+
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort, jsonify
+from sqlalchemy.orm.exc import StaleDataError
+
+from forms import *
+from helpers import *
+from models import *
+from replicas import read_only
+
+bp = Blueprint('venues', __name__)
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@bp.route('/venues')
+@read_only
+def venues():
+    # TODO: replace with real venues data.
+    #       num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
+    # data=[{
+    #   "city": "San Francisco",
+    #   "state": "CA",
+    #   "venues": [{
+    #     "id": 1,
+    #     "name": "The Musical Hop",
+    #     "num_upcoming_shows": 0,
+    #   }, {
+    #     "id": 3,
+    #     "name": "Park Square Live Music & Coffee",
+    #     "num_upcoming_shows": 1,
+    #   }]
+    # }, {
+    #   "city": "New York",
+    #   "state": "NY",
+    #   "venues": [{
+    #     "id": 2,
+    #     "name": "The Dueling Pianos Bar",
+    #     "num_upcoming_shows": 0,
+    #   }]
+    # }]
+    # data contains city,state and venues, where venues list contains venue's id, name
+    # and num_upcoming_shows, grouped by city,state
+    # ?genre= narrows the venues, see genre_filter
+    criteria, genres, match = genre_filter(Venue)
+    try:
+        data = venue_areas(criteria)
+        return render_template('pages/venues.html', areas=data, genres=genres, match=match,
+                               facets=genre_facets(Venue, criteria));
+    except:
+        flash('An error occurred. Cannot display venues')
+        return redirect(url_for('index'))
+
+
+@bp.route('/venues/search', methods=['POST'])
+@read_only
+def search_venues():
+    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+    # seach for Hop should return "The Musical Hop".
+    # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+    # response={
+    #   "count": 1,
+    #   "data": [{
+    #     "id": 2,
+    #     "name": "The Dueling Pianos Bar",
+    #     "num_upcoming_shows": 0,
+    #   }]
+    # }
+    search_term = request.form.get('search_term', '')
+    # https://stackoverflow.com/questions/4926757/sqlalchemy-query-where-a-column-contains-a-substring
+    # search matched term from name,city or state column of Venue table
+    # https://stackoverflow.com/questions/3332991/sqlalchemy-filter-multiple-columns
+    response = search_by_term(Venue, search_term)
+    return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+
+@bp.route('/venues/<int:venue_id>')
+@read_only
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    # TODO: replace with real venue data from the venues table, using venue_id
+    # data1={
+    #   "id": 1,
+    #   "name": "The Musical Hop",
+    #   "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
+    #   "address": "1015 Folsom Street",
+    #   "city": "San Francisco",
+    #   "state": "CA",
+    #   "phone": "123-123-1234",
+    #   "website": "https://www.themusicalhop.com",
+    #   "facebook_link": "https://www.facebook.com/TheMusicalHop",
+    #   "seeking_talent": True,
+    #   "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
+    #   "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
+    #   "past_shows": [{
+    #     "artist_id": 4,
+    #     "artist_name": "Guns N Petals",
+    #     "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
+    #     "start_time": "2019-05-21T21:30:00.000Z"
+    #   }],
+    #   "upcoming_shows": [],
+    #   "past_shows_count": 1,
+    #   "upcoming_shows_count": 0,
+    # }
+    # data2={
+    #   "id": 2,
+    #   "name": "The Dueling Pianos Bar",
+    #   "genres": ["Classical", "R&B", "Hip-Hop"],
+    #   "address": "335 Delancey Street",
+    #   "city": "New York",
+    #   "state": "NY",
+    #   "phone": "914-003-1132",
+    #   "website": "https://www.theduelingpianos.com",
+    #   "facebook_link": "https://www.facebook.com/theduelingpianos",
+    #   "seeking_talent": False,
+    #   "image_link": "https://images.unsplash.com/photo-1497032205916-ac775f0649ae?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=750&q=80",
+    #   "past_shows": [],
+    #   "upcoming_shows": [],
+    #   "past_shows_count": 0,
+    #   "upcoming_shows_count": 0,
+    # }
+    # data3={
+    #   "id": 3,
+    #   "name": "Park Square Live Music & Coffee",
+    #   "genres": ["Rock n Roll", "Jazz", "Classical", "Folk"],
+    #   "address": "34 Whiskey Moore Ave",
+    #   "city": "San Francisco",
+    #   "state": "CA",
+    #   "phone": "415-000-1234",
+    #   "website": "https://www.parksquarelivemusicandcoffee.com",
+    #   "facebook_link": "https://www.facebook.com/ParkSquareLiveMusicAndCoffee",
+    #   "seeking_talent": False,
+    #   "image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
+    #   "past_shows": [{
+    #     "artist_id": 5,
+    #     "artist_name": "Matt Quevedo",
+    #     "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
+    #     "start_time": "2019-06-15T23:00:00.000Z"
+    #   }],
+    #   "upcoming_shows": [{
+    #     "artist_id": 6,
+    #     "artist_name": "The Wild Sax Band",
+    #     "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #     "start_time": "2035-04-01T20:00:00.000Z"
+    #   }, {
+    #     "artist_id": 6,
+    #     "artist_name": "The Wild Sax Band",
+    #     "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #     "start_time": "2035-04-08T20:00:00.000Z"
+    #   }, {
+    #     "artist_id": 6,
+    #     "artist_name": "The Wild Sax Band",
+    #     "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #     "start_time": "2035-04-15T20:00:00.000Z"
+    #   }],
+    #   "past_shows_count": 1,
+    #   "upcoming_shows_count": 1,
+    # }
+    # data = list(filter(lambda d: d['id'] == venue_id, [data1, data2, data3]))[0]
+
+    # serve the rendered page from the page cache while nothing changed
+    now = datetime.now()
+    cache_key = f'venue:{venue_id}'
+    cacheable = page_cacheable()
+    page, last_modified, settled = cached_page(cache_key) if cacheable else (None, None, None)
+    if page is not None:
+        return page_response(page, last_modified, settled)
+    # either below can get the result
+    # data = Venue.query.filter_by(id=venue_id).all()[0]
+    # Step 1: Get single venue object, with the version of its page
+    single_venue, version, checked_at = load_with_version(
+        Venue, Show.c.Venue_id, Artist, Show.c.Artist_id, venue_id, now)
+    if single_venue is None:
+        abort(404)
+    last_modified = last_modified_of(version)
+    # the client's copy is current (If-Modified-Since): nothing to load or render
+    if not modified_since(last_modified):
+        return page_response(None, last_modified, settles_in(last_modified, checked_at) == 0)
+    # Step 2: Get past and upcoming shows in one query, split against one timestamp
+    # add label , then 'artist_id' can be a attribute of object,
+    # for example:single_venue.past_shows.artist_id, called in show_venue.html
+    # optional ?limit=N caps each list, the counts still cover every show
+    load_venue_shows(single_venue, now,
+                     request.args.get('limit', current_app.config.get('SHOWS_LIMIT'), type=int))
+    page = render_template('pages/show_venue.html', venue=single_venue)
+    if cacheable:
+        cache_page(cache_key, page, single_venue.upcoming_shows, last_modified, checked_at)
+    return page_response(page, last_modified, settles_in(last_modified, checked_at) == 0)
+
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+    try:
+        # seeking_talent is a boolean, so empty is not allowed
+        # below does not work
+        # seeking_talent = request.form['seeking_talent'],
+        venue = Venue(
+            name=request.form['name'],
+            city=request.form['city'],
+            state=request.form['state'],
+            address=request.form['address'],
+            phone=request.form['phone'],
+            # getlist from genres list of request.form,
+            genres=request.form.getlist('genres'),
+            facebook_link=request.form['facebook_link'],
+            image_link=request.form['image_link'],
+            website=request.form['website_link'],
+            seeking_description=request.form['seeking_description'],
+            seeking_talent=True if 'seeking_talent' in request.form else False
+        )
+        db.session.add(venue)
+        db.session.commit()
+        # on successful db insert, flash success
+        flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        # TODO: on unsuccessful db insert, flash an error instead.
+        # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+        flash('An error occurred: Venue ' + request.form['name'] + ' could not be posted')
+    return render_template('pages/home.html')
+
+
+@bp.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    # TODO: Complete this endpoint for taking a venue_id, and using
+    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    '''
+    :param venue_id:
+    Referenced from googling, Contains following features:
+    - Delete venue when red button on "/venues/<int:venue_id>" clicked on  templates/pages/show_venue.html
+    - Route gets fetched by Ajax. Javascript can be found under templates/layouts/main.html
+    - Communicate success or error with corresponding redirections and alerts
+    :return:
+    '''
+    try:
+        single_venue= db.session.query(Venue).get(venue_id)
+        artist_ids = show_partner_ids(Show.c.Venue_id, Show.c.Artist_id, venue_id)
+        db.session.delete(single_venue)
+        db.session.commit()
+        invalidate_pages(venue_ids=[venue_id], artist_ids=artist_ids)
+        flash('Successfully deleted the venue')
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        return jsonify({'success': False})
+        flash('An error occurred when trying to delete the venue')
+    return jsonify({ 'success': True })
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    form = VenueForm()
+    # venue={
+    #   "id": 1,
+    #   "name": "The Musical Hop",
+    #   "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
+    #   "address": "1015 Folsom Street",
+    #   "city": "San Francisco",
+    #   "state": "CA",
+    #   "phone": "123-123-1234",
+    #   "website": "https://www.themusicalhop.com",
+    #   "facebook_link": "https://www.facebook.com/TheMusicalHop",
+    #   "seeking_talent": True,
+    #   "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
+    #   "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60"
+    # }
+    # TODO: populate form with values from venue with ID <venue_id>
+
+    venue = Venue.query.get(venue_id)
+
+    # Pre Fill form with data
+    form.name.data = venue.name
+    form.city.data = venue.city
+    form.state.data = venue.state
+    form.address.data = venue.address
+    form.phone.data = venue.phone
+    form.genres.data = venue.genres
+    form.facebook_link.data = venue.facebook_link
+    form.image_link.data = venue.image_link
+    form.website_link.data = venue.website
+    form.seeking_talent.data = venue.seeking_talent
+    form.seeking_description.data = venue.seeking_description
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    # TODO: take values from the form submitted, and update existing
+    # venue record with ID <venue_id> using the new attributes
+
+    venue = Venue.query.get(venue_id)
+    try:
+        # optimistic concurrency, see edit_artist_submission
+        check_version(venue, request.form.get('version', type=int))
+        # update the attributes
+        venue.name = request.form['name']
+        venue.city = request.form['city']
+        venue.state = request.form['state']
+        venue.phone = request.form['phone']
+        # getlist from genres list of request.form,
+        venue.genres = request.form.getlist('genres')
+        print(f"genres: {venue.genres}")
+        venue.facebook_link = request.form['facebook_link']
+        venue.image_link = request.form['image_link']
+        venue.website = request.form['website_link']
+        venue.seeking_talent = True if 'seek_venue' in request.form else False
+        venue.seeking_description = request.form['seeking_description']
+
+        db.session.add(venue)
+        db.session.commit()
+        invalidate_pages(venue_ids=[venue_id],
+                         artist_ids=show_partner_ids(Show.c.Venue_id, Show.c.Artist_id, venue_id))
+    except StaleDataError:
+        db.session.rollback()
+        flash('Venue ' + request.form['name'] + ' was changed by someone else meanwhile. '
+              'Review the changes and submit again.')
+        return redirect(url_for('.edit_venue', venue_id=venue_id))
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash('An error occurred. Venue ' + request.form['name'] + ' could not be updated.')
+
+    return redirect(url_for('.show_venue', venue_id=venue_id))
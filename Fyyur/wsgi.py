@@ -0,0 +1,7 @@
+# ----------------------------------------------------------------------------#
+# The app served in production: gunicorn wsgi:app (see gunicorn.conf.py).
+# ----------------------------------------------------------------------------#
+
+from app import create_app
+
+app = create_app()
@@ -0,0 +1,101 @@
+# ----------------------------------------------------------------------------#
+# Compare deep pages of the question lists: ?page= (OFFSET) against ?cursor=
+# (keyset on Question.id).
+#
+#   createdb trivia_bench
+#   python benchmarks/pagination.py --questions 1000000
+#
+# The benchmark database (BENCH_DATABASE_NAME, default trivia_bench) is filled
+# with --questions generated questions in six categories, unless it already
+# holds that many. Each depth is then requested --repeat times in both modes,
+# through /questions and /categories/1/questions, and the median latency is
+# printed. Both modes count the whole list for total_questions, so a request
+# costs at least that COUNT. WARNING: the benchmark database is emptied.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flaskr import create_app, encode_cursor  # noqa: E402
+from models import setup_db, db, Question, Category  # noqa: E402
+from settings import DB_USER, DB_PASSWORD  # noqa: E402
+
+BENCH_DATABASE_PATH = "postgresql://{}:{}@{}/{}".format(
+    DB_USER, DB_PASSWORD, "localhost:5432", os.environ.get("BENCH_DATABASE_NAME", "trivia_bench"))
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+# pages of 10 questions
+DEPTHS = [1, 10, 100, 1000, 10000, 50000, 99999]
+
+
+def fill(count):
+    """Empty the database and add count questions, spread over the categories."""
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    db.session.add_all([Category(type=name) for name in CATEGORIES])
+    db.session.commit()
+    cursor = db.session.connection().connection.cursor()
+    for first in range(0, count, 100000):
+        rows = io.StringIO()
+        for i in range(first, min(first + 100000, count)):
+            rows.write(f'Question {i}?\tAnswer {i}\t{i % len(CATEGORIES) + 1}\t{i % 5 + 1}\n')
+        rows.seek(0)
+        cursor.copy_expert('COPY questions (question, answer, category, difficulty) FROM STDIN', rows)
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE questions'))
+    db.session.commit()
+
+
+def median_ms(client, path, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        res = client.get(path)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert res.status_code == 200, f'{path}: {res.status_code}'
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deep page latency, offset against cursor pagination')
+    parser.add_argument('--questions', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    setup_db(app, BENCH_DATABASE_PATH)
+    with app.app_context():
+        if Question.query.count() != args.questions:
+            started = time.perf_counter()
+            fill(args.questions)
+            print(f'{args.questions} questions added in {time.perf_counter() - started:.1f}s')
+        client = app.test_client()
+        print(f'{"list":<12}{"page":>8}{"page= ms":>12}{"cursor= ms":>12}')
+        for name, path, query in [
+                ('all', '/questions', Question.query),
+                ('category 1', '/categories/1/questions', Question.query.filter(Question.category == '1'))]:
+            total = query.count()
+            for depth in DEPTHS:
+                offset = (depth - 1) * 10
+                if offset >= total:
+                    continue
+                # the cursor a client walking the pages would hold at that depth
+                if offset:
+                    last_id = query.order_by(Question.id).offset(offset - 1).limit(1).one().id
+                    cursor = encode_cursor(last_id)
+                else:
+                    cursor = ''
+                offset_ms = median_ms(client, f'{path}?page={depth}', args.repeat)
+                cursor_ms = median_ms(client, f'{path}?cursor={cursor}', args.repeat)
+                print(f'{name:<12}{depth:>8}{offset_ms:>12.1f}{cursor_ms:>12.1f}')
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
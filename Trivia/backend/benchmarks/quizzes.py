@@ -0,0 +1,69 @@
+# ----------------------------------------------------------------------------#
+# Time /quizzes as the question table grows.
+#
+#   createdb trivia_bench
+#   python benchmarks/quizzes.py --sizes 10000 100000 1000000
+#
+# For each size the benchmark database (BENCH_DATABASE_NAME, default
+# trivia_bench) is filled with generated questions in six categories, see
+# pagination.py, then a quiz question is asked for --repeat times, in all the
+# categories and in category 1, with no previous question and with the 20
+# first ones of the category already asked. The median latency is printed.
+# WARNING: the benchmark database is emptied.
+# ----------------------------------------------------------------------------#
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flaskr import create_app  # noqa: E402
+from models import setup_db, Question  # noqa: E402
+from pagination import BENCH_DATABASE_PATH, fill  # noqa: E402
+
+PREVIOUS = [0, 20]
+
+
+def median_ms(client, body, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        res = client.post('/quizzes', json=body)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert res.status_code == 200 and res.get_json()['question'], res.status_code
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='/quizzes latency against the number of questions')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+    setup_db(app, BENCH_DATABASE_PATH)
+    client = app.test_client()
+    print(f'{"questions":>10}  {"category":<12}' + ''.join(f'{f"{n} previous ms":>16}' for n in PREVIOUS))
+    for size in args.sizes:
+        with app.app_context():
+            if Question.query.count() != size:
+                fill(size)
+            cells = {}
+            for name, category_id in [('all', 0), ('category 1', 1)]:
+                query = Question.query.order_by(Question.id)
+                if category_id:
+                    query = query.filter(Question.category == str(category_id))
+                asked = [question.id for question in query.limit(max(PREVIOUS))]
+                cells[name] = [median_ms(client, {"previous_questions": asked[:n],
+                                                  "quiz_category": {'type': name, 'id': category_id}},
+                                         args.repeat)
+                               for n in PREVIOUS]
+            for name, timings in cells.items():
+                print(f'{size:>10}  {name:<12}' + ''.join(f'{ms:>16.1f}' for ms in timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,125 @@
-import os, json
-from flask import Flask, request, abort, jsonify
+import os, json, sys
+import base64
+from flask import Flask, request, abort, jsonify, current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 import random
-from sqlalchemy import and_
+from sqlalchemy import and_, func
 
-from models import setup_db, Question, Category
+from models import setup_db, db, Question, Category, QuestionCount
+from settings import MAX_QUESTIONS_PER_PAGE
 
 QUESTIONS_PER_PAGE = 10
-
-
-def paginate_display(request, queries):
-    formatted_display = [query.format() for query in queries]
-    # set default value if param "page" NOT sent via request's args
+# question ids probed per query when picking a quiz question, and queries
+# before falling back to a random offset, see random_quiz_question
+QUIZ_PROBES = 32
+QUIZ_PROBE_ROUNDS = 2
+
+
+# opaque cursor of a question list: the id of the last question of a page
+def encode_cursor(question_id):
+    return base64.urlsafe_b64encode(json.dumps({'id': question_id}).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))['id'])
+    except (ValueError, TypeError, KeyError):
+        abort(400)
+
+
+# fetch one page of a Question query ordered by id and count the rows of the
+# whole query, so only the page is loaded and formatted.
+# "cursor" (a next_cursor of an earlier page) starts the page right after that
+# question: an index seek on the id whatever the depth, and questions added or
+# deleted meanwhile never make rows skip or repeat. "page" (default 1) is the
+# OFFSET based mode, whose cost grows with the page number.
+# "per_page" defaults to QUESTIONS_PER_PAGE, capped at MAX_QUESTIONS_PER_PAGE:
+# there is no way to get the whole table at once.
+# returns (formatted questions of the page, total number of questions or None
+# for a cursor page, next_cursor or None on the last page)
+def paginate_display(request, query):
     page = request.args.get("page", 1, type=int)
-    # if "page' sent via request args , display paginated
-    if request.args.get("page"):
-        start = (page - 1) * QUESTIONS_PER_PAGE
-        end = start + QUESTIONS_PER_PAGE
-        return formatted_display[start:end]
-    # else,display all
-    return formatted_display
+    cursor = request.args.get("cursor")
+    per_page = request.args.get("per_page", current_app.config['QUESTIONS_PER_PAGE'], type=int)
+    per_page = min(per_page, current_app.config['MAX_QUESTIONS_PER_PAGE'])
+    if page < 1 or per_page < 1:
+        abort(400)
+    # one row more than the page tells whether another page follows
+    if cursor:
+        start = None
+        rows = query.filter(Question.id > decode_cursor(cursor)).limit(per_page + 1).all()
+    else:
+        start = (page - 1) * per_page
+        rows = query.limit(per_page + 1).offset(start).all()
+    questions = rows[:per_page]
+    has_more = len(rows) > per_page
+    next_cursor = encode_cursor(questions[-1].id) if has_more else None
+    # a cursor page is not counted, that would cost a scan of the whole list
+    # on every page: the first page, fetched without a cursor, has the total.
+    # the last page of an offset ends at the total, no COUNT is needed either
+    if start is None:
+        total = None
+    elif not has_more and (questions or start == 0):
+        total = start + len(questions)
+    else:
+        total = query.order_by(None).count()
+    return [question.format() for question in questions], total, next_cursor
+
+
+# number of questions, kept by the database (see QuestionCount): one row is
+# read whatever the size of the table
+def count_questions():
+    return db.session.query(QuestionCount.total).scalar()
+
+
+# after a write, the questions of the page the client asks for with "page"
+# or "cursor" (see paginate_display); nothing is loaded when it asks for none
+def requested_page(request):
+    if 'page' not in request.args and 'cursor' not in request.args:
+        return {}
+    questions, _, next_cursor = paginate_display(request, Question.query.order_by(Question.id))
+    return {'questions': get_current_category(questions), 'next_cursor': next_cursor}
+
+
+# pick a question uniformly at random among the ones matching criteria, in
+# the database: random ids between the smallest and the largest are probed
+# in one query through the primary key, and one of the probed ids that is
+# a matching question is chosen. every matching question is as likely to be
+# probed as any other, gaps left by deleted ids or other categories do not
+# favour the question after them. when QUIZ_PROBE_ROUNDS probes all miss
+# (a small category, most questions already asked), the matching questions
+# are counted and one is taken at a random offset.
+# returns None when no question matches
+def random_quiz_question(criteria):
+    low, high = db.session.query(func.min(Question.id), func.max(Question.id)).one()
+    if low is None:
+        return None
+    probes = min(current_app.config['QUIZ_PROBES'], high - low + 1)
+    for _ in range(current_app.config['QUIZ_PROBE_ROUNDS']):
+        ids = random.sample(range(low, high + 1), probes)
+        hits = Question.query.filter(Question.id.in_(ids), *criteria).all()
+        if hits:
+            return random.choice(hits)
+    questions = Question.query.filter(*criteria)
+    count = questions.count()
+    if count == 0:
+        return None
+    return questions.order_by(Question.id).offset(random.randrange(count)).first()
 
 
 # embed current_category type in each question
-def get_current_category(queries):
+# categories maps str(id) to type (see format_categories); when the caller has
+# not loaded them, the categories of all questions are fetched in ONE query
+# instead of one Category.query.get() per question
+def get_current_category(queries, categories=None):
+    if categories is None:
+        category_ids = {int(q.get('category')) for q in queries if q.get('category')}
+        categories = format_categories(
+            Category.query.filter(Category.id.in_(category_ids)).all()) if category_ids else {}
     current_category_question_lst = []
     for q in queries:
-        q['current_category'] = Category.query.get(q.get('category')).type
+        q['current_category'] = categories.get(str(q.get('category')))
         current_category_question_lst.append(q)
     return current_category_question_lst
 
@@ -43,6 +135,14 @@ def format_categories(queries):
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
+    app.config.from_mapping(
+        QUESTIONS_PER_PAGE=QUESTIONS_PER_PAGE,
+        MAX_QUESTIONS_PER_PAGE=MAX_QUESTIONS_PER_PAGE,
+        QUIZ_PROBES=QUIZ_PROBES,
+        QUIZ_PROBE_ROUNDS=QUIZ_PROBE_ROUNDS,
+    )
+    if test_config is not None:
+        app.config.update(test_config)
     setup_db(app)
 
     """
@@ -107,23 +207,25 @@ def create_app(test_config=None):
     @app.route('/questions')
     def get_questions():
         try:
-            questions = Question.query.order_by(Question.id).all()
             categories = Category.query.order_by(Category.id).all()
         except:
             abort(422)
         # Paginate list of questions and make sure it is a valid page
-        questions_paginated = paginate_display(request, questions)
+        questions_paginated, total_questions, next_cursor = paginate_display(
+            request, Question.query.order_by(Question.id))
 
         if not questions_paginated:
             abort(404)
         # else return
         # TBD: current_category should be not be returned on top level
         # better to be embedded in each question's dictionary?
+        formatted_categories = format_categories(categories)
         return jsonify({
             'success': True,
-            'questions': get_current_category(questions_paginated),
-            'total_questions': len(questions),
-            'categories': format_categories(categories),
+            'questions': get_current_category(questions_paginated, formatted_categories),
+            'total_questions': total_questions,
+            'next_cursor': next_cursor,
+            'categories': formatted_categories,
             # 'categories': [category.format() for category in categories],
             'current_category': None
         })
@@ -145,14 +247,11 @@ def create_app(test_config=None):
 
         try:
             question.delete()
-            questions = Question.query.order_by('id').all()
-            question_page_lst = paginate_display(request, questions)
-            total_questions = len(Question.query.all())
             return jsonify({
                 'success': True,
                 'deleted_question_id': question_id,
-                'questions': get_current_category(question_page_lst),
-                'total_questions': total_questions
+                'total_questions': count_questions(),
+                **requested_page(request)
             })
         except:
             question.rollback()
@@ -189,15 +288,12 @@ def create_app(test_config=None):
                 difficulty=difficulty,
                 category=category)
             question.insert()
-            questions = Question.query.order_by('id').all()
-            questions_page_lst = paginate_display(request, questions)
-            total_questions = len(Question.query.all())
             return jsonify({
                 'success': True,
                 'new_question_id': question.id,
                 'category': question.category,
-                'questions': questions_page_lst,
-                'total_questions': total_questions
+                'total_questions': count_questions(),
+                **requested_page(request)
             })
         except:
             question.rollback()
@@ -222,13 +318,14 @@ def create_app(test_config=None):
         search_term = request.get_json().get('searchTerm', '')
         print(f"search item is: {search_term}")
         ilike_search = f'%{search_term}%'
-        questions = Question.query.order_by(Question.id).filter(Question.question.ilike(ilike_search)).all()
-        if len(questions) == 0:
+        questions = Question.query.order_by(Question.id).filter(Question.question.ilike(ilike_search))
+        questions_page_lst, total_questions, next_cursor = paginate_display(request, questions)
+        if not questions_page_lst:
             abort(404)
-        questions_page_lst = paginate_display(request, questions)
         return jsonify({"success": True,
                         "questions": get_current_category(questions_page_lst),
-                        "total_questions": len(questions_page_lst),
+                        "total_questions": total_questions,
+                        "next_cursor": next_cursor,
                         'current_category': None
                         })
 
@@ -244,15 +341,15 @@ def create_app(test_config=None):
     @app.route('/categories/<int:category_id>/questions', methods=['GET'])
     def get_questions_per_category(category_id):
         print(f"cat id:{category_id}")
-        questions = Question.query.order_by(Question.id).filter(Question.category == category_id).all()
-        print(f"question per category is: {questions}")
-        if len(questions) == 0:
+        questions = Question.query.order_by(Question.id).filter(Question.category == str(category_id))
+        questions_page_lst, total_questions, next_cursor = paginate_display(request, questions)
+        if not questions_page_lst:
             abort(404)
-        questions_page_lst = paginate_display(request, questions)
         return jsonify({
             "success": True,
             "questions": questions_page_lst,
-            "total_questions": len(questions_page_lst),
+            "total_questions": total_questions,
+            "next_cursor": next_cursor,
             'current_category': category_id
         })
 
@@ -277,15 +374,13 @@ def create_app(test_config=None):
         previous_questions = body.get('previous_questions', None)
         print(f"category is: {category}")
         print(f"pre question is: {previous_questions}")
-        if category['id'] == 0:
-            questions = Question.query.order_by(Question.id).filter(Question.id.notin_(previous_questions)).all()
-        else:
-            # questions = Question.query.order_by(Question.id).filter_by(category = str((category['id'])))\
-            # .filter(Question.id.notin_(previous_questions)).all()
-            questions = Question.query.order_by(Question.id).filter(
-                and_(Question.category == str((category['id'])), Question.id.notin_(previous_questions))).all()
-        # print(f"questions is {questions}")
-        quiz_question = random.choice(questions).format() if questions else None
+        # the question is picked by the database, without loading the
+        # remaining questions of the category, see random_quiz_question
+        criteria = [Question.id.notin_(previous_questions)] if previous_questions else []
+        if int(category['id']) != 0:
+            criteria.append(Question.category == str(category['id']))
+        question = random_quiz_question(criteria)
+        quiz_question = question.format() if question else None
         return jsonify({"question": quiz_question,
                         "success": True
                         })
@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, create_engine, event, text
 from flask_sqlalchemy import SQLAlchemy
 import json
 from settings import DB_NAME, DB_USER, DB_PASSWORD
@@ -91,3 +91,59 @@ class Category(db.Model):
             }
     def __repr__(self):
         return f'<My Category {self.id}: {self.type}>'
+
+"""
+QuestionCount
+    the number of questions, a single row kept up to date by statement
+    triggers on questions: the total is read in O(1) instead of counting
+    the whole table after every write
+"""
+class QuestionCount(db.Model):
+    __tablename__ = 'question_count'
+
+    id = Column(Boolean, primary_key=True, default=True)
+    total = Column(BigInteger, nullable=False)
+
+
+QUESTION_COUNT_TRIGGERS = """
+CREATE OR REPLACE FUNCTION question_count_insert() RETURNS trigger AS $$
+BEGIN
+    UPDATE question_count SET total = total + (SELECT count(*) FROM new_questions);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION question_count_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE question_count SET total = total - (SELECT count(*) FROM old_questions);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION question_count_truncate() RETURNS trigger AS $$
+BEGIN
+    UPDATE question_count SET total = 0;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS question_count_insert ON questions;
+CREATE TRIGGER question_count_insert AFTER INSERT ON questions
+    REFERENCING NEW TABLE AS new_questions
+    FOR EACH STATEMENT EXECUTE PROCEDURE question_count_insert();
+DROP TRIGGER IF EXISTS question_count_delete ON questions;
+CREATE TRIGGER question_count_delete AFTER DELETE ON questions
+    REFERENCING OLD TABLE AS old_questions
+    FOR EACH STATEMENT EXECUTE PROCEDURE question_count_delete();
+DROP TRIGGER IF EXISTS question_count_truncate ON questions;
+CREATE TRIGGER question_count_truncate AFTER TRUNCATE ON questions
+    FOR EACH STATEMENT EXECUTE PROCEDURE question_count_truncate();
+
+INSERT INTO question_count (id, total) SELECT true, count(*) FROM questions;
+"""
+
+
+# when create_all() creates question_count (a new database, or one restored
+# from trivia.psql), install the triggers and count the existing questions
+# once. after all tables: questions may be created after question_count
+@event.listens_for(db.Model.metadata, 'after_create')
+def install_question_count(target, connection, tables=(), **kw):
+    if QuestionCount.__table__ in tables:
+        connection.execute(text(QUESTION_COUNT_TRIGGERS))
@@ -6,3 +6,5 @@ DB_NAME = os.environ.get("DATABASE_NAME")
 TEST_DB_NAME = os.environ.get("TEST_DATABASE_NAME")
 DB_USER=os.environ.get("DATABASE_USER")
 DB_PASSWORD = os.getenv("DATABASE_PASS")
+# largest page of questions any request gets, see paginate_display
+MAX_QUESTIONS_PER_PAGE = int(os.environ.get("MAX_QUESTIONS_PER_PAGE", 100))
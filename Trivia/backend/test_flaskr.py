@@ -1,10 +1,13 @@
 import os
+import random
 import unittest
 import json
+from contextlib import contextmanager
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
-from flaskr import create_app
-from models import setup_db, Question, Category
+from flaskr import create_app, encode_cursor
+from models import setup_db, db, Question, Category, QuestionCount
 from settings import TEST_DB_NAME, DB_USER, DB_PASSWORD
 
 class TriviaTestCase(unittest.TestCase):
@@ -32,6 +35,22 @@ DB_USER,DB_PASSWORD, "localhost:5432", self.database_name)
         """Executed after reach test"""
         pass
 
+    @contextmanager
+    def count_queries(self):
+        """Collect every statement sent to the database inside the block"""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.get_engine()
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
     """
     TODO
     Write at least one test for each test for successful operation and for expected errors.
@@ -61,7 +80,76 @@ DB_USER,DB_PASSWORD, "localhost:5432", self.database_name)
         self.assertEqual(data['success'], True)
         self.assertTrue(data['questions'])
         self.assertTrue(data['categories'])
-        self.assertEqual(data['total_questions'], len(data['questions']))
+        # without a page, the first one: never the whole table
+        self.assertEqual(len(data['questions']), 10)
+        self.assertEqual(data['total_questions'], Question.query.count())
+
+    def test_get_questions_page_size_is_capped(self):
+        self.app.config['MAX_QUESTIONS_PER_PAGE'] = 5
+        res = self.client().get('/questions?page=2&per_page=1000')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['questions']), 5)
+        first_ids = [q.id for q in Question.query.order_by(Question.id).limit(10)]
+        self.assertEqual([q['id'] for q in data['questions']], first_ids[5:10])
+        self.assertEqual(data['total_questions'], Question.query.count())
+
+    def test_get_questions_cursor_walks_every_question(self):
+        ids, cursor = [], ''
+        while True:
+            res = self.client().get(f'/questions?per_page=4&cursor={cursor}')
+            data = json.loads(res.data)
+            self.assertEqual(res.status_code, 200)
+            # only the first page, without a cursor, is counted
+            self.assertEqual(data['total_questions'], None if cursor else Question.query.count())
+            ids += [q['id'] for q in data['questions']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(ids, [q.id for q in Question.query.order_by(Question.id)])
+
+    def test_get_questions_cursor_is_stable_across_deletes(self):
+        dummy_ids = []
+        for sport in ['swimming', 'rowing', 'fencing']:
+            dummy_question = Question(question='What is your favorite sports?',
+                                      answer=sport,
+                                      difficulty=1,
+                                      category=1)
+            dummy_question.insert()
+            dummy_ids.append(dummy_question.id)
+        start = encode_cursor(dummy_ids[0] - 1)
+        first = json.loads(self.client().get(f'/questions?per_page=2&cursor={start}').data)
+        self.assertEqual([q['id'] for q in first['questions']], dummy_ids[:2])
+        # a question of the first page goes away before the second is loaded:
+        # an offset would now skip the third question, the cursor does not
+        self.client().delete(f'/questions/{dummy_ids[0]}')
+        second = json.loads(self.client().get(f"/questions?per_page=2&cursor={first['next_cursor']}").data)
+        for question_id in dummy_ids[1:]:
+            self.client().delete(f'/questions/{question_id}')
+        self.assertEqual([q['id'] for q in second['questions']], dummy_ids[2:])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_get_questions_bad_cursor(self):
+        res = self.client().get('/questions?cursor=not-a-cursor')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+
+    def test_get_questions_bad_page(self):
+        res = self.client().get('/questions?page=0')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+
+    def test_get_questions_resolves_categories_without_a_query_per_question(self):
+        with self.count_queries() as statements:
+            res = self.client().get('/questions?page=1')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['questions']), 10)
+        self.assertTrue(all(q['current_category'] for q in data['questions']))
+        # the categories, the page of questions and their count, whatever the page size
+        self.assertEqual(len(statements), 3)
 
     def test_get_questions_not_found(self):
         res = self.client().get('/questions?page=1000')
@@ -81,6 +169,18 @@ DB_USER,DB_PASSWORD, "localhost:5432", self.database_name)
         self.assertEqual(data['current_category'],6)
         self.assertEqual(data['total_questions'], 2)
 
+    def test_get_questions_category_totals_all_pages(self):
+        res = self.client().get('/categories/6/questions?per_page=1')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['questions']), 1)
+        self.assertEqual(data['total_questions'], 2)
+        res = self.client().get(f"/categories/6/questions?per_page=1&cursor={data['next_cursor']}")
+        second = json.loads(res.data)
+        self.assertEqual(len(second['questions']), 1)
+        self.assertGreater(second['questions'][0]['id'], data['questions'][0]['id'])
+        self.assertIsNone(second['next_cursor'])
+
     def test_get_questions_category_not_found(self):
         res = self.client().get('/categories/1000/questions')
         data = json.loads(res.data)
@@ -107,10 +207,36 @@ DB_USER,DB_PASSWORD, "localhost:5432", self.database_name)
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
         self.assertEqual(data['deleted_question_id'],f'{dummy_question_id}')
-        self.assertTrue(data['total_questions'])
-        self.assertTrue(data['questions'])
+        self.assertEqual(data['total_questions'], Question.query.count())
+        # no page unless one is asked for
+        self.assertNotIn('questions', data)
         self.assertEqual(question,None)
 
+    def test_question_count_follows_every_write(self):
+        with self.app.app_context():
+            before = db.session.query(QuestionCount.total).scalar()
+            db.session.execute(Question.__table__.insert(), [
+                {'question': f'Dummy {i}?', 'answer': 'dummy', 'difficulty': 1, 'category': 1}
+                for i in range(3)])
+            self.assertEqual(db.session.query(QuestionCount.total).scalar(), before + 3)
+            db.session.execute(Question.__table__.delete().where(Question.question.like('Dummy %?')))
+            self.assertEqual(db.session.query(QuestionCount.total).scalar(), before)
+            self.assertEqual(before, Question.query.count())
+            db.session.rollback()
+
+    def test_delete_question_with_page(self):
+        dummy_question = Question(question='What is your favorite sports?',
+                                  answer='swimming',
+                                  difficulty=1,
+                                  category=1)
+        dummy_question.insert()
+        res = self.client().delete(f'/questions/{dummy_question.id}?page=1')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['questions']), 10)
+        self.assertTrue(all(q['current_category'] for q in data['questions']))
+        self.assertTrue(data['next_cursor'])
+
     def test_delete_question_not_found(self):
         res = self.client().delete('/questions/230000')
         data = json.loads(res.data)
@@ -129,6 +255,20 @@ DB_USER,DB_PASSWORD, "localhost:5432", self.database_name)
         self.assertEqual(data['success'], True)
         self.assertTrue(data['new_question_id'])
 
+    def test_post_question_loads_no_question_rows(self):
+        with self.count_queries() as statements:
+            res = self.client().post('/questions', json=self.new_question)
+        data = json.loads(res.data)
+        self.client().delete(f"/questions/{data['new_question_id']}")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_questions'], Question.query.count() + 1)
+        self.assertNotIn('questions', data)
+        # the insert, reloading the new row after the commit and reading the
+        # counter the triggers keep, whatever the size of the table
+        self.assertEqual(len(statements), 3)
+        self.assertIn('question_count', statements[-1])
+        self.assertNotIn('count(', ' '.join(statements).lower())
+
     def test_post_question_incomplete_input(self):
         incomplete_question = {"question": "what is your favorite city", "category": 2,"difficulty": 1}
         res = self.client().post('/questions', json=incomplete_question)
@@ -152,6 +292,24 @@ DB_USER,DB_PASSWORD, "localhost:5432", self.database_name)
         self.assertTrue(data['questions'])
         self.assertEqual(data['total_questions'], 2)
 
+    def test_search_questions_resolves_categories_in_one_query(self):
+        with self.count_queries() as statements:
+            res = self.client().post('/questions/search', json={'searchTerm': 'what'})
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertGreater(len(data['questions']), 2)
+        self.assertNotIn(None, [q['current_category'] for q in data['questions']])
+        # the matching questions (a short page needs no COUNT), then the
+        # categories of all of them at once
+        self.assertEqual(len(statements), 2)
+
+    def test_search_questions_totals_all_pages(self):
+        res = self.client().post('/questions/search?page=2&per_page=2', json={'searchTerm': 'e'})
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['questions']), 2)
+        self.assertEqual(data['total_questions'], Question.query.filter(Question.question.ilike('%e%')).count())
+
     def test_search_questions_without_results(self):
         res = self.client().post('/questions/search', json={'searchTerm': 'bizarre'})
         data = json.loads(res.data)
@@ -169,6 +327,65 @@ DB_USER,DB_PASSWORD, "localhost:5432", self.database_name)
         self.assertEqual(data['success'], True)
         self.assertTrue(data['question'])
 
+    def quiz_draws(self, category_id, previous_questions, draws):
+        """Count how often each question id is picked by /quizzes"""
+        counts = {}
+        for _ in range(draws):
+            res = self.client().post('/quizzes', json={"previous_questions": previous_questions,
+                                                       "quiz_category": {'type': '', 'id': category_id}})
+            question_id = json.loads(res.data)['question']['id']
+            counts[question_id] = counts.get(question_id, 0) + 1
+        return counts
+
+    def assertUniform(self, counts, ids):
+        """Chi-square goodness of fit against picking every id equally often,
+        at the 0.1% level (Wilson-Hilferty approximation of the critical value)"""
+        self.assertEqual(set(counts), set(ids))
+        draws = sum(counts.values())
+        expected = draws / len(ids)
+        statistic = sum((counts[i] - expected) ** 2 / expected for i in ids)
+        df = len(ids) - 1
+        critical = df * (1 - 2 / (9 * df) + 3.09 * (2 / (9 * df)) ** 0.5) ** 3
+        self.assertLess(statistic, critical, counts)
+
+    def test_quiz_picks_questions_uniformly(self):
+        # few probes, so that the gaps between ids are hit and some picks
+        # fall back to a random offset
+        self.app.config['QUIZ_PROBES'] = 4
+        random.seed(25)
+        with self.app.app_context():
+            ids = [question.id for question in Question.query.all()]
+        self.assertUniform(self.quiz_draws(0, [], 100 * len(ids)), ids)
+
+    def test_quiz_picks_uniformly_when_most_questions_were_asked(self):
+        self.app.config['QUIZ_PROBES'] = 2
+        random.seed(25)
+        with self.app.app_context():
+            ids = [question.id for question in Question.query.filter(Question.category == '1').order_by(Question.id)]
+        counts = self.quiz_draws(1, ids[:-2], 400)
+        self.assertUniform(counts, ids[-2:])
+
+    def test_quiz_query_count_does_not_depend_on_the_previous_questions(self):
+        with self.app.app_context():
+            ids = [question.id for question in Question.query.order_by(Question.id)]
+        with self.count_queries() as statements:
+            res = self.client().post('/quizzes', json={"previous_questions": ids[:-1],
+                                                       "quiz_category": {'type': '', 'id': 0}})
+        data = json.loads(res.data)
+        self.assertEqual(data['question']['id'], ids[-1])
+        # min/max, the probing rounds, then a count and an offset at worst
+        self.assertLessEqual(len(statements), 1 + self.app.config['QUIZ_PROBE_ROUNDS'] + 2)
+
+    def test_quiz_without_questions_left(self):
+        with self.app.app_context():
+            ids = [question.id for question in Question.query.filter(Question.category == '6')]
+        res = self.client().post('/quizzes', json={"previous_questions": ids,
+                                                   "quiz_category": {'type': 'Sports', 'id': 6}})
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertIsNone(data['question'])
+
     def test_quiz_incomplete_input(self):
         mysearch = {"quiz_category": {'type': 'Art', 'id': '6'}}
         res = self.client().post('/quizzes', json=mysearch)